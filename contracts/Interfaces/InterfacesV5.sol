@@ -45,6 +45,36 @@ interface ILiquidityPoolV5 is ILiquidityPool {
         uint256 premium
     ) external;
 
+    function unlockMany(uint256[] calldata ids) external;
+
+    function sendMany(
+        uint256[] calldata ids,
+        address[] calldata accounts,
+        uint256[] calldata amounts
+    ) external;
+
+    function lockMany(
+        uint256 firstId,
+        uint256[] calldata tokenXAmounts,
+        uint256[] calldata premiums
+    ) external;
+
+    function splitLock(
+        uint256 id,
+        uint256 tokenXAmount,
+        uint256 premium,
+        uint256 firstId,
+        uint256[] calldata tokenXAmounts,
+        uint256[] calldata premiums
+    ) external;
+
+    function mergeLocks(
+        uint256[] calldata ids,
+        uint256 targetId,
+        uint256 tokenXAmount,
+        uint256 premium
+    ) external;
+
     function getExpiry() external view returns (uint256);
 
     function getLockedAmount() external view returns (uint256);
@@ -69,7 +99,9 @@ interface IBufferOptionsV5 {
     event Expire(uint256 indexed id, uint256 premium);
     event PayReferralFee(address indexed referrer, uint256 amount);
     event PayAdminFee(address indexed owner, uint256 amount);
+    event ClaimFees(address indexed account, uint256 amount);
     event UpdateUnits(uint256 value);
+    event UpdateSnapshotCache(bool value);
     event AutoExerciseStatusChange(address indexed account, bool status);
 
     enum State {
@@ -83,6 +115,23 @@ interface IBufferOptionsV5 {
         Put,
         Call
     }
+    enum ExerciseSkipReason {
+        NonexistentToken,
+        SameBlock,
+        NotEligible,
+        Expired,
+        NotActive,
+        OutOfTheMoney
+    }
+
+    enum UnlockSkipReason {
+        NotExpired,
+        NotActive,
+        NonexistentToken
+    }
+
+    event ExerciseSkipped(uint256 indexed id, ExerciseSkipReason reason);
+    event UnlockSkipped(uint256 indexed id, UnlockSkipReason reason);
 
     event UpdateOptionCreationWindow(
         uint256 startHour,
@@ -128,9 +177,17 @@ interface IBufferOptionsV5 {
         OptionType optionType;
     }
 
+    struct Position {
+        uint256 id;
+        uint256 slot;
+        address owner;
+        uint256 units;
+        Option option;
+    }
+
     struct SlotDetail {
-        uint256 strike;
-        uint256 expiration;
+        uint128 strike;
+        uint40 expiration;
         OptionType optionType;
         bool isValid;
     }
@@ -168,6 +225,9 @@ interface IOptionsConfig {
     event UpdateNFTSaleRoyaltyPercentage(uint256 value);
     event UpdateTradingPermission(PermittedTradingType permissionType);
     event UpdateStrike(uint256 value);
+    event UpdateIVBucketWidth(uint256 value);
+    event UpdateFeeAccrual(bool value);
+    event UpdateFastCdf(bool value);
 }
 
 interface IOptionWindowCreator {
@@ -17,6 +17,13 @@ library OptionMath {
     int128 private constant CDF_CONST_1 = 0x19abac0ea1da65036; // 6400 / 3989
     int128 private constant CDF_CONST_2 = 0x0d3c84b78b749bd6b; // 3300 / 3989
 
+    // 64x64 fixed point constant of the normal PDF, 1 / sqrt(2 * pi)
+    int128 private constant INV_SQRT_2PI_64x64 = 0x0662114cf50d94234;
+
+    // Inputs from 6 up are past the last interval of the piecewise polynomial
+    // CDF, where Choudhury's tail is below 1e-9 and is taken as 0
+    int128 private constant FAST_CDF_CUTOFF_64x64 = 0x60000000000000000;
+
     /**
      * @notice calculate the exponential decay coefficient for a given interval
      * @param oldTimestamp timestamp of previous update
@@ -52,6 +59,171 @@ library OptionMath {
         return input64x64 > 0 ? ONE_64x64.sub(value64x64) : value64x64;
     }
 
+    /**
+     * @notice calculate a piecewise polynomial fit of Choudhury’s approximation
+     * of the Black-Scholes CDF, which needs no exp, sqrt or div
+     * @dev |x| is split into intervals of 0.5 below 6, each fitted with a
+     * degree 6 polynomial in the offset from the start of the interval. The
+     * absolute error against _N is below 4.1e-9 for every input; the
+     * coefficients and the error sweep are in scripts/cdf_approximation.py
+     * @param input64x64 64x64 fixed point representation of random variable
+     * @return 64x64 fixed point representation of the approximated CDF of x
+     */
+    function _NFast(int128 input64x64) internal pure returns (int128) {
+        int128 abs64x64 = input64x64.abs();
+        int128 value64x64;
+
+        if (abs64x64 < FAST_CDF_CUTOFF_64x64) {
+            // Intervals are 0.5 = 2^63 in 64x64 fixed point
+            uint256 interval = uint256(int256(abs64x64)) >> 63;
+            int128 offset64x64 = abs64x64 - int128(int256(interval << 63));
+            int128[7] memory coefficients = _fastCdfCoefficients(interval);
+
+            value64x64 = coefficients[6];
+            for (uint256 i = 6; i > 0; i--) {
+                value64x64 = value64x64.mul(offset64x64).add(
+                    coefficients[i - 1]
+                );
+            }
+            if (value64x64 < 0) value64x64 = 0;
+        }
+
+        return input64x64 > 0 ? ONE_64x64.sub(value64x64) : value64x64;
+    }
+
+    /**
+     * @notice 64x64 fixed point polynomial coefficients of _NFast, lowest
+     * degree first
+     * @param interval index of the interval of width 0.5, below 12
+     */
+    function _fastCdfCoefficients(uint256 interval)
+        private
+        pure
+        returns (int128[7] memory)
+    {
+        if (interval == 0) {
+            return [
+                int128(0x80092bd12b76f800),
+                -0x66bd5ff6b8fa8400,
+                0x320b5362d534ec0,
+                0x9cc0d3477efc880,
+                0x8d940672ba1f280,
+                -0x8bc268120239580,
+                0x24b35edc5c23c00
+            ];
+        } else if (interval == 1) {
+            return [
+                int128(0x4efd0a5845e86400),
+                -0x5a23b3dc5a165800,
+                0x1652b7b601866200,
+                0xb62f7e23859d480,
+                -0x4ae94111777c7c0,
+                -0x1e6bc6d3d304750,
+                0x121437687e5d950
+            ];
+        } else if (interval == 2) {
+            return [
+                int128(0x2896a3282a9ca800),
+                -0x3dffebfd6bc5e000,
+                0x1f0f15ceabadb600,
+                0x167fa4053f82ae,
+                -0x56f3fa4f030d900,
+                0x167677da2547370,
+                0x202adb2756fda6
+            ];
+        } else if (interval == 3) {
+            return [
+                int128(0x11120a748da08300),
+                -0x212140c79a502200,
+                0x18e8e7331e982500,
+                -0x6f83d3394ac2400,
+                -0x190deaf8e2e3300,
+                0x19dbe39d2e1ef30,
+                -0x581bf431be5fb0
+            ];
+        } else if (interval == 4) {
+            return [
+                int128(0x5cf1bcf5bd33e80),
+                -0xdca323f5f3a5080,
+                0xdcde124f15e0700,
+                -0x6edae03031ad280,
+                0x13383c50d9fb770,
+                0x7dc690c4131b74,
+                -0x400f1c6179f3a4
+            ];
+        } else if (interval == 5) {
+            return [
+                int128(0x195eb714e7a2910),
+                -0x4798628f46e95c0,
+                0x5980070a551c740,
+                -0x3ebf7e6e09022e0,
+                0x18a96e9f28965b0,
+                -0x3d0c376993bb54,
+                -0x7c63feea1803e
+            ];
+        } else if (interval == 6) {
+            return [
+                int128(0x584b71dbc33128),
+                -0x121bc89d2e6cdf0,
+                0x1b26b689b9d5030,
+                -0x18223f32654b390,
+                0xd9e136d7f19c88,
+                -0x4b02499dcea274,
+                0xc5f1b7863e307
+            ];
+        } else if (interval == 7) {
+            return [
+                int128(0xf3b06147cb3f7),
+                -0x391a3286e704c0,
+                0x63db3b3a67318c,
+                -0x6aca372b7e0038,
+                0x4c15a36f305b1c,
+                -0x237df78a70c280,
+                0x8a4d3367cd88e
+            ];
+        } else if (interval == 8) {
+            return [
+                int128(0x213720c06d96e),
+                -0x8c451d4bc964c,
+                0x1183f12c0d6acb,
+                -0x15cc6239c8018b,
+                0x1271571cd610c6,
+                -0xa5566fffaa855,
+                0x2fc8fbad8b04d
+            ];
+        } else if (interval == 9) {
+            return [
+                int128(0x39156874d329),
+                -0x10c601a8fbc9c,
+                0x25aee8e07d0f6,
+                -0x3550f5889a1c5,
+                0x33a51ed99971b,
+                -0x20ee6329f463f,
+                0xa95e75c26403
+            ];
+        } else if (interval == 10) {
+            return [
+                int128(0x4d26cbc7768),
+                -0x18fe44b5dbea,
+                0x3e586570c5c4,
+                -0x628c2c3a6763,
+                0x6aa4eddb54d7,
+                -0x4b0ca0fee014,
+                0x1a0699011050
+            ];
+        } else {
+            return [
+                int128(0x51e0044011),
+                -0x1d004f2e3c5,
+                0x4f7fdc990d8,
+                -0x8a7d8f4af5b,
+                0xa47e007654c,
+                -0x7d3fad1ff48,
+                0x2e09eea1e6b
+            ];
+        }
+    }
+
     /**
      * @notice calculate the price of an option using the Black-Scholes model
      * @param impliedVol uint256 representation of annualized impliedVol with a factor of 1e4
@@ -68,6 +240,53 @@ library OptionMath {
         uint256 period,
         bool isCall
     ) public pure returns (uint256) {
+        return
+            _scaledBlackScholesPrice(
+                impliedVol,
+                strike,
+                spot,
+                period,
+                isCall,
+                false
+            );
+    }
+
+    /**
+     * @notice calculate the price of an option using the Black-Scholes model
+     * with the piecewise polynomial CDF (_NFast)
+     * @param impliedVol uint256 representation of annualized impliedVol with a factor of 1e4
+     * @param strike uint256 representation of strike price with a factor of 1e8
+     * @param spot uint256 representation of spot price with a factor of 1e8
+     * @param period uint256 representation of duration of option contract (in seconds)
+     * @param isCall whether to price "call" or "put" option
+     * @return uint256 representation of Black-Scholes option price with a factor of 1e8
+     */
+    function blackScholesPriceFast(
+        uint256 impliedVol,
+        uint256 strike,
+        uint256 spot,
+        uint256 period,
+        bool isCall
+    ) public pure returns (uint256) {
+        return
+            _scaledBlackScholesPrice(
+                impliedVol,
+                strike,
+                spot,
+                period,
+                isCall,
+                true
+            );
+    }
+
+    function _scaledBlackScholesPrice(
+        uint256 impliedVol,
+        uint256 strike,
+        uint256 spot,
+        uint256 period,
+        bool isCall,
+        bool fastCdf
+    ) private pure returns (uint256) {
         int128 D8 = ABDKMath64x64.fromUInt(10**8);
         int128 D4 = ABDKMath64x64.fromUInt(10**4);
         int128 impliedVol64x64 = ABDKMath64x64.fromUInt(impliedVol).div(D4);
@@ -78,12 +297,13 @@ library OptionMath {
             ABDKMath64x64.fromUInt(365 days)
         );
 
-        int128 premium64x64 = _blackScholesPrice(
+        int128 premium64x64 = _price64x64(
             variance64x64,
             strike64x64,
             spot64x64,
             maturity64x64,
-            isCall
+            isCall,
+            fastCdf
         );
         return ABDKMath64x64.toUInt(premium64x64.mul(D8));
     }
@@ -104,6 +324,25 @@ library OptionMath {
         int128 timeToMaturity64x64,
         bool isCall
     ) public pure returns (int128) {
+        return
+            _price64x64(
+                varianceAnnualized64x64,
+                strike64x64,
+                spot64x64,
+                timeToMaturity64x64,
+                isCall,
+                false
+            );
+    }
+
+    function _price64x64(
+        int128 varianceAnnualized64x64,
+        int128 strike64x64,
+        int128 spot64x64,
+        int128 timeToMaturity64x64,
+        bool isCall,
+        bool fastCdf
+    ) private pure returns (int128) {
         int128 cumulativeVariance64x64 = timeToMaturity64x64.mul(
             varianceAnnualized64x64
         );
@@ -118,12 +357,70 @@ library OptionMath {
 
         if (isCall) {
             return
-                spot64x64.mul(_N(d1_64x64)).sub(strike64x64.mul(_N(d2_64x64)));
+                spot64x64.mul(_cdf(d1_64x64, fastCdf)).sub(
+                    strike64x64.mul(_cdf(d2_64x64, fastCdf))
+                );
         } else {
             return
-                -spot64x64.mul(_N(-d1_64x64)).sub(
-                    strike64x64.mul(_N(-d2_64x64))
+                -spot64x64.mul(_cdf(-d1_64x64, fastCdf)).sub(
+                    strike64x64.mul(_cdf(-d2_64x64, fastCdf))
                 );
         }
     }
+
+    /**
+     * @notice calculate the delta and vega of an option using the Black-Scholes model
+     * @dev delta is N(d1) for calls and -N(-d1) for puts, with the same
+     * CDF approximation as blackScholesPrice, and vega is spot * pdf(d1) *
+     * sqrt(period), the change of the price for an implied volatility change of 1.00
+     * @param impliedVol uint256 representation of annualized impliedVol with a factor of 1e4
+     * @param strike uint256 representation of strike price with a factor of 1e8
+     * @param spot uint256 representation of spot price with a factor of 1e8
+     * @param period uint256 representation of duration of option contract (in seconds)
+     * @param isCall whether to price "call" or "put" option
+     * @return delta int256 representation of the option's delta with a factor of 1e8
+     * @return vega uint256 representation of the option's vega with a factor of 1e8
+     */
+    function blackScholesGreeks(
+        uint256 impliedVol,
+        uint256 strike,
+        uint256 spot,
+        uint256 period,
+        bool isCall
+    ) public pure returns (int256 delta, uint256 vega) {
+        int128 D8 = ABDKMath64x64.fromUInt(10**8);
+        int128 D4 = ABDKMath64x64.fromUInt(10**4);
+        int128 impliedVol64x64 = ABDKMath64x64.fromUInt(impliedVol).div(D4);
+        int128 strike64x64 = ABDKMath64x64.fromUInt(strike).div(D8);
+        int128 spot64x64 = ABDKMath64x64.fromUInt(spot).div(D8);
+        int128 maturity64x64 = ABDKMath64x64.fromUInt(period).div(
+            ABDKMath64x64.fromUInt(365 days)
+        );
+
+        int128 cumulativeVariance64x64 = maturity64x64.mul(
+            impliedVol64x64.mul(impliedVol64x64)
+        );
+        int128 cumulativeVarianceSqrt64x64 = cumulativeVariance64x64.sqrt();
+        int128 d1_64x64 = spot64x64
+            .div(strike64x64)
+            .ln()
+            .add(cumulativeVariance64x64 >> 1)
+            .div(cumulativeVarianceSqrt64x64);
+
+        int128 delta64x64 = isCall ? _N(d1_64x64) : -_N(-d1_64x64);
+        int128 vega64x64 = spot64x64
+            .mul((-d1_64x64.mul(d1_64x64) >> 1).exp().mul(INV_SQRT_2PI_64x64))
+            .mul(maturity64x64.sqrt());
+
+        delta = delta64x64.mul(D8).toInt();
+        vega = ABDKMath64x64.toUInt(vega64x64.mul(D8));
+    }
+
+    function _cdf(int128 input64x64, bool fastCdf)
+        private
+        pure
+        returns (int128)
+    {
+        return fastCdf ? _NFast(input64x64) : _N(input64x64);
+    }
 }
@@ -47,6 +47,9 @@ abstract contract BufferNFTCore is
     /// @dev slot => optionIds
     mapping(uint256 => EnumerableSet.UintSet) private _slotTokens;
 
+    /// @dev owner => optionIds
+    mapping(address => EnumerableSet.UintSet) private _ownerTokens;
+
     uint8 internal _unitDecimals = 18;
     uint256 public maxUnits = 1000000;
     BufferIBFRPoolV5 public pool;
@@ -96,43 +99,62 @@ abstract contract BufferNFTCore is
     {
         require(splitUnits_.length > 0, "Empty splitUnits");
         newOptionIDs = new uint256[](splitUnits_.length);
+        uint256[] memory lockedAmounts = new uint256[](splitUnits_.length);
+        uint256[] memory premiums = new uint256[](splitUnits_.length);
         Option memory option = _getOption(optionID);
-        uint256 amountUnits = option.amount / units[optionID];
-        uint256 premiumUnits = option.premium / units[optionID];
-        uint256 lockedAmountUnits = option.lockedAmount / units[optionID];
+        Option memory unitOption = _scaleOption(option, 1, units[optionID]);
         for (uint256 i = 0; i < splitUnits_.length; i++) {
             uint256 newOptionID = _generateTokenId();
             newOptionIDs[i] = newOptionID;
             optionSlotMapping[newOptionID] = optionSlotMapping[optionID];
             _split(optionID, newOptionID, splitUnits_[i]);
 
-            uint256 newAmount = amountUnits * splitUnits_[i];
-            uint256 newPremium = premiumUnits * splitUnits_[i];
-            uint256 newLockedAmount = lockedAmountUnits * splitUnits_[i];
+            Option memory newOption = _scaleOption(
+                unitOption,
+                splitUnits_[i],
+                1
+            );
+            _setOption(newOptionID, newOption);
+            _setOptionBlock(newOptionID);
+
+            option.amount = option.amount - newOption.amount;
+            option.lockedAmount = option.lockedAmount - newOption.lockedAmount;
+            option.premium = option.premium - newOption.premium;
+            lockedAmounts[i] = newOption.lockedAmount;
+            premiums[i] = newOption.premium;
+        }
+        _setOption(optionID, option);
+
+        // Settle the parent and every child with the pool in one call
+        pool.splitLock(
+            optionID,
+            option.lockedAmount,
+            option.premium,
+            newOptionIDs[0],
+            lockedAmounts,
+            premiums
+        );
+    }
 
-            Option memory newOption = Option(
+    /**
+     * @dev Returns a copy of `option` with its amount, locked amount and
+     * premium scaled by `numerator / denominator`
+     */
+    function _scaleOption(
+        Option memory option,
+        uint256 numerator,
+        uint256 denominator
+    ) internal pure returns (Option memory) {
+        return
+            Option(
                 option.state,
                 option.strike,
-                newAmount,
-                newLockedAmount,
-                newPremium,
+                (option.amount / denominator) * numerator,
+                (option.lockedAmount / denominator) * numerator,
+                (option.premium / denominator) * numerator,
                 option.expiration,
                 option.optionType
             );
-
-            _setOption(newOptionID, newOption);
-            _setOptionBlock(newOptionID);
-            option = _modifyOption(
-                optionID,
-                option,
-                option.lockedAmount - newLockedAmount,
-                option.amount - newAmount,
-                option.premium - newPremium
-            );
-            pool.lockChange(optionID, option.lockedAmount, option.premium);
-            approve_token(address(pool), newOption.premium);
-            pool.lock(newOptionID, newOption.lockedAmount, newOption.premium);
-        }
     }
 
     function _split(
@@ -169,7 +191,6 @@ abstract contract BufferNFTCore is
             totalLockedAmount = totalLockedAmount + option.lockedAmount;
             totalAmount = totalAmount + option.amount;
             totalPremium = totalPremium + option.premium;
-            pool.unlockWithoutProfit(optionIDs[i]);
             BufferNFTCore._merge(optionIDs[i], targetOptionID);
             delete optionSlotMapping[optionIDs[i]];
         }
@@ -180,7 +201,12 @@ abstract contract BufferNFTCore is
             totalAmount,
             totalPremium
         );
-        pool.lockChange(targetOptionID, totalLockedAmount, totalPremium);
+        pool.mergeLocks(
+            optionIDs,
+            targetOptionID,
+            totalLockedAmount,
+            totalPremium
+        );
     }
 
     function _merge(uint256 optionId_, uint256 targetOptionId_)
@@ -449,9 +475,14 @@ abstract contract BufferNFTCore is
             optionID
         );
         require(!slotDetails[slot].isValid, "slot already existed");
+        require(option.strike <= type(uint128).max, "Strike is too large");
+        require(
+            option.expiration <= type(uint40).max,
+            "Expiration is too large"
+        );
         slotDetails[slot] = SlotDetail(
-            option.strike,
-            option.expiration,
+            uint128(option.strike),
+            uint40(option.expiration),
             option.optionType,
             true
         );
@@ -560,6 +591,65 @@ abstract contract BufferNFTCore is
         return _slotTokens[slot_].at(index_);
     }
 
+    function tokenOfOwnerByIndex(address owner_, uint256 index_)
+        public
+        view
+        returns (uint256)
+    {
+        return _ownerTokens[owner_].at(index_);
+    }
+
+    /**
+     * @notice Returns a page of the positions in a slot
+     * @param slot_ The slot
+     * @param offset_ Index of the first position
+     * @param limit_ Maximum number of positions returned
+     * @return positions The positions
+     * @return total Number of positions in the slot
+     */
+    function slotPositions(
+        uint256 slot_,
+        uint256 offset_,
+        uint256 limit_
+    ) external view returns (Position[] memory positions, uint256 total) {
+        return _positions(_slotTokens[slot_], offset_, limit_);
+    }
+
+    /**
+     * @notice Returns a page of the positions held by an owner
+     * @param owner_ The owner
+     * @param offset_ Index of the first position
+     * @param limit_ Maximum number of positions returned
+     * @return positions The positions
+     * @return total Number of positions held by the owner
+     */
+    function ownerPositions(
+        address owner_,
+        uint256 offset_,
+        uint256 limit_
+    ) external view returns (Position[] memory positions, uint256 total) {
+        return _positions(_ownerTokens[owner_], offset_, limit_);
+    }
+
+    function _positions(
+        EnumerableSet.UintSet storage tokens_,
+        uint256 offset_,
+        uint256 limit_
+    ) internal view returns (Position[] memory positions, uint256 total) {
+        total = tokens_.length();
+        uint256 count = offset_ < total ? total - offset_ : 0;
+        if (count > limit_) count = limit_;
+        positions = new Position[](count);
+        for (uint256 i = 0; i < count; i++) {
+            uint256 optionId = tokens_.at(offset_ + i);
+            positions[i].id = optionId;
+            positions[i].slot = _slotOf(optionId);
+            positions[i].owner = ERC721.ownerOf(optionId);
+            positions[i].units = units[optionId];
+            positions[i].option = _getOption(optionId);
+        }
+    }
+
     function slotOf(uint256 optionId_) public view returns (uint256) {
         return _slotOf(optionId_);
     }
@@ -578,12 +668,16 @@ abstract contract BufferNFTCore is
     ) internal virtual override {
         if (from_ != address(0)) {
             _clearApproveUnits(optionId_);
+            _ownerTokens[from_].remove(optionId_);
+        }
+        if (to_ != address(0)) {
+            _ownerTokens[to_].add(optionId_);
         }
     }
 
     function _generateTokenId() internal virtual returns (uint256);
 
-    function approve_token(address receipent, uint256 amount) public virtual;
+    function approve_token(address receipent, uint256 amount) internal virtual;
 
     function _getOption(uint256 optionId_)
         internal
@@ -20,6 +20,7 @@ pragma solidity ^0.8.0;
  */
 
 import "./OptionsCore.sol";
+import "@openzeppelin/contracts/utils/math/SafeCast.sol";
 
 /**
  * @author Heisenberg
@@ -34,6 +35,53 @@ contract BufferTokenXOptionsV5 is OptionsCore {
     mapping(uint256 => string) private _tokenURIs;
 
     OptionType public fixedOptionType = OptionType.Call;
+    bool public snapshotCache;
+
+    /// @dev Price and config values shared by every call in a block
+    struct MarketSnapshot {
+        uint64 blockNumber;
+        uint64 expiry;
+        uint128 price;
+        uint128 strike;
+        uint128 impliedVolRate;
+        uint128 utilizationRate;
+        uint32 settlementFeePercentage;
+        uint32 stakingFeePercentage;
+        uint32 optionCollateralizationRatio;
+        uint32 referralRewardPercentage;
+        address settlementFeeRecipient;
+        uint32 ivBucketWidth;
+        bool feeAccrual;
+        bool fastCdf;
+    }
+
+    /// @dev Black-Scholes price per unit of the fixed series for an IV
+    /// bucket, price and pricing config (see _quoteKey)
+    struct CachedQuote {
+        uint64 blockNumber;
+        uint128 usdPremiumPerAmount;
+    }
+
+    struct BatchOrder {
+        uint256 usdPremiumPerAmount;
+        uint256[] lockedAmounts;
+        uint256[] premiums;
+        uint256[] settlementFees;
+    }
+
+    /// @dev Amounts of the active options of a series, kept up to date by
+    /// every option write and burn
+    struct SeriesExposure {
+        uint128 amount;
+        uint128 lockedAmount;
+    }
+
+    MarketSnapshot internal _marketSnapshot;
+    mapping(bytes32 => CachedQuote) internal _quoteCache;
+    mapping(address => uint256) public accruedFees;
+    /// @dev expiration => strike => exposure of the active options
+    mapping(uint256 => mapping(uint256 => SeriesExposure))
+        public seriesExposure;
 
     constructor(
         ERC20 _tokenX,
@@ -60,11 +108,44 @@ contract BufferTokenXOptionsV5 is OptionsCore {
         _price = twap.consult(token0, 1e8, token1);
     }
 
+    /**
+     * @notice Returns the price and config values used for pricing in the
+     * current block
+     * @dev With snapshotCache on, the snapshot is stored by the first create,
+     * createBatch or exercise of a block and reused by every later call in
+     * that block, so config changes made later in the block take effect from
+     * the next one. Pool balances are not part of it as every lock changes
+     * them.
+     */
+    function marketSnapshot()
+        public
+        view
+        returns (MarketSnapshot memory snapshot)
+    {
+        if (!snapshotCache) return _readMarketSnapshot();
+        snapshot = _marketSnapshot;
+        if (snapshot.blockNumber != block.number) {
+            snapshot = _readMarketSnapshot();
+        }
+    }
+
     function setMaxUnits(uint256 value) external onlyOwner {
         maxUnits = value;
         emit UpdateUnits(value);
     }
 
+    /**
+     * @notice Enables storing the market snapshot for the later calls of a
+     * block
+     * @dev Storing the snapshot costs the first call of every block more
+     * than it saves, so it only pays off when several options are created
+     * or exercised in the same block (see test_gas_benchmarks)
+     */
+    function setSnapshotCache(bool value) external onlyOwner {
+        snapshotCache = value;
+        emit UpdateSnapshotCache(value);
+    }
+
     /**
      * @notice Creates a new option
      * @param amount Option amount in tokenX
@@ -75,16 +156,18 @@ contract BufferTokenXOptionsV5 is OptionsCore {
         address referrer,
         string memory metadata
     ) external nonReentrant returns (uint256 optionID) {
+        MarketSnapshot memory snapshot = _loadMarketSnapshot();
         require(
-            pool.getExpiry() > block.timestamp,
+            snapshot.expiry > block.timestamp,
             "Option creation is not allowed currently"
         );
-        uint256 period = pool.getExpiry() - block.timestamp;
-        (uint256 totalFee, uint256 settlementFee, uint256 premium) = fees(
-            period,
+        (uint256 totalFee, uint256 settlementFee, uint256 premium) = _feesFor(
+            snapshot,
             amount,
-            config.fixedStrike(),
-            fixedOptionType
+            _loadPremiumPerAmount(
+                snapshot,
+                _impliedVolatility(snapshot, amount)
+            )
         );
 
         require(totalFee > amount / 1000, "The option's price is too low");
@@ -94,29 +177,159 @@ contract BufferTokenXOptionsV5 is OptionsCore {
         require(success, "The Fee Transfer didn't go through");
 
         uint256 lockedAmount = (amount *
-            config.optionCollateralizationRatio()) / 100;
+            snapshot.optionCollateralizationRatio) / 100;
 
         Option memory option = Option(
             State.Active,
-            config.fixedStrike(),
+            snapshot.strike,
             amount,
             lockedAmount,
             premium,
-            block.timestamp + period,
+            snapshot.expiry,
             fixedOptionType
         );
-        optionID = _generateTokenId();
-        _setOption(optionID, option);
-        _setOptionBlock(optionID);
-        createOptionFor(msg.sender, metadata, optionID);
-        uint256 stakingAmount = distributeSettlementFee(
+        optionID = _issueOption(option, metadata);
+        uint256 stakingAmount = _distributeSettlementFee(
+            snapshot,
             settlementFee,
             referrer
         );
 
         tokenX.approve(address(pool), option.premium);
         pool.lock(optionID, option.lockedAmount, option.premium);
+        _setDefaultAutoExerciseStatus();
 
+        emit Create(optionID, msg.sender, stakingAmount, totalFee, metadata);
+    }
+
+    /**
+     * @notice Creates a batch of options priced against a single price and
+     * implied volatility snapshot
+     * @dev The implied volatility is taken at the utilisation reached after
+     * the whole batch is locked, the fee is pulled in one transfer and the
+     * collateral is locked with a single pool call
+     * @param amounts Option amounts in tokenX
+     * @param metadata Token URI of every option
+     * @return optionIDs Created options' IDs
+     */
+    function createBatch(
+        uint256[] calldata amounts,
+        address referrer,
+        string[] calldata metadata
+    ) external nonReentrant returns (uint256[] memory optionIDs) {
+        require(amounts.length > 0, "Empty batch");
+        require(amounts.length == metadata.length, "Wrong metadata length");
+        MarketSnapshot memory snapshot = _loadMarketSnapshot();
+        require(
+            snapshot.expiry > block.timestamp,
+            "Option creation is not allowed currently"
+        );
+        BatchOrder memory order = _priceBatch(snapshot, amounts);
+        uint256 settlementFee = _sum(order.settlementFees);
+        uint256 premium = _sum(order.premiums);
+
+        // User has to approve first inorder to execute this function
+        bool success = tokenX.transferFrom(
+            msg.sender,
+            address(this),
+            settlementFee + premium
+        );
+        require(success, "The Fee Transfer didn't go through");
+
+        optionIDs = _issueBatch(snapshot, order, amounts, metadata);
+        _distributeSettlementFee(snapshot, settlementFee, referrer);
+
+        tokenX.approve(address(pool), premium);
+        pool.lockMany(optionIDs[0], order.lockedAmounts, order.premiums);
+        _setDefaultAutoExerciseStatus();
+    }
+
+    function _priceBatch(
+        MarketSnapshot memory snapshot,
+        uint256[] calldata amounts
+    ) internal returns (BatchOrder memory order) {
+        uint256 totalAmount;
+        for (uint256 i = 0; i < amounts.length; i++) {
+            totalAmount += amounts[i];
+        }
+
+        order.usdPremiumPerAmount = _loadPremiumPerAmount(
+            snapshot,
+            _impliedVolatility(snapshot, totalAmount)
+        );
+        order.lockedAmounts = new uint256[](amounts.length);
+        order.premiums = new uint256[](amounts.length);
+        order.settlementFees = new uint256[](amounts.length);
+
+        for (uint256 i = 0; i < amounts.length; i++) {
+            order.premiums[i] =
+                (order.usdPremiumPerAmount * amounts[i]) /
+                snapshot.price;
+            order.settlementFees[i] =
+                (amounts[i] * snapshot.settlementFeePercentage) /
+                100;
+            order.lockedAmounts[i] =
+                (amounts[i] * snapshot.optionCollateralizationRatio) /
+                100;
+            require(
+                order.premiums[i] + order.settlementFees[i] > amounts[i] / 1000,
+                "The option's price is too low"
+            );
+        }
+    }
+
+    function _issueBatch(
+        MarketSnapshot memory snapshot,
+        BatchOrder memory order,
+        uint256[] calldata amounts,
+        string[] calldata metadata
+    ) internal returns (uint256[] memory optionIDs) {
+        optionIDs = new uint256[](amounts.length);
+        // Staking fees are reported per option as the increments of the fee
+        // on the running total, so that they add up to the fee paid out
+        uint256 settlementFees;
+        uint256 stakingFees;
+        for (uint256 i = 0; i < amounts.length; i++) {
+            settlementFees += order.settlementFees[i];
+            uint256 stakingFee = (settlementFees *
+                snapshot.stakingFeePercentage) /
+                100 -
+                stakingFees;
+            stakingFees += stakingFee;
+            uint256 optionID = _issueOption(
+                Option(
+                    State.Active,
+                    snapshot.strike,
+                    amounts[i],
+                    order.lockedAmounts[i],
+                    order.premiums[i],
+                    snapshot.expiry,
+                    fixedOptionType
+                ),
+                metadata[i]
+            );
+            optionIDs[i] = optionID;
+            emit Create(
+                optionID,
+                msg.sender,
+                stakingFee,
+                order.settlementFees[i] + order.premiums[i],
+                metadata[i]
+            );
+        }
+    }
+
+    function _issueOption(Option memory option, string memory metadata)
+        internal
+        returns (uint256 optionID)
+    {
+        optionID = _generateTokenId();
+        _setOption(optionID, option);
+        _setOptionBlock(optionID);
+        createOptionFor(msg.sender, metadata, optionID);
+    }
+
+    function _setDefaultAutoExerciseStatus() internal {
         // Set User's Auto Close Status to True by default
         // Check if this is the user's first option from this contract
         if (!hasUserBoughtFirstOption[msg.sender]) {
@@ -127,11 +340,22 @@ contract BufferTokenXOptionsV5 is OptionsCore {
             }
             hasUserBoughtFirstOption[msg.sender] = true;
         }
+    }
 
-        emit Create(optionID, msg.sender, stakingAmount, totalFee, metadata);
+    function _sum(uint256[] memory values)
+        internal
+        pure
+        returns (uint256 total)
+    {
+        for (uint256 i = 0; i < values.length; i++) {
+            total += values[i];
+        }
     }
 
-    function approve_token(address receipent, uint256 amount) public override {
+    function approve_token(address receipent, uint256 amount)
+        internal
+        override
+    {
         tokenX.approve(receipent, amount);
     }
 
@@ -140,13 +364,14 @@ contract BufferTokenXOptionsV5 is OptionsCore {
     //  * @param optionID ID of the option
     //  */
     function unlock(uint256 optionID) public override {
-        Option storage option = options[optionID];
+        Option memory option = _getOption(optionID);
         require(
             option.expiration < block.timestamp,
             "Option has not expired yet"
         );
         require(option.state == State.Active, "Option is not active");
         option.state = State.Expired;
+        _setOption(optionID, option);
         pool.unlock(optionID);
 
         // Burn the option
@@ -164,54 +389,148 @@ contract BufferTokenXOptionsV5 is OptionsCore {
         override
         returns (uint256 profit)
     {
-        Option memory option = options[optionID];
-        uint256 currentPrice = getCurrentPrice();
+        Option memory option = _getOption(optionID);
+        bool inTheMoney;
+        (inTheMoney, profit) = profitOf(option, _loadPrice());
         if (option.optionType == OptionType.Call) {
-            require(option.strike <= currentPrice, "Current price is too low");
-            profit =
-                ((currentPrice - option.strike) * option.amount) /
-                currentPrice;
+            require(inTheMoney, "Current price is too low");
         } else {
-            require(option.strike >= currentPrice, "Current price is too high");
-            profit =
-                ((option.strike - currentPrice) * option.amount) /
-                currentPrice;
+            require(inTheMoney, "Current price is too high");
         }
-        if (profit > option.lockedAmount) profit = option.lockedAmount;
         pool.send(optionID, ownerOf(optionID), profit);
     }
 
+    function profitOf(Option memory option, uint256 currentPrice)
+        internal
+        pure
+        override
+        returns (bool inTheMoney, uint256 profit)
+    {
+        if (option.optionType == OptionType.Call) {
+            inTheMoney = option.strike <= currentPrice;
+            if (inTheMoney)
+                profit =
+                    ((currentPrice - option.strike) * option.amount) /
+                    currentPrice;
+        } else {
+            inTheMoney = option.strike >= currentPrice;
+            if (inTheMoney)
+                profit =
+                    ((option.strike - currentPrice) * option.amount) /
+                    currentPrice;
+        }
+        if (profit > option.lockedAmount) profit = option.lockedAmount;
+    }
+
+    /**
+     * @dev Exercises only need the price, so the rest of the snapshot is
+     * only read when the snapshot cache is on
+     */
+    function _loadPrice() internal override returns (uint256) {
+        if (!snapshotCache) return getCurrentPrice();
+        return _loadMarketSnapshot().price;
+    }
+
+    function unlockMany(uint256[] memory optionIDs) internal override {
+        pool.unlockMany(optionIDs);
+    }
+
+    function payProfits(
+        uint256[] memory optionIDs,
+        address[] memory holders,
+        uint256[] memory profits
+    ) internal override {
+        pool.sendMany(optionIDs, holders, profits);
+    }
+
     function distributeSettlementFee(uint256 settlementFee, address referrer)
         internal
         override
         returns (uint256 stakingAmount)
     {
-        stakingAmount = ((settlementFee * config.stakingFeePercentage()) / 100);
+        return
+            _distributeSettlementFee(marketSnapshot(), settlementFee, referrer);
+    }
+
+    function _distributeSettlementFee(
+        MarketSnapshot memory snapshot,
+        uint256 settlementFee,
+        address referrer
+    ) internal returns (uint256 stakingAmount) {
+        stakingAmount = ((settlementFee * snapshot.stakingFeePercentage) / 100);
 
         // Incase the stakingAmount is 0
         if (stakingAmount > 0) {
-            tokenX.transfer(config.settlementFeeRecipient(), stakingAmount);
+            _payFee(
+                snapshot.feeAccrual,
+                snapshot.settlementFeeRecipient,
+                stakingAmount
+            );
         }
 
         uint256 adminFee = settlementFee - stakingAmount;
 
         if (adminFee > 0) {
             if (
-                config.referralRewardPercentage() > 0 &&
+                snapshot.referralRewardPercentage > 0 &&
                 referrer != owner() &&
                 referrer != msg.sender
             ) {
                 uint256 referralReward = (adminFee *
-                    config.referralRewardPercentage()) / 100;
+                    snapshot.referralRewardPercentage) / 100;
                 adminFee = adminFee - referralReward;
-                tokenX.transfer(referrer, referralReward);
+                _payFee(snapshot.feeAccrual, referrer, referralReward);
                 emit PayReferralFee(referrer, referralReward);
             }
-            tokenX.transfer(owner(), adminFee);
+            _payFee(snapshot.feeAccrual, owner(), adminFee);
             emit PayAdminFee(owner(), adminFee);
         }
     }
 
+    /**
+     * @dev Sends a fee to its recipient, or credits it to the recipient's
+     * accrued balance when fee accrual is enabled
+     */
+    function _payFee(
+        bool accrue,
+        address recipient,
+        uint256 amount
+    ) internal {
+        if (accrue) {
+            accruedFees[recipient] += amount;
+        } else {
+            tokenX.transfer(recipient, amount);
+        }
+    }
+
+    /**
+     * @notice Pays out the fees accrued to the sender
+     * @return amount Amount of tokenX paid out
+     */
+    function claimFees() external nonReentrant returns (uint256 amount) {
+        amount = _claimFees(msg.sender);
+    }
+
+    /**
+     * @notice Pays out the fees accrued to each of the accounts
+     * @param accounts Fee recipients to pay out
+     */
+    function claimFeesFor(address[] calldata accounts) external nonReentrant {
+        for (uint256 i = 0; i < accounts.length; i++) {
+            _claimFees(accounts[i]);
+        }
+    }
+
+    function _claimFees(address account) internal returns (uint256 amount) {
+        amount = accruedFees[account];
+        if (amount > 0) {
+            accruedFees[account] = 0;
+            bool success = tokenX.transfer(account, amount);
+            require(success, "The fee transfer didn't go through");
+            emit ClaimFees(account, amount);
+        }
+    }
+
     function getNewUtilisation(uint256 amount)
         public
         view
@@ -229,15 +548,65 @@ contract BufferTokenXOptionsV5 is OptionsCore {
         view
         returns (uint256 iv)
     {
-        iv = config.impliedVolRate();
+        iv = _impliedVolatility(marketSnapshot(), amount);
+    }
+
+    function _impliedVolatility(
+        MarketSnapshot memory snapshot,
+        uint256 amount
+    ) internal view returns (uint256 iv) {
+        iv = snapshot.impliedVolRate;
         uint256 utilization = getNewUtilisation(amount);
         if (utilization > 40e8) {
             iv +=
-                (iv * (utilization - 40e8) * config.utilizationRate()) /
+                (iv * (utilization - 40e8) * snapshot.utilizationRate) /
                 40e16;
         }
     }
 
+    /**
+     * @notice Returns the outstanding exposure of the current series
+     * @dev Delta and vega are the Black-Scholes Greeks of all the active
+     * options of the series (the pool is short them) at the current price
+     * and implied volatility, and are 0 once the series has expired
+     * @return amount Total amount of the active options in tokenX
+     * @return lockedAmount Total collateral locked for them in tokenX
+     * @return delta Delta in tokenX
+     * @return vega Change of their value in tokenX for an implied
+     * volatility change of 1.00
+     */
+    function poolExposure()
+        external
+        view
+        returns (
+            uint256 amount,
+            uint256 lockedAmount,
+            int256 delta,
+            uint256 vega
+        )
+    {
+        MarketSnapshot memory snapshot = marketSnapshot();
+        SeriesExposure memory exposure = seriesExposure[snapshot.expiry][
+            snapshot.strike
+        ];
+        amount = exposure.amount;
+        lockedAmount = exposure.lockedAmount;
+        if (amount == 0 || snapshot.expiry <= block.timestamp) {
+            return (amount, lockedAmount, 0, 0);
+        }
+
+        (int256 deltaPerAmount, uint256 vegaPerAmount) = OptionMath
+            .blackScholesGreeks(
+                _impliedVolatility(snapshot, 0),
+                snapshot.strike,
+                snapshot.price,
+                snapshot.expiry - block.timestamp,
+                fixedOptionType == OptionType.Call
+            );
+        delta = (deltaPerAmount * int256(amount)) / 1e8;
+        vega = (vegaPerAmount * amount) / snapshot.price;
+    }
+
     /**
      * @notice Used for getting the actual options prices
      * @param period Option period in seconds (1 days <= period <= 4 weeks)
@@ -262,21 +631,204 @@ contract BufferTokenXOptionsV5 is OptionsCore {
             uint256 premium
         )
     {
-        uint256 currentPrice = getCurrentPrice();
+        return _fees(marketSnapshot(), period, amount, strike, optionType);
+    }
 
+    function _fees(
+        MarketSnapshot memory snapshot,
+        uint256 period,
+        uint256 amount,
+        uint256 strike,
+        OptionType optionType
+    )
+        internal
+        view
+        returns (
+            uint256 total,
+            uint256 settlementFee,
+            uint256 premium
+        )
+    {
         // usdPremium is USD Price of the option in 1e8
-        uint256 usdPremiumPerAmount = OptionMath.blackScholesPrice(
-            currentImpliedVolatility(amount),
+        uint256 usdPremiumPerAmount = _premiumPerAmount(
+            snapshot,
+            _impliedVolatility(snapshot, amount),
             strike,
-            currentPrice,
             period,
-            optionType == OptionType.Call
+            optionType
         );
-        premium = (usdPremiumPerAmount * amount) / currentPrice;
-        settlementFee = getSettlementFee(amount);
+        return _feesFor(snapshot, amount, usdPremiumPerAmount);
+    }
+
+    function _feesFor(
+        MarketSnapshot memory snapshot,
+        uint256 amount,
+        uint256 usdPremiumPerAmount
+    )
+        internal
+        pure
+        returns (
+            uint256 total,
+            uint256 settlementFee,
+            uint256 premium
+        )
+    {
+        premium = (usdPremiumPerAmount * amount) / snapshot.price;
+        settlementFee = (amount * snapshot.settlementFeePercentage) / 100;
         total = settlementFee + premium;
     }
 
+    /**
+     * @dev Black-Scholes price per unit. Once an IV bucket width is set the IV
+     * is rounded up to its bucket, so quantization never underprices an
+     * option, and quotes for the fixed series are served from the cache
+     * filled earlier in the same block. With fastCdf set the price uses
+     * OptionMath's polynomial CDF instead of Choudhury's approximation.
+     */
+    function _premiumPerAmount(
+        MarketSnapshot memory snapshot,
+        uint256 iv,
+        uint256 strike,
+        uint256 period,
+        OptionType optionType
+    ) internal view returns (uint256) {
+        if (snapshot.ivBucketWidth > 0) {
+            uint256 bucket = _ivBucket(snapshot, iv);
+            if (
+                strike == snapshot.strike &&
+                period == snapshot.expiry - block.timestamp &&
+                optionType == fixedOptionType
+            ) {
+                CachedQuote memory quote = _quoteCache[
+                    _quoteKey(snapshot, bucket)
+                ];
+                if (quote.blockNumber == block.number) {
+                    return quote.usdPremiumPerAmount;
+                }
+            }
+            iv = bucket * snapshot.ivBucketWidth;
+        }
+        if (snapshot.fastCdf) {
+            return
+                OptionMath.blackScholesPriceFast(
+                    iv,
+                    strike,
+                    snapshot.price,
+                    period,
+                    optionType == OptionType.Call
+                );
+        }
+        return
+            OptionMath.blackScholesPrice(
+                iv,
+                strike,
+                snapshot.price,
+                period,
+                optionType == OptionType.Call
+            );
+    }
+
+    /**
+     * @dev Prices the fixed series for `iv` and caches the quote for the rest
+     * of the block
+     */
+    function _loadPremiumPerAmount(MarketSnapshot memory snapshot, uint256 iv)
+        internal
+        returns (uint256 usdPremiumPerAmount)
+    {
+        usdPremiumPerAmount = _premiumPerAmount(
+            snapshot,
+            iv,
+            snapshot.strike,
+            snapshot.expiry - block.timestamp,
+            fixedOptionType
+        );
+        if (snapshot.ivBucketWidth > 0) {
+            bytes32 key = _quoteKey(snapshot, _ivBucket(snapshot, iv));
+            if (_quoteCache[key].blockNumber != block.number) {
+                _quoteCache[key] = CachedQuote(
+                    snapshot.blockNumber,
+                    SafeCast.toUint128(usdPremiumPerAmount)
+                );
+            }
+        }
+    }
+
+    /**
+     * @dev Quotes are only shared by calls that price with the same price,
+     * series and pricing config, so a price update or a setStrike,
+     * setIVBucketWidth, setFastCdf or setExpiry call later in the block
+     * prices afresh instead of reusing a stale quote
+     */
+    function _quoteKey(MarketSnapshot memory snapshot, uint256 bucket)
+        internal
+        pure
+        returns (bytes32)
+    {
+        return
+            keccak256(
+                abi.encode(
+                    bucket,
+                    snapshot.price,
+                    snapshot.strike,
+                    snapshot.expiry,
+                    snapshot.ivBucketWidth,
+                    snapshot.fastCdf
+                )
+            );
+    }
+
+    function _ivBucket(MarketSnapshot memory snapshot, uint256 iv)
+        internal
+        pure
+        returns (uint256)
+    {
+        return (iv + snapshot.ivBucketWidth - 1) / snapshot.ivBucketWidth;
+    }
+
+    function _readMarketSnapshot()
+        internal
+        view
+        returns (MarketSnapshot memory snapshot)
+    {
+        snapshot.blockNumber = SafeCast.toUint64(block.number);
+        snapshot.expiry = SafeCast.toUint64(pool.getExpiry());
+        snapshot.price = SafeCast.toUint128(getCurrentPrice());
+        snapshot.strike = SafeCast.toUint128(config.fixedStrike());
+        snapshot.impliedVolRate = SafeCast.toUint128(config.impliedVolRate());
+        snapshot.utilizationRate = SafeCast.toUint128(
+            config.utilizationRate()
+        );
+        snapshot.settlementFeePercentage = SafeCast.toUint32(
+            config.settlementFeePercentage()
+        );
+        snapshot.stakingFeePercentage = SafeCast.toUint32(
+            config.stakingFeePercentage()
+        );
+        snapshot.optionCollateralizationRatio = SafeCast.toUint32(
+            config.optionCollateralizationRatio()
+        );
+        snapshot.referralRewardPercentage = SafeCast.toUint32(
+            config.referralRewardPercentage()
+        );
+        snapshot.settlementFeeRecipient = config.settlementFeeRecipient();
+        snapshot.ivBucketWidth = SafeCast.toUint32(config.ivBucketWidth());
+        snapshot.feeAccrual = config.feeAccrual();
+        snapshot.fastCdf = config.fastCdf();
+    }
+
+    function _loadMarketSnapshot()
+        internal
+        returns (MarketSnapshot memory snapshot)
+    {
+        if (!snapshotCache) return _readMarketSnapshot();
+        snapshot = _marketSnapshot;
+        if (snapshot.blockNumber != block.number) {
+            snapshot = _readMarketSnapshot();
+            _marketSnapshot = snapshot;
+        }
+    }
+
     // /**
     //  * @notice Used for getting the actual options prices
     //  * @param amount Option amount
@@ -329,6 +881,24 @@ contract BufferTokenXOptionsV5 is OptionsCore {
         ERC721._burn(optionID);
     }
 
+    /**
+     * @dev Burning an option that is still active (by merging it or through
+     * burn) removes it from its series' exposure
+     */
+    function _beforeTokenTransfer(
+        address from_,
+        address to_,
+        uint256 optionID
+    ) internal virtual override {
+        super._beforeTokenTransfer(from_, to_, optionID);
+        if (to_ == address(0)) {
+            PackedOption memory option = _options[optionID];
+            if (option.state == State.Active) {
+                _removeExposure(option);
+            }
+        }
+    }
+
     function _generateTokenId() internal virtual override returns (uint256) {
         return nextTokenId++;
     }
@@ -340,7 +910,17 @@ contract BufferTokenXOptionsV5 is OptionsCore {
         override
         returns (Option memory)
     {
-        return options[optionID];
+        PackedOption memory option = _options[optionID];
+        return
+            Option(
+                option.state,
+                option.strike,
+                option.amount,
+                option.lockedAmount,
+                option.premium,
+                option.expiration,
+                option.optionType
+            );
     }
 
     function _setOption(uint256 optionID, Option memory option)
@@ -348,7 +928,45 @@ contract BufferTokenXOptionsV5 is OptionsCore {
         virtual
         override
     {
-        options[optionID] = option;
+        require(option.amount <= type(uint128).max, "Amount is too large");
+        require(
+            option.lockedAmount <= type(uint128).max,
+            "Locked amount is too large"
+        );
+        require(option.premium <= type(uint120).max, "Premium is too large");
+        require(option.strike <= type(uint80).max, "Strike is too large");
+        require(
+            option.expiration <= type(uint40).max,
+            "Expiration is too large"
+        );
+        PackedOption memory previous = _options[optionID];
+        if (previous.state == State.Active) {
+            _removeExposure(previous);
+        }
+        if (option.state == State.Active) {
+            SeriesExposure storage exposure = seriesExposure[
+                option.expiration
+            ][option.strike];
+            exposure.amount += uint128(option.amount);
+            exposure.lockedAmount += uint128(option.lockedAmount);
+        }
+        _options[optionID] = PackedOption(
+            uint128(option.amount),
+            uint128(option.lockedAmount),
+            uint120(option.premium),
+            uint80(option.strike),
+            uint40(option.expiration),
+            option.state,
+            option.optionType
+        );
+    }
+
+    function _removeExposure(PackedOption memory option) internal {
+        SeriesExposure storage exposure = seriesExposure[option.expiration][
+            option.strike
+        ];
+        exposure.amount -= option.amount;
+        exposure.lockedAmount -= option.lockedAmount;
     }
 
     function _setOptionBlock(uint256 optionID) internal virtual override {
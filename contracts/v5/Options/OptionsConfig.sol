@@ -37,6 +37,9 @@ contract OptionConfig is Ownable, IOptionsConfig {
     uint256 internal constant PRICE_DECIMALS = 1e8;
     address public settlementFeeRecipient;
     uint256 public utilizationRate = 4 * 10**7;
+    uint256 public ivBucketWidth;
+    bool public feeAccrual;
+    bool public fastCdf;
     uint256 public fixedStrike;
     ILiquidityPoolV5 public pool;
     PermittedTradingType public permittedTradingType;
@@ -179,4 +182,34 @@ contract OptionConfig is Ownable, IOptionsConfig {
     function setUtilizationRate(uint256 value) external onlyOwner {
         utilizationRate = value;
     }
+
+    /**
+     * @notice Used for changing the width of the IV buckets that quotes are
+     * rounded to and cached by within a block
+     * @param value New ivBucketWidth value, 0 prices every IV exactly
+     **/
+    function setIVBucketWidth(uint256 value) external onlyOwner {
+        ivBucketWidth = value;
+        emit UpdateIVBucketWidth(value);
+    }
+
+    /**
+     * @notice Used for switching settlement fees between being transferred
+     * on every option creation and being accrued for recipients to claim
+     * @param value True to accrue fees
+     **/
+    function setFeeAccrual(bool value) external onlyOwner {
+        feeAccrual = value;
+        emit UpdateFeeAccrual(value);
+    }
+
+    /**
+     * @notice Used for switching Black-Scholes pricing between Choudhury's
+     * CDF approximation and its cheaper piecewise polynomial fit
+     * @param value True to price with OptionMath._NFast
+     **/
+    function setFastCdf(bool value) external onlyOwner {
+        fastCdf = value;
+        emit UpdateFastCdf(value);
+    }
 }
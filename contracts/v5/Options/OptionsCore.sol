@@ -39,13 +39,53 @@ abstract contract OptionsCore is
     uint256 public nextTokenId = 0;
     OptionConfig public config;
     address public settlementFeeRecipient;
-    mapping(uint256 => Option) public options;
+    mapping(uint256 => PackedOption) internal _options;
     mapping(uint256 => uint256) public optionBlocks;
 
     uint256 internal contractCreationTimestamp;
 
     bytes32 public constant AUTO_CLOSER_ROLE = keccak256("AUTO_CLOSER_ROLE");
 
+    /// @dev Storage layout of an Option, packed into two slots
+    struct PackedOption {
+        uint128 amount;
+        uint128 lockedAmount;
+        uint120 premium;
+        uint80 strike;
+        uint40 expiration;
+        State state;
+        OptionType optionType;
+    }
+
+    /**
+     * @notice Returns the details of an option
+     * @param optionID ID of the option
+     */
+    function options(uint256 optionID)
+        external
+        view
+        returns (
+            State state,
+            uint256 strike,
+            uint256 amount,
+            uint256 lockedAmount,
+            uint256 premium,
+            uint256 expiration,
+            OptionType optionType
+        )
+    {
+        Option memory option = _getOption(optionID);
+        return (
+            option.state,
+            option.strike,
+            option.amount,
+            option.lockedAmount,
+            option.premium,
+            option.expiration,
+            option.optionType
+        );
+    }
+
     /**
      * @notice Check if the sender can exercise an active option
      * @param optionID ID of your option
@@ -64,7 +104,7 @@ abstract contract OptionsCore is
         bool isAutoExerciseTrue = autoExerciseStatus[tokenOwner] &&
             hasRole(AUTO_CLOSER_ROLE, msg.sender);
 
-        Option storage option = options[optionID];
+        Option memory option = _getOption(optionID);
         bool isWithinLastHalfHourOfExpiry = block.timestamp >
             (option.expiration - 30 minutes);
 
@@ -83,12 +123,13 @@ abstract contract OptionsCore is
             "msg.sender is not eligible to exercise the option"
         );
 
-        Option storage option = options[optionID];
+        Option memory option = _getOption(optionID);
 
         require(option.expiration >= block.timestamp, "Option has expired");
         require(option.state == State.Active, "Wrong state");
 
         option.state = State.Exercised;
+        _setOption(optionID, option);
         uint256 profit = payProfit(optionID);
 
         // Burn the option
@@ -98,13 +139,159 @@ abstract contract OptionsCore is
     }
 
     /**
-     * @notice Unlocks an array of options
+     * @notice Exercises the eligible in-the-money options of a batch for an
+     * auto closer. Options that can't be exercised are skipped with an
+     * ExerciseSkipped event instead of reverting the batch
+     * @param optionIDs IDs of the options
+     * @return exercised Number of options exercised
+     */
+    function exerciseAll(uint256[] calldata optionIDs)
+        external
+        nonReentrant
+        returns (uint256 exercised)
+    {
+        require(
+            hasRole(AUTO_CLOSER_ROLE, msg.sender),
+            "msg.sender is not allowed to auto exercise"
+        );
+        bool[] memory exercisable = new bool[](optionIDs.length);
+        uint256[] memory profits = new uint256[](optionIDs.length);
+        uint256 price = _loadPrice();
+        for (uint256 i = 0; i < optionIDs.length; i++) {
+            ExerciseSkipReason reason;
+            (exercisable[i], reason, profits[i]) = _checkExercise(
+                optionIDs[i],
+                price
+            );
+            if (exercisable[i]) {
+                // Marked right away so that a repeated ID is skipped
+                Option memory option = _getOption(optionIDs[i]);
+                option.state = State.Exercised;
+                _setOption(optionIDs[i], option);
+                exercised++;
+            } else {
+                emit ExerciseSkipped(optionIDs[i], reason);
+            }
+        }
+        if (exercised == 0) return 0;
+
+        uint256[] memory ids = new uint256[](exercised);
+        address[] memory holders = new address[](exercised);
+        uint256[] memory amounts = new uint256[](exercised);
+        uint256 j;
+        for (uint256 i = 0; i < optionIDs.length; i++) {
+            if (exercisable[i]) {
+                ids[j] = optionIDs[i];
+                holders[j] = ERC721.ownerOf(optionIDs[i]);
+                amounts[j] = profits[i];
+                j++;
+            }
+        }
+        payProfits(ids, holders, amounts);
+
+        for (uint256 i = 0; i < exercised; i++) {
+            // Burn the option
+            _burn(ids[i]);
+            emit Exercise(ids[i], amounts[i]);
+        }
+    }
+
+    /**
+     * @dev Mirrors the checks of exercise for an auto closer without
+     * reverting, and prices the option at `price` if it can be exercised
+     */
+    function _checkExercise(uint256 optionID, uint256 price)
+        internal
+        view
+        returns (
+            bool exercisable,
+            ExerciseSkipReason reason,
+            uint256 profit
+        )
+    {
+        if (!_exists(optionID)) {
+            return (false, ExerciseSkipReason.NonexistentToken, 0);
+        }
+        if (optionBlocks[optionID] == block.number) {
+            return (false, ExerciseSkipReason.SameBlock, 0);
+        }
+        Option memory option = _getOption(optionID);
+        address tokenOwner = ERC721.ownerOf(optionID);
+        if (
+            tokenOwner != msg.sender &&
+            !(autoExerciseStatus[tokenOwner] &&
+                block.timestamp > (option.expiration - 30 minutes))
+        ) {
+            return (false, ExerciseSkipReason.NotEligible, 0);
+        }
+        if (option.expiration < block.timestamp) {
+            return (false, ExerciseSkipReason.Expired, 0);
+        }
+        if (option.state != State.Active) {
+            return (false, ExerciseSkipReason.NotActive, 0);
+        }
+        bool inTheMoney;
+        (inTheMoney, profit) = profitOf(option, price);
+        if (!inTheMoney) {
+            return (false, ExerciseSkipReason.OutOfTheMoney, 0);
+        }
+        exercisable = true;
+    }
+
+    /**
+     * @notice Unlocks the expired active options of an array. Options that
+     * don't exist (burned by exercise, merge or burn), haven't expired or are
+     * no longer active are skipped with an UnlockSkipped event instead of
+     * reverting the batch
      * @param optionIDs array of options
+     * @return unlocked Number of options unlocked
      */
-    function unlockAll(uint256[] calldata optionIDs) external {
+    function unlockAll(uint256[] calldata optionIDs)
+        external
+        returns (uint256 unlocked)
+    {
         uint256 arrayLength = optionIDs.length;
+        bool[] memory expired = new bool[](arrayLength);
+        uint256[] memory premiums = new uint256[](arrayLength);
         for (uint256 i = 0; i < arrayLength; i++) {
-            unlock(optionIDs[i]);
+            // A merged option keeps its Active state after the burn
+            if (!_exists(optionIDs[i])) {
+                emit UnlockSkipped(
+                    optionIDs[i],
+                    UnlockSkipReason.NonexistentToken
+                );
+                continue;
+            }
+            Option memory option = _getOption(optionIDs[i]);
+            if (option.expiration >= block.timestamp) {
+                emit UnlockSkipped(optionIDs[i], UnlockSkipReason.NotExpired);
+            } else if (option.state != State.Active) {
+                emit UnlockSkipped(optionIDs[i], UnlockSkipReason.NotActive);
+            } else {
+                option.state = State.Expired;
+                _setOption(optionIDs[i], option);
+                expired[i] = true;
+                premiums[i] = option.premium;
+                unlocked++;
+            }
+        }
+        if (unlocked == 0) return 0;
+
+        uint256[] memory ids = new uint256[](unlocked);
+        uint256 j;
+        for (uint256 i = 0; i < arrayLength; i++) {
+            if (expired[i]) {
+                ids[j] = optionIDs[i];
+                premiums[j] = premiums[i];
+                j++;
+            }
+        }
+        unlockMany(ids);
+
+        for (uint256 i = 0; i < unlocked; i++) {
+            // Burn the option
+            _burn(ids[i]);
+            emit Expire(ids[i], premiums[i]);
         }
     }
 
@@ -124,6 +311,43 @@ abstract contract OptionsCore is
         returns (uint256 profit)
     {}
 
+    /**
+     * @notice Unlocks the funds of several expired options in the pool
+     * @param optionIDs IDs of the options
+     */
+    function unlockMany(uint256[] memory optionIDs) internal virtual {}
+
+    /**
+     * @notice Calculates the profit of an option at a price
+     * @param option The option
+     * @param price Price of the underlying
+     * @return inTheMoney False if the option can't be exercised at the price
+     * @return profit Profit capped to the option's locked amount
+     */
+    function profitOf(Option memory option, uint256 price)
+        internal
+        pure
+        virtual
+        returns (bool inTheMoney, uint256 profit)
+    {}
+
+    /**
+     * @notice Returns the price options are exercised at in this call
+     */
+    function _loadPrice() internal virtual returns (uint256 price) {}
+
+    /**
+     * @notice Sends the profits of several options from the pool to their holders
+     * @param optionIDs IDs of the options
+     * @param holders Holders of the options
+     * @param profits Profit of each option
+     */
+    function payProfits(
+        uint256[] memory optionIDs,
+        address[] memory holders,
+        uint256[] memory profits
+    ) internal virtual {}
+
     function distributeSettlementFee(uint256 settlementFee, address referrer)
         internal
         virtual
@@ -45,7 +45,7 @@ contract BufferIBFRPoolV5 is
     uint256 public fixedExpiry;
 
     mapping(address => bool) public _revertTransfersInLockUpPeriod;
-    mapping(address => LockedLiquidity[]) public lockedLiquidity;
+    mapping(address => PackedLockedLiquidity[]) internal _lockedLiquidity;
 
     bytes32 public constant OPTION_ISSUER_ROLE =
         keccak256("OPTION_ISSUER_ROLE");
@@ -54,13 +54,29 @@ contract BufferIBFRPoolV5 is
     event UpdateMaxLiquidity(uint256 indexed maxLiquidity);
     event UpdateExpiry(uint256 expiry);
 
+    /// @dev Storage layout of a LockedLiquidity, packed into one slot
+    struct PackedLockedLiquidity {
+        uint120 amount;
+        uint120 premium;
+        bool locked;
+    }
+
     struct WithdrawRequest {
         uint256 withdraw_amount;
         address account;
     }
 
-    WithdrawRequest[] public WithdrawRequestQueue;
+    /// @dev Pending requests live in [withdrawRequestHead, withdrawRequestTail)
+    mapping(uint256 => WithdrawRequest) public WithdrawRequestQueue;
+    uint256 public withdrawRequestHead;
+    uint256 public withdrawRequestTail;
+    uint256 public constant WITHDRAW_REQUEST_GAS = 80000;
     event AddedWithdrawRequest(uint256 tokenXAmount, address account);
+    event SkippedWithdrawRequest(
+        uint256 indexed requestIndex,
+        uint256 tokenXAmount,
+        address account
+    );
 
     constructor(ERC20 _tokenX, uint256 initialExpiry) {
         _name = string(
@@ -130,7 +146,7 @@ contract BufferIBFRPoolV5 is
             block.timestamp > fixedExpiry,
             "Can't change expiry before the expiry ends"
         );
-        delete WithdrawRequestQueue;
+        withdrawRequestHead = withdrawRequestTail;
         requestCount = 0;
     }
 
@@ -195,7 +211,10 @@ contract BufferIBFRPoolV5 is
         returns (uint256 burn)
     {
         if (block.timestamp <= fixedExpiry) {
-            WithdrawRequestQueue.push(WithdrawRequest(tokenXAmount, account));
+            WithdrawRequestQueue[withdrawRequestTail++] = WithdrawRequest(
+                tokenXAmount,
+                account
+            );
             requestCount++;
             emit AddedWithdrawRequest(tokenXAmount, account);
             return 0;
@@ -219,21 +238,85 @@ contract BufferIBFRPoolV5 is
     }
 
     /*
-     * @nonce Provider burns rBFR-X and receives X from the pool
-     * @param amount Amount of X to receive
-     * @return burn Amount of tokens to be burnt
+     * @nonce Processes the queued withdraw requests in FIFO order. Requests that
+              can no longer be filled are skipped and dropped from the queue.
+              Stops after maxCount requests or once the gas left can't cover
+              another request.
+     * @param maxCount Maximum number of requests to process
+     * @return processed Number of requests removed from the queue
      */
-    function processWithdrawRequests(uint256 requestIndex) external {
+    function processWithdrawRequests(uint256 maxCount)
+        external
+        returns (uint256 processed)
+    {
         require(
             block.timestamp > fixedExpiry,
             "Withdraw requests can't be processed before expiry"
         );
-        WithdrawRequest storage withdrawRequest = WithdrawRequestQueue[
-            requestIndex
-        ];
-        withdraw(withdrawRequest.withdraw_amount, withdrawRequest.account);
-        delete WithdrawRequestQueue[requestIndex];
-        requestCount--;
+        uint256 head = withdrawRequestHead;
+        uint256 tail = withdrawRequestTail;
+        while (
+            head < tail &&
+            processed < maxCount &&
+            gasleft() > WITHDRAW_REQUEST_GAS
+        ) {
+            WithdrawRequest memory withdrawRequest = WithdrawRequestQueue[head];
+            delete WithdrawRequestQueue[head];
+            if (
+                _canWithdraw(
+                    withdrawRequest.withdraw_amount,
+                    withdrawRequest.account
+                )
+            ) {
+                withdraw(
+                    withdrawRequest.withdraw_amount,
+                    withdrawRequest.account
+                );
+            } else {
+                emit SkippedWithdrawRequest(
+                    head,
+                    withdrawRequest.withdraw_amount,
+                    withdrawRequest.account
+                );
+            }
+            head++;
+            processed++;
+        }
+        withdrawRequestHead = head;
+        requestCount = tail - head;
+    }
+
+    /*
+     * @nonce Returns up to limit pending withdraw requests, skipping the first
+              offset requests from the head of the queue
+     */
+    function pendingWithdrawRequests(uint256 offset, uint256 limit)
+        external
+        view
+        returns (WithdrawRequest[] memory requests)
+    {
+        uint256 tail = withdrawRequestTail;
+        // Clamped before adding, so that offset or limit can be
+        // type(uint256).max to mean "all"
+        if (offset >= tail - withdrawRequestHead) return requests;
+        uint256 start = withdrawRequestHead + offset;
+        if (limit > tail - start) limit = tail - start;
+
+        requests = new WithdrawRequest[](limit);
+        for (uint256 i = 0; i < limit; i++) {
+            requests[i] = WithdrawRequestQueue[start + i];
+        }
+    }
+
+    function _canWithdraw(uint256 tokenXAmount, address account)
+        internal
+        view
+        returns (bool)
+    {
+        uint256 balance = totalTokenXBalance();
+        if (balance == 0 || tokenXAmount > availableBalance()) return false;
+        uint256 burn = divCeil((tokenXAmount * totalSupply()), balance);
+        return burn > 0 && burn <= balanceOf(account);
     }
 
     /*
@@ -249,7 +332,7 @@ contract BufferIBFRPoolV5 is
             hasRole(OPTION_ISSUER_ROLE, msg.sender),
             "msg.sender is not allowed to excute the option contract"
         );
-        require(id == lockedLiquidity[msg.sender].length, "Wrong id");
+        require(id == _lockedLiquidity[msg.sender].length, "Wrong id");
         require(totalTokenXBalance() >= tokenXAmount, "Insufficient balance");
 
         require(
@@ -260,13 +343,116 @@ contract BufferIBFRPoolV5 is
         bool success = tokenX.transferFrom(msg.sender, address(this), premium);
         require(success, "The Premium transfer didn't go through");
 
-        lockedLiquidity[msg.sender].push(
-            LockedLiquidity(tokenXAmount, premium, true)
+        _lockedLiquidity[msg.sender].push(
+            _packLockedLiquidity(tokenXAmount, premium)
         );
         lockedPremium = lockedPremium + premium;
         lockedAmount = lockedAmount + tokenXAmount;
     }
 
+    /*
+     * @nonce calls by BufferCallOptions to lock the funds of consecutive options
+     * @param firstId Id of the first option in the batch
+     * @param tokenXAmounts Amounts of funds that should be locked in each option
+     * @param premiums Premiums paid for each option
+     */
+    function lockMany(
+        uint256 firstId,
+        uint256[] calldata tokenXAmounts,
+        uint256[] calldata premiums
+    ) external override {
+        require(
+            hasRole(OPTION_ISSUER_ROLE, msg.sender),
+            "msg.sender is not allowed to excute the option contract"
+        );
+        require(firstId == _lockedLiquidity[msg.sender].length, "Wrong id");
+        require(tokenXAmounts.length == premiums.length, "Wrong array length");
+
+        PackedLockedLiquidity[] storage liquidity = _lockedLiquidity[
+            msg.sender
+        ];
+        uint256 totalAmount;
+        uint256 totalPremium;
+        for (uint256 i = 0; i < tokenXAmounts.length; i++) {
+            liquidity.push(_packLockedLiquidity(tokenXAmounts[i], premiums[i]));
+            totalAmount += tokenXAmounts[i];
+            totalPremium += premiums[i];
+        }
+
+        require(totalTokenXBalance() >= totalAmount, "Insufficient balance");
+        require(
+            (lockedAmount + totalAmount) <= (totalTokenXBalance() * 8) / 10,
+            "Pool Error: Amount is too large."
+        );
+
+        bool success = tokenX.transferFrom(
+            msg.sender,
+            address(this),
+            totalPremium
+        );
+        require(success, "The Premium transfer didn't go through");
+
+        lockedPremium = lockedPremium + totalPremium;
+        lockedAmount = lockedAmount + totalAmount;
+    }
+
+    /*
+     * @nonce calls by BufferCallOptions to fold the funds locked in several
+     * options into a target option
+     * @param ids Ids of the options being merged
+     * @param targetId Id of the option receiving the funds
+     * @param tokenXAmount Amount of funds that should be locked in the target
+     * @param premium Premium of the target after the merge
+     */
+    function mergeLocks(
+        uint256[] calldata ids,
+        uint256 targetId,
+        uint256 tokenXAmount,
+        uint256 premium
+    ) external override {
+        require(
+            hasRole(OPTION_ISSUER_ROLE, msg.sender),
+            "msg.sender is not allowed to excute the option contract"
+        );
+        uint256 totalAmount;
+        uint256 totalPremium;
+        for (uint256 i = 0; i < ids.length; i++) {
+            PackedLockedLiquidity storage ll = _lockedLiquidity[msg.sender][
+                ids[i]
+            ];
+            require(
+                ll.locked,
+                "LockedLiquidity with such id has already unlocked"
+            );
+            ll.locked = false;
+            totalAmount += ll.amount;
+            totalPremium += ll.premium;
+        }
+
+        PackedLockedLiquidity storage target = _lockedLiquidity[msg.sender][
+            targetId
+        ];
+        require(
+            target.locked,
+            "LockedLiquidity with such id has already unlocked"
+        );
+        totalAmount += target.amount;
+        totalPremium += target.premium;
+        require(tokenXAmount <= totalAmount, "Merge amount is too large");
+        require(premium <= totalPremium, "Merge premium is too large");
+
+        // Like unlockWithoutProfit on every id and lockChange on the target:
+        // the merged ids' premiums stay in the pool and only a drop below the
+        // target's own premium is refunded
+        if (target.premium > premium) {
+            tokenX.transfer(msg.sender, target.premium - premium);
+        }
+        lockedPremium = lockedPremium - totalPremium + premium;
+        lockedAmount = lockedAmount - totalAmount + tokenXAmount;
+        target.premium = _toUint120(premium);
+        target.amount = _toUint120(tokenXAmount);
+    }
+
     /*
      * @nonce calls by BufferCallOptions to lock the funds
      * @param tokenXAmount Amount of funds that should be locked in an option
@@ -280,15 +466,63 @@ contract BufferIBFRPoolV5 is
             hasRole(OPTION_ISSUER_ROLE, msg.sender),
             "msg.sender is not allowed to excute the option contract"
         );
-        LockedLiquidity storage ll = lockedLiquidity[msg.sender][id];
+        PackedLockedLiquidity storage ll = _lockedLiquidity[msg.sender][id];
         require(ll.locked, "LockedLiquidity with such id has already unlocked");
         if (ll.premium > premium) {
             tokenX.transfer(msg.sender, ll.premium - premium);
         }
-        ll.premium = premium;
-        ll.amount = tokenXAmount;
         lockedPremium = lockedPremium - ll.premium + premium;
         lockedAmount = lockedAmount - ll.amount + tokenXAmount;
+        ll.premium = _toUint120(premium);
+        ll.amount = _toUint120(tokenXAmount);
+    }
+
+    /*
+     * @nonce calls by BufferCallOptions to move part of a locked position
+     * into newly created consecutive options
+     * @param id Id of the option being split
+     * @param tokenXAmount Amount of funds that stays locked in the option
+     * @param premium Premium that stays with the option
+     * @param firstId Id of the first new option
+     * @param tokenXAmounts Amounts of funds that should be locked in each new option
+     * @param premiums Premiums of each new option
+     */
+    function splitLock(
+        uint256 id,
+        uint256 tokenXAmount,
+        uint256 premium,
+        uint256 firstId,
+        uint256[] calldata tokenXAmounts,
+        uint256[] calldata premiums
+    ) external override {
+        require(
+            hasRole(OPTION_ISSUER_ROLE, msg.sender),
+            "msg.sender is not allowed to excute the option contract"
+        );
+        require(firstId == _lockedLiquidity[msg.sender].length, "Wrong id");
+        require(tokenXAmounts.length == premiums.length, "Wrong array length");
+        PackedLockedLiquidity storage ll = _lockedLiquidity[msg.sender][id];
+        require(ll.locked, "LockedLiquidity with such id has already unlocked");
+
+        uint256 totalAmount = tokenXAmount;
+        uint256 totalPremium = premium;
+        for (uint256 i = 0; i < tokenXAmounts.length; i++) {
+            _lockedLiquidity[msg.sender].push(
+                _packLockedLiquidity(tokenXAmounts[i], premiums[i])
+            );
+            totalAmount += tokenXAmounts[i];
+            totalPremium += premiums[i];
+        }
+        require(totalAmount <= ll.amount, "Split amount is too large");
+        require(totalPremium <= ll.premium, "Split premium is too large");
+
+        if (ll.premium > totalPremium) {
+            tokenX.transfer(msg.sender, ll.premium - totalPremium);
+        }
+        lockedPremium = lockedPremium - ll.premium + totalPremium;
+        lockedAmount = lockedAmount - ll.amount + totalAmount;
+        ll.premium = _toUint120(premium);
+        ll.amount = _toUint120(tokenXAmount);
     }
 
     /*
@@ -300,7 +534,7 @@ contract BufferIBFRPoolV5 is
             hasRole(OPTION_ISSUER_ROLE, msg.sender),
             "msg.sender is not allowed to excute the option contract"
         );
-        LockedLiquidity storage ll = lockedLiquidity[msg.sender][id];
+        PackedLockedLiquidity storage ll = _lockedLiquidity[msg.sender][id];
         require(ll.locked, "LockedLiquidity with such id has already unlocked");
         ll.locked = false;
 
@@ -319,6 +553,34 @@ contract BufferIBFRPoolV5 is
         emit Profit(id, premium);
     }
 
+    /*
+     * @nonce calls by BufferOptions to unlock the funds of several options
+     * @param ids Ids of LockedLiquidity that should be unlocked
+     */
+    function unlockMany(uint256[] calldata ids) external override {
+        require(
+            hasRole(OPTION_ISSUER_ROLE, msg.sender),
+            "msg.sender is not allowed to excute the option contract"
+        );
+        uint256 totalAmount;
+        uint256 totalPremium;
+        for (uint256 i = 0; i < ids.length; i++) {
+            PackedLockedLiquidity storage ll = _lockedLiquidity[msg.sender][
+                ids[i]
+            ];
+            require(
+                ll.locked,
+                "LockedLiquidity with such id has already unlocked"
+            );
+            ll.locked = false;
+            totalAmount += ll.amount;
+            totalPremium += ll.premium;
+            emit Profit(ids[i], ll.premium);
+        }
+        lockedPremium = lockedPremium - totalPremium;
+        lockedAmount = lockedAmount - totalAmount;
+    }
+
     /*
      * @nonce calls by BufferOptions to unlock the funds
      * @param id Id of LockedLiquidity that should be unlocked
@@ -341,7 +603,7 @@ contract BufferIBFRPoolV5 is
             hasRole(OPTION_ISSUER_ROLE, msg.sender),
             "msg.sender is not allowed to excute the option contract"
         );
-        LockedLiquidity storage ll = lockedLiquidity[msg.sender][id];
+        PackedLockedLiquidity storage ll = _lockedLiquidity[msg.sender][id];
         require(ll.locked, "LockedLiquidity with such id has already unlocked");
         require(to != address(0));
 
@@ -350,7 +612,7 @@ contract BufferIBFRPoolV5 is
         lockedAmount = lockedAmount - ll.amount;
 
         uint256 transferTokenXAmount = tokenXAmount > ll.amount
-            ? ll.amount
+            ? uint256(ll.amount)
             : tokenXAmount;
 
         bool success = tokenX.transfer(to, transferTokenXAmount);
@@ -361,6 +623,63 @@ contract BufferIBFRPoolV5 is
         else emit Loss(id, transferTokenXAmount - ll.premium);
     }
 
+    /*
+     * @nonce calls by BufferCallOptions to send the payouts of several options,
+     * transferring once for consecutive options of the same holder
+     * @param ids Ids of the options
+     * @param accounts Holder of each option
+     * @param tokenXAmounts Funds that should be sent for each option
+     */
+    function sendMany(
+        uint256[] calldata ids,
+        address[] calldata accounts,
+        uint256[] calldata tokenXAmounts
+    ) external override {
+        require(
+            hasRole(OPTION_ISSUER_ROLE, msg.sender),
+            "msg.sender is not allowed to excute the option contract"
+        );
+        require(
+            ids.length == accounts.length &&
+                ids.length == tokenXAmounts.length,
+            "Wrong array length"
+        );
+        uint256 totalAmount;
+        uint256 totalPremium;
+        uint256 pending;
+        for (uint256 i = 0; i < ids.length; i++) {
+            PackedLockedLiquidity storage ll = _lockedLiquidity[msg.sender][
+                ids[i]
+            ];
+            require(
+                ll.locked,
+                "LockedLiquidity with such id has already unlocked"
+            );
+            require(accounts[i] != address(0));
+            ll.locked = false;
+            totalAmount += ll.amount;
+            totalPremium += ll.premium;
+
+            uint256 transferTokenXAmount = tokenXAmounts[i] > ll.amount
+                ? uint256(ll.amount)
+                : tokenXAmounts[i];
+            pending += transferTokenXAmount;
+            if (i + 1 == ids.length || accounts[i + 1] != accounts[i]) {
+                require(
+                    tokenX.transfer(accounts[i], pending),
+                    "The Payout transfer didn't go through"
+                );
+                pending = 0;
+            }
+
+            if (transferTokenXAmount <= ll.premium)
+                emit Profit(ids[i], ll.premium - transferTokenXAmount);
+            else emit Loss(ids[i], transferTokenXAmount - ll.premium);
+        }
+        lockedPremium = lockedPremium - totalPremium;
+        lockedAmount = lockedAmount - totalAmount;
+    }
+
     /*
      * @nonce Returns provider's share in X
      * @param account Provider's address
@@ -393,6 +712,42 @@ contract BufferIBFRPoolV5 is
         return tokenX.balanceOf(address(this)) - lockedPremium;
     }
 
+    /*
+     * @nonce Returns the funds locked by an option issuer for an option
+     * @param issuer Address of the option contract
+     * @param id Id of the option
+     */
+    function lockedLiquidity(address issuer, uint256 id)
+        external
+        view
+        returns (
+            uint256 amount,
+            uint256 premium,
+            bool locked
+        )
+    {
+        PackedLockedLiquidity memory ll = _lockedLiquidity[issuer][id];
+        return (ll.amount, ll.premium, ll.locked);
+    }
+
+    function _packLockedLiquidity(uint256 tokenXAmount, uint256 premium)
+        internal
+        pure
+        returns (PackedLockedLiquidity memory)
+    {
+        return
+            PackedLockedLiquidity(
+                _toUint120(tokenXAmount),
+                _toUint120(premium),
+                true
+            );
+    }
+
+    function _toUint120(uint256 value) internal pure returns (uint120) {
+        require(value <= type(uint120).max, "Value doesn't fit in 120 bits");
+        return uint120(value);
+    }
+
     function divCeil(uint256 a, uint256 b) internal pure returns (uint256) {
         require(b > 0);
         uint256 c = a / b;
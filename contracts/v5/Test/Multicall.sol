@@ -0,0 +1,37 @@
+pragma solidity ^0.8.0;
+
+/**
+ * SPDX-License-Identifier: GPL-3.0-or-later
+ */
+
+/**
+ * @title Batched view calls used by the test suite
+ * @notice Runs a list of static calls in one eth_call. A failing call is
+ * reported instead of reverting the batch
+ */
+contract Multicall {
+    struct Call {
+        address target;
+        bytes callData;
+    }
+
+    struct Result {
+        bool success;
+        bytes returnData;
+    }
+
+    function aggregate(Call[] calldata calls)
+        external
+        view
+        returns (uint256 blockNumber, Result[] memory results)
+    {
+        blockNumber = block.number;
+        results = new Result[](calls.length);
+        for (uint256 i = 0; i < calls.length; i++) {
+            (bool success, bytes memory returnData) = calls[i]
+                .target
+                .staticcall(calls[i].callData);
+            results[i] = Result(success, returnData);
+        }
+    }
+}
@@ -0,0 +1,92 @@
+pragma solidity ^0.8.0;
+
+/**
+ * SPDX-License-Identifier: GPL-3.0-or-later
+ */
+
+import "../../Interfaces/InterfacesV5.sol";
+
+/**
+ * @title TWAP stand-in that replays a recorded price path
+ * @notice Quotes the price of the current step of a path loaded with
+ * appendPrices, with a factor of 1e8. Once started, the path advances one
+ * step every `stepSize` blocks, or every `stepSize` seconds when stepping by
+ * timestamp, and holds its last price after the end.
+ */
+contract PricePathOracle is ISlidingWindowOracle {
+    uint256[] public prices;
+    uint256 public origin;
+    uint256 public stepSize;
+    bool public byTimestamp;
+
+    event AppendPrices(uint256 count, uint256 length);
+    event Start(uint256 origin, uint256 stepSize, bool byTimestamp);
+
+    /**
+     * @notice Appends a chunk of the path, in steps of 1e8
+     * @param values Prices to append
+     */
+    function appendPrices(uint256[] calldata values) external {
+        for (uint256 i = 0; i < values.length; i++) {
+            prices.push(values[i]);
+        }
+        emit AppendPrices(values.length, prices.length);
+    }
+
+    /**
+     * @notice Drops the loaded path
+     */
+    function clear() external {
+        delete prices;
+        origin = 0;
+        stepSize = 0;
+    }
+
+    /**
+     * @notice Starts replaying the path from its first step in this block
+     * @param _stepSize Blocks (or seconds) per step
+     * @param _byTimestamp Step by block.timestamp instead of block.number
+     */
+    function start(uint256 _stepSize, bool _byTimestamp) external {
+        require(prices.length > 0, "No price path loaded");
+        require(_stepSize > 0, "Step size can't be zero");
+        stepSize = _stepSize;
+        byTimestamp = _byTimestamp;
+        origin = _byTimestamp ? block.timestamp : block.number;
+        emit Start(origin, _stepSize, _byTimestamp);
+    }
+
+    function pathLength() external view returns (uint256) {
+        return prices.length;
+    }
+
+    /**
+     * @notice Index of the step quoted in the current block
+     */
+    function currentStep() public view returns (uint256 step) {
+        require(stepSize > 0, "Price path not started");
+        uint256 elapsed = (byTimestamp ? block.timestamp : block.number) -
+            origin;
+        step = elapsed / stepSize;
+        if (step >= prices.length) {
+            step = prices.length - 1;
+        }
+    }
+
+    function consult(
+        address,
+        uint256 amountIn,
+        address
+    ) external view override returns (uint256 amountOut) {
+        amountOut = (prices[currentStep()] * amountIn) / 1e8;
+    }
+
+    function observationIndexOf(uint256)
+        external
+        pure
+        override
+        returns (uint256 index)
+    {
+        index = 0;
+    }
+}
@@ -0,0 +1,43 @@
+pragma solidity ^0.8.0;
+
+/**
+ * SPDX-License-Identifier: GPL-3.0-or-later
+ */
+
+import "../../Interfaces/InterfacesV5.sol";
+
+/**
+ * @title TWAP stand-in used by the test suite
+ * @notice Quotes a settable price with a factor of 1e8 instead of a pair TWAP
+ */
+contract SlidingWindowOracleTest is ISlidingWindowOracle {
+    uint256 public price;
+
+    event UpdatePrice(uint256 value);
+
+    constructor(uint256 initialPrice) {
+        price = initialPrice;
+    }
+
+    function setPrice(uint256 value) external {
+        price = value;
+        emit UpdatePrice(value);
+    }
+
+    function consult(
+        address,
+        uint256 amountIn,
+        address
+    ) external view override returns (uint256 amountOut) {
+        amountOut = (price * amountIn) / 1e8;
+    }
+
+    function observationIndexOf(uint256)
+        external
+        pure
+        override
+        returns (uint256 index)
+    {
+        index = 0;
+    }
+}
@@ -0,0 +1,17 @@
+pragma solidity ^0.8.0;
+
+/**
+ * SPDX-License-Identifier: GPL-3.0-or-later
+ */
+
+import "@openzeppelin/contracts/token/ERC20/ERC20.sol";
+
+/**
+ * @title TokenX stand-in used by the test suite
+ * @notice Mints the whole supply to the deployer
+ */
+contract TokenXTest is ERC20("TokenX", "TKX") {
+    constructor(uint256 initialSupply) {
+        _mint(msg.sender, initialSupply);
+    }
+}
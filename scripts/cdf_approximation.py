@@ -0,0 +1,140 @@
+"""
+Fit and error sweep of ``OptionMath._NFast``.
+
+``_NFast`` replaces the ``exp``, ``sqrt`` and ``div`` of Choudhury's CDF
+approximation (``_N``) with degree 6 polynomials of the tail
+``v(|x|) = exp(-x^2 / 2) / (a + b|x| + c sqrt(x^2 + 3))`` on intervals of 0.5
+below 6, so that ``N(x) = v(|x|)`` for ``x <= 0`` and ``1 - v(|x|)`` above.
+Past 6 the tail is below 1e-9 and is taken as 0.
+
+``fit_coefficients`` regenerates ``FAST_CDF_COEFFICIENTS`` (a least squares
+Chebyshev fit per interval, rounded to 64.64 fixed point) and
+``error_sweep`` evaluates the integer ``_NFast`` mirror at every multiple of
+``2^-step_bits`` up to ``limit``. Both CDFs are built from the same tail for
+either sign, so sweeping ``|x|`` covers negative inputs too. The maximum
+absolute error against Choudhury's approximation is 4.04e-9 (at the
+default 2^-16 grid), which ``MAX_ERROR`` rounds up.
+"""
+
+import numpy as np
+from numpy.polynomial import chebyshev, polynomial
+
+from scripts.option_pricing import (
+    FAST_CDF_COEFFICIENTS,
+    FAST_CDF_INTERVAL_BITS,
+    black_scholes_price,
+    n_64x64,
+    n_cdf,
+)
+
+MAX_ERROR = 4.1e-9
+ONE_64x64 = 1 << 64
+
+
+def choudhury_tail(x):
+    """``v(|x|)`` of Choudhury's approximation in float64."""
+    x = np.abs(np.asarray(x, dtype=np.float64))
+    return np.exp(-x * x / 2) / (
+        2260 / 3989 + 6400 / 3989 * x + 3300 / 3989 * np.sqrt(x * x + 3)
+    )
+
+
+def fit_coefficients(
+    interval=0.5, cutoff=6.0, degree=6, samples=4001, tail=choudhury_tail
+):
+    """
+    Returns one tuple of 64.64 polynomial coefficients (lowest degree first)
+    per interval, in the offset from the start of the interval.
+    """
+    rows = []
+    offsets = np.linspace(0, interval, samples)
+    for start in np.arange(0, cutoff, interval):
+        fit = chebyshev.Chebyshev.fit(
+            offsets, tail(start + offsets), degree, domain=[0, interval]
+        )
+        coefficients = fit.convert(
+            kind=polynomial.Polynomial, domain=[0, interval], window=[0, interval]
+        ).coef
+        rows.append(tuple(int(round(c * ONE_64x64)) for c in coefficients))
+    return tuple(rows)
+
+
+def _fast_tail_exact(x_abs):
+    """``n_fast_64x64(-x)`` for an object array of 64.64 ``x >= 0``."""
+    value = np.zeros(x_abs.shape, dtype=object)
+    intervals = np.array([int(x) >> FAST_CDF_INTERVAL_BITS for x in x_abs])
+    for interval, coefficients in enumerate(FAST_CDF_COEFFICIENTS):
+        mask = intervals == interval
+        offset = x_abs[mask] - (interval << FAST_CDF_INTERVAL_BITS)
+        result = np.full(offset.shape, coefficients[-1], dtype=object)
+        for coefficient in coefficients[-2::-1]:
+            result = ((result * offset) >> 64) + coefficient
+        value[mask] = np.maximum(result, 0)
+    return value
+
+
+def error_sweep(limit=8, step_bits=16, reference_samples=2000, seed=0):
+    """
+    Evaluates ``_NFast`` at every multiple of ``2^-step_bits`` in
+    ``[0, limit]`` against Choudhury's approximation in float64 (whose own
+    rounding is ~1e-16) and returns ``{"max_error", "at", "points",
+    "reference_error"}``. ``reference_error`` is the largest difference
+    between the float64 reference and the contract's ``_N`` (the integer
+    mirror) over ``reference_samples`` random grid points.
+    """
+    x_abs = np.arange(0, (limit << step_bits) + 1, dtype=object) << (64 - step_bits)
+    fast = _fast_tail_exact(x_abs).astype(np.float64) / ONE_64x64
+    x = x_abs.astype(np.float64) / ONE_64x64
+    errors = np.abs(fast - choudhury_tail(x))
+    worst = int(np.argmax(errors))
+
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(x_abs), min(reference_samples, len(x_abs)), False)
+    reference_error = max(
+        abs(n_64x64(-int(x_abs[i])) / ONE_64x64 - float(n_cdf(-x[i]))) for i in sample
+    )
+    return {
+        "max_error": float(errors[worst]),
+        "at": float(x[worst]),
+        "points": len(x_abs),
+        "reference_error": reference_error,
+    }
+
+
+def d_range(implied_vols, periods, moneyness):
+    """
+    Smallest and largest ``d1``/``d2`` over the grid of implied volatilities
+    (factor 1e4), periods (seconds) and spot/strike ratios given.
+    """
+    iv, period, ratio = np.meshgrid(
+        np.asarray(implied_vols, dtype=np.float64) / 1e4,
+        np.asarray(periods, dtype=np.float64) / (365 * 86400),
+        np.asarray(moneyness, dtype=np.float64),
+        indexing="ij",
+    )
+    sqrt_variance = iv * np.sqrt(period)
+    d1 = (np.log(ratio) + sqrt_variance**2 / 2) / sqrt_variance
+    d2 = d1 - sqrt_variance
+    return float(min(d1.min(), d2.min())), float(max(d1.max(), d2.max()))
+
+
+def premium_error(implied_vols, periods, spots, strike):
+    """
+    Largest absolute difference (factor 1e8) between the float64
+    ``blackScholesPriceFast`` and ``blackScholesPrice`` over the grid, for
+    calls and puts.
+    """
+    iv, period, spot = np.meshgrid(implied_vols, periods, spots, indexing="ij")
+    return max(
+        float(
+            np.max(
+                np.abs(
+                    black_scholes_price(iv, strike, spot, period, is_call)
+                    - black_scholes_price(
+                        iv, strike, spot, period, is_call, fast_cdf=True
+                    )
+                )
+            )
+        )
+        for is_call in (True, False)
+    )
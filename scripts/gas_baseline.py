@@ -0,0 +1,104 @@
+"""
+Regenerates the gas baseline from an earlier revision.
+
+``python -m scripts.gas_baseline [revision]`` checks ``revision`` (by default
+``BASELINE_REVISION``, the code before any of the gas work) out into a
+temporary git worktree, copies this checkout's benchmark harness over it and
+runs the gas benchmarks with ``GAS_UPDATE_BASELINE=1``. The result is written
+to ``GAS_BASELINE`` (by default ``tests/gas_baseline.json`` of the current
+checkout), so that the regression check compares the working tree against the
+code as it was at ``revision``. Benchmarks of entry points that don't exist at
+``revision`` are skipped and are left out of the baseline.
+
+The regression check calls ``ensure`` and so generates a missing baseline on
+its first run; commit the generated file. The baseline chain runs on the
+configured port plus ``PORT_OFFSET`` so that it doesn't collide with the chain
+of the calling test run.
+
+Extra arguments are passed on to ``brownie test`` (e.g. ``-n auto``).
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from scripts.gas_benchmark import BASELINE_PATH, BASELINE_REVISION
+
+# Copied over the checked out revision, so that every revision is measured by
+# the same benchmarks on the same deployment
+HARNESS = (
+    "tests/conftest.py",
+    "tests/test_gas_benchmarks.py",
+    "scripts",
+    "contracts/v5/Test",
+)
+PORT_OFFSET = 100
+
+
+def _copy_harness(worktree):
+    root = Path(__file__).resolve().parent.parent
+    for path in HARNESS:
+        source, target = root / path, worktree / path
+        if source.is_dir():
+            shutil.copytree(
+                source,
+                target,
+                dirs_exist_ok=True,
+                ignore=shutil.ignore_patterns("__pycache__"),
+            )
+        else:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source, target)
+
+
+def generate(
+    revision=BASELINE_REVISION,
+    baseline_path=BASELINE_PATH,
+    brownie_args=(),
+    port_offset=PORT_OFFSET,
+):
+    baseline_path = Path(baseline_path).resolve()
+    with tempfile.TemporaryDirectory() as tmp:
+        worktree = Path(tmp) / "baseline"
+        subprocess.run(
+            ["git", "worktree", "add", "--detach", str(worktree), revision],
+            check=True,
+        )
+        try:
+            _copy_harness(worktree)
+            env = dict(
+                os.environ,
+                GAS_UPDATE_BASELINE="1",
+                GAS_BASELINE=str(baseline_path),
+                GAS_REPORT=str(Path(tmp) / "report.json"),
+                GAS_BASELINE_PORT_OFFSET=str(port_offset),
+            )
+            env.pop("WARM_START", None)
+            subprocess.run(
+                ["brownie", "test", "tests/test_gas_benchmarks.py", *brownie_args],
+                cwd=worktree,
+                env=env,
+                check=True,
+            )
+        finally:
+            subprocess.run(
+                ["git", "worktree", "remove", "--force", str(worktree)], check=True
+            )
+    return baseline_path
+
+
+def ensure(baseline_path=BASELINE_PATH, revision=BASELINE_REVISION):
+    """Generates the baseline from ``revision`` unless it already exists."""
+    if not Path(baseline_path).exists():
+        generate(revision, baseline_path)
+    return Path(baseline_path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] in ("-h", "--help"):
+        sys.exit(__doc__)
+    revision = sys.argv[1] if len(sys.argv) > 1 else BASELINE_REVISION
+    print(f"baseline written to {generate(revision, brownie_args=sys.argv[2:])}")
@@ -0,0 +1,161 @@
+"""
+Gas accounting helpers for the benchmark suite.
+
+``GasBenchmark`` records ``tx.gas_used`` for an entry point at a given batch
+size, breaks the gas down per external call into tracked contracts (taken from
+the ``debug_traceTransaction`` trace) and compares the result against a stored
+baseline.
+
+The report and baseline paths, the regression threshold and the revision the
+baseline is generated from are read from the ``GAS_REPORT``, ``GAS_BASELINE``,
+``GAS_REGRESSION_THRESHOLD`` and ``GAS_BASELINE_REVISION`` environment
+variables, so that serial and xdist runs check against the same settings.
+"""
+
+import json
+import os
+from pathlib import Path
+
+REPORT_PATH = os.environ.get("GAS_REPORT", "reports/gas_benchmarks.json")
+BASELINE_PATH = os.environ.get("GAS_BASELINE", "tests/gas_baseline.json")
+THRESHOLD = float(os.environ.get("GAS_REGRESSION_THRESHOLD", "5"))
+UPDATE_BASELINE = bool(os.environ.get("GAS_UPDATE_BASELINE"))
+# The code before any of the gas work
+BASELINE_REVISION = os.environ.get("GAS_BASELINE_REVISION", "044e013")
+
+
+def external_call_gas(tx, contract_names):
+    """
+    Returns ``{fn: {"count": n, "gas_used": gas}}`` for every external call
+    made by ``tx`` into one of ``contract_names``.
+
+    Gas is measured inside the callee frame, so it includes nested calls made
+    by the callee (e.g. token transfers) but not the caller's CALL overhead.
+    """
+    trace = tx.trace
+    calls = {}
+    for i in range(1, len(trace)):
+        step = trace[i]
+        depth = trace[i - 1]["depth"]
+        if step["depth"] <= depth or step["contractName"] not in contract_names:
+            continue
+        end = i
+        while end + 1 < len(trace) and trace[end + 1]["depth"] > depth:
+            end += 1
+        gas_used = step["gas"] - trace[end]["gas"] + trace[end]["gasCost"]
+        entry = calls.setdefault(step["fn"], {"count": 0, "gas_used": 0})
+        entry["count"] += 1
+        entry["gas_used"] += gas_used
+    return calls
+
+
+class GasBenchmark:
+    """
+    Collects gas measurements keyed by entry point and batch size.
+
+    Attributes
+    ----------
+    tracked_contracts : tuple
+        Contract names whose external calls are broken out per function.
+    results : dict
+        ``{name: {size: {"gas_used", "per_item", "calls"}}}``
+    """
+
+    def __init__(self, tracked_contracts=("BufferIBFRPoolV5",)):
+        self.tracked_contracts = tuple(tracked_contracts)
+        self.results = {}
+
+    def record(self, name, size, tx):
+        """
+        Stores the gas used by ``tx`` for ``name`` at batch ``size``. ``tx``
+        may also be a list of transactions, which are recorded as one entry
+        (e.g. ``size`` separate calls compared against one batched call).
+        """
+        txs = tx if isinstance(tx, (list, tuple)) else [tx]
+        gas_used = sum(t.gas_used for t in txs)
+        calls = {}
+        for t in txs:
+            for fn, call in external_call_gas(t, self.tracked_contracts).items():
+                entry = calls.setdefault(fn, {"count": 0, "gas_used": 0})
+                entry["count"] += call["count"]
+                entry["gas_used"] += call["gas_used"]
+        self.results.setdefault(name, {})[str(size)] = {
+            "gas_used": gas_used,
+            "per_item": gas_used // max(size, 1),
+            "calls": calls,
+        }
+        return tx
+
+    def annotate(self, name, size, **values):
+        """Adds extra figures (e.g. gas saved per call) to a recorded entry."""
+        self.results[name][str(size)].update(values)
+
+    def merge(self, results):
+        """Adds the results of another run (e.g. an xdist worker)."""
+        for name, sizes in results.items():
+            self.results.setdefault(name, {}).update(sizes)
+
+    def flatten(self, results=None):
+        """Returns ``{path: gas}`` for every total and per-call measurement."""
+        flat = {}
+        for name, sizes in (self.results if results is None else results).items():
+            for size, result in sizes.items():
+                key = f"{name}[{size}]"
+                flat[key] = result["gas_used"]
+                for fn, call in result["calls"].items():
+                    flat[f"{key} {fn}"] = call["gas_used"]
+        return flat
+
+    def compare(self, baseline):
+        """
+        Returns ``(path, baseline_gas, current_gas, percent_change)`` for every
+        path measured both in ``baseline`` and in this run.
+        """
+        previous = self.flatten(baseline)
+        rows = []
+        for path, gas in sorted(self.flatten().items()):
+            if path not in previous or not previous[path]:
+                continue
+            change = (gas - previous[path]) * 100 / previous[path]
+            rows.append((path, previous[path], gas, round(change, 2)))
+        return rows
+
+    def regressions(self, baseline, threshold):
+        """
+        Compares against a baseline report and returns the ``compare`` rows
+        whose gas grew by more than ``threshold`` percent.
+        """
+        return [row for row in self.compare(baseline) if row[3] > threshold]
+
+    def write(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w") as fp:
+            json.dump(self.results, fp, indent=2, sort_keys=True)
+
+    def check(
+        self,
+        report_path=REPORT_PATH,
+        baseline_path=BASELINE_PATH,
+        threshold=THRESHOLD,
+        update_baseline=UPDATE_BASELINE,
+    ):
+        """
+        Writes the report and compares it against the baseline.
+
+        Returns the ``(rows, failures)`` of ``compare`` and ``regressions``,
+        or None when the baseline was updated or doesn't exist.
+        """
+        self.write(report_path)
+        if update_baseline:
+            self.write(baseline_path)
+            return None
+        if not os.path.exists(baseline_path):
+            return None
+        baseline = self.load(baseline_path)
+        return self.compare(baseline), self.regressions(baseline, threshold)
+
+    @staticmethod
+    def load(path):
+        with Path(path).open() as fp:
+            return json.load(fp)
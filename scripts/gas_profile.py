@@ -0,0 +1,146 @@
+"""
+Gas hotspots of a transaction, per source function and line.
+
+``folded_stacks`` walks the ``debug_traceTransaction`` trace of a transaction
+(``tx.trace``, which brownie already maps to source functions with the
+compiler source maps) and charges the gas of every opcode to the stack of
+functions executing it, external calls and internal jumps alike, with the
+source line as the last frame. ``write_folded`` saves the result in the
+folded-stack format read by ``flamegraph.pl`` and speedscope, and
+``hotspots`` sums it per function or per line.
+
+Every opcode is charged what it actually cost (the drop in remaining gas to
+the next opcode of the same frame), so memory expansion is included and a
+CALL is only charged its own overhead, not the gas spent by the callee.
+"""
+
+import bisect
+from collections import Counter
+from pathlib import Path
+
+
+class _Sources:
+    """Line lookup of source offsets, reading files relative to the project."""
+
+    def __init__(self, root="."):
+        self.root = Path(root)
+        self._lines = {}
+
+    def line(self, source):
+        if not source:
+            return None
+        filename = source["filename"]
+        if filename not in self._lines:
+            path = Path(filename)
+            if not path.is_absolute():
+                path = self.root / path
+            try:
+                text = path.read_bytes()
+            except OSError:
+                text = None
+            self._lines[filename] = (
+                None
+                if text is None
+                else [i for i, c in enumerate(text) if c == ord("\n")]
+            )
+        newlines = self._lines[filename]
+        if newlines is None:
+            return None
+        return bisect.bisect_right(newlines, source["offset"][0]) + 1
+
+
+def step_costs(trace):
+    """Gas charged to every step of ``trace``, excluding nested calls."""
+    count = len(trace)
+    # Index of the next step in the same frame, or None when the frame ends
+    next_in_frame = [None] * count
+    last_seen = {}
+    for i in range(count - 1, -1, -1):
+        depth = trace[i]["depth"]
+        next_in_frame[i] = last_seen.get(depth)
+        last_seen[depth] = i
+        for deeper in [d for d in last_seen if d > depth]:
+            del last_seen[deeper]
+
+    costs = [0] * count
+    for i, step in enumerate(trace):
+        following = next_in_frame[i]
+        if following is None:
+            costs[i] = step["gasCost"]
+            continue
+        costs[i] = step["gas"] - trace[following]["gas"]
+        if following > i + 1:
+            # The callee's steps are charged to the callee
+            last = following - 1
+            costs[i] -= (
+                trace[i + 1]["gas"] - trace[last]["gas"] + trace[last]["gasCost"]
+            )
+    return costs
+
+
+def folded_stacks(tx, lines=True, root="."):
+    """
+    Returns a Counter of ``"frame;frame;...": gas`` for ``tx``. Frames are
+    brownie function names (``Contract.function``); with ``lines`` the leaf
+    frame is followed by its ``file:line``.
+    """
+    trace = tx.trace
+    sources = _Sources(root)
+    costs = step_costs(trace)
+    frames = []
+    folded = Counter()
+    for step, cost in zip(trace, costs):
+        depth, jump_depth = step["depth"], step["jumpDepth"]
+        del frames[depth + 1 :]
+        while len(frames) <= depth:
+            frames.append([])
+        internal = frames[depth]
+        del internal[jump_depth + 1 :]
+        while len(internal) <= jump_depth:
+            internal.append(step["fn"])
+        internal[jump_depth] = step["fn"]
+
+        stack = [fn for frame in frames for fn in frame]
+        line = sources.line(step["source"]) if lines else None
+        if line is not None:
+            stack.append(f"{Path(step['source']['filename']).name}:{line}")
+        folded[";".join(str(fn) for fn in stack)] += cost
+    return folded
+
+
+def write_folded(folded, path):
+    """Writes ``folded`` as one ``stack gas`` line per stack."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(
+        "".join(f"{stack} {gas}\n" for stack, gas in sorted(folded.items()) if gas)
+    )
+
+
+def hotspots(folded, by="function", inclusive=True, top=None):
+    """
+    Sums ``folded`` per ``"function"`` or ``"line"`` and returns
+    ``[(name, gas), ...]`` sorted by gas. Inclusive function gas counts every
+    function on the stack, exclusive only the innermost one.
+    """
+    totals = Counter()
+    for stack, gas in folded.items():
+        frames = stack.split(";")
+        if by == "line":
+            if _is_line(frames[-1]):
+                totals[frames[-1]] += gas
+            continue
+        functions = [f for f in frames if not _is_line(f)]
+        for fn in set(functions) if inclusive else functions[-1:]:
+            totals[fn] += gas
+    return totals.most_common(top)
+
+
+def _is_line(frame):
+    name, _, line = frame.rpartition(":")
+    return bool(name) and line.isdigit()
+
+
+def format_hotspots(rows, total):
+    """One ``gas  share  name`` line per hotspot."""
+    return "\n".join(f"{gas:>9} {gas / total:7.2%}  {name}" for name, gas in rows)
@@ -0,0 +1,373 @@
+"""
+Asyncio load driver for BufferTokenXOptionsV5.
+
+``LoadDriver`` signs transactions locally for a set of funded accounts and
+submits them over JSON-RPC with up to ``depth`` transactions in flight per
+account (nonces are assigned locally, so an account never waits for its
+previous receipt). Every account picks its next operation from a weighted
+mix of ``create``, ``split``, ``merge``, ``exercise`` and ``unlock``,
+restricted to what its confirmed options allow.
+
+Statistics are closed every ``window`` created options, so the report shows
+how throughput, confirmation latency and gas per second change as the
+number of options (and with it the pool's locked liquidity list and the
+ERC3525 slot sets) grows.
+"""
+
+import asyncio
+import itertools
+import random
+import time
+
+import aiohttp
+import numpy as np
+from eth_account import Account
+from eth_utils import event_abi_to_log_topic, to_checksum_address
+from hexbytes import HexBytes
+from web3 import Web3
+
+DEFAULT_MIX = {"create": 5, "split": 2, "merge": 1, "exercise": 2, "unlock": 0}
+GAS_LIMITS = {
+    "create": 1_500_000,
+    "split": 3_000_000,
+    "merge": 3_000_000,
+    "exercise": 1_500_000,
+    "unlock": 6_000_000,
+}
+UNLOCK_BATCH = 20
+
+
+def _process_log(event, log):
+    # web3.py v5 names it processLog, v6 process_log
+    process = getattr(event, "process_log", None) or event.processLog
+    return process(log)
+
+
+def _encode(contract, fn_name, args):
+    encode = getattr(contract, "encode_abi", None) or contract.encodeABI
+    return encode(fn_name, args=args)
+
+
+def _raw_transaction(signed):
+    # eth-account renamed rawTransaction to raw_transaction
+    raw = getattr(signed, "raw_transaction", None) or signed.rawTransaction
+    return "0x" + bytes(raw).hex()
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+class _Portfolio:
+    """
+    Confirmed options of one account that no pending transaction uses, as
+    ``{id: (root, units)}`` where ``root`` is the created option the id was
+    split from (so ids with the same root share a slot).
+    """
+
+    def __init__(self):
+        self.options = {}
+
+    def add(self, option_id, root, units):
+        self.options[option_id] = (root, units)
+
+    def take(self, option_id):
+        return self.options.pop(option_id)
+
+    def splittable(self):
+        return [i for i, (_, units) in self.options.items() if units >= 4]
+
+    def merge_candidates(self):
+        by_root = {}
+        for option_id, (root, _) in self.options.items():
+            by_root.setdefault(root, []).append(option_id)
+        return [ids for ids in by_root.values() if len(ids) > 1]
+
+
+class _Window:
+    def __init__(self, options):
+        self.start_options = options
+        self.started = time.perf_counter()
+        self.latencies = []
+        self.gas_used = 0
+        self.failed = 0
+        self.ops = {}
+
+    def close(self, options):
+        seconds = time.perf_counter() - self.started
+        txs = len(self.latencies)
+        return {
+            "options": options,
+            "created": options - self.start_options,
+            "txs": txs,
+            "failed": self.failed,
+            "seconds": seconds,
+            "tps": txs / seconds if seconds else 0.0,
+            "gas_per_second": self.gas_used / seconds if seconds else 0.0,
+            "latency_p50": percentile(self.latencies, 50),
+            "latency_p95": percentile(self.latencies, 95),
+            "latency_p99": percentile(self.latencies, 99),
+            "ops": dict(self.ops),
+        }
+
+
+class LoadDriver:
+    """
+    Generates transaction load from many accounts.
+
+    Attributes
+    ----------
+    rpc_url : str
+        JSON-RPC endpoint of the chain.
+    private_keys : list
+        Keys of the accounts sending the load. They must hold tokenX and have
+        approved the options contract.
+    mix : dict
+        Relative weight of every operation.
+    depth : int
+        Transactions in flight per account.
+    window : int
+        Created options per statistics window.
+    """
+
+    def __init__(
+        self,
+        rpc_url,
+        options_address,
+        options_abi,
+        private_keys,
+        amount,
+        referrer,
+        mix=None,
+        depth=4,
+        window=1000,
+        poll_interval=0.005,
+        seed=0,
+    ):
+        self.rpc_url = rpc_url
+        self.contract = Web3().eth.contract(
+            address=to_checksum_address(options_address), abi=options_abi
+        )
+        self.accounts = [Account.from_key(key) for key in private_keys]
+        self.amount = amount
+        self.referrer = to_checksum_address(referrer)
+        self.mix = dict(DEFAULT_MIX if mix is None else mix)
+        if not self.mix.get("create"):
+            raise ValueError("The mix needs creates to make progress")
+        self.depth = depth
+        self.window = window
+        self.poll_interval = poll_interval
+        self.rng = random.Random(seed)
+        self._events = {}
+        for abi in options_abi:
+            if abi["type"] == "event" and abi["name"] in (
+                "Create",
+                "Split",
+                "Merge",
+                "Exercise",
+                "Expire",
+            ):
+                self._events[event_abi_to_log_topic(abi)] = getattr(
+                    self.contract.events, abi["name"]
+                )()
+        self._ids = itertools.count()
+
+    async def _rpc(self, method, params):
+        payload = {"jsonrpc": "2.0", "id": next(self._ids), "method": method}
+        payload["params"] = params
+        async with self._session.post(self.rpc_url, json=payload) as response:
+            body = await response.json(content_type=None)
+        if "error" in body:
+            raise RuntimeError(body["error"].get("message", body["error"]))
+        return body["result"]
+
+    async def _call(self, fn_name, args):
+        data = _encode(self.contract, fn_name, args)
+        return await self._rpc(
+            "eth_call", [{"to": self.contract.address, "data": data}, "latest"]
+        )
+
+    async def run(self, target_options, max_seconds=None):
+        """
+        Sends load until ``target_options`` options were created (or
+        ``max_seconds`` passed) and returns the list of window statistics;
+        the last window may be partial.
+        """
+        self.created = 0
+        self.portfolios = {account.address: _Portfolio() for account in self.accounts}
+        self.windows = []
+        self._window = _Window(0)
+        self._resync = set()
+        self._target = target_options
+        self._deadline = None if max_seconds is None else time.time() + max_seconds
+        async with aiohttp.ClientSession() as self._session:
+            self._chain_id = int(await self._rpc("eth_chainId", []), 16)
+            self.max_units = int(await self._call("maxUnits", []), 16)
+            await asyncio.gather(*(self._account_loop(a) for a in self.accounts))
+        if self._window.latencies:
+            self.windows.append(self._window.close(self.created))
+        return self.windows
+
+    def _done(self):
+        return self.created >= self._target or (
+            self._deadline is not None and time.time() > self._deadline
+        )
+
+    async def _nonce(self, address):
+        count = await self._rpc("eth_getTransactionCount", [address, "pending"])
+        return int(count, 16)
+
+    async def _account_loop(self, account):
+        nonce = await self._nonce(account.address)
+        in_flight = set()
+        slots = asyncio.Semaphore(self.depth)
+        while not self._done():
+            await slots.acquire()
+            if account.address in self._resync:
+                # A transaction was rejected before it got a nonce, so the
+                # local counter has a gap: drain and ask the node
+                slots.release()
+                await asyncio.gather(*in_flight)
+                self._resync.discard(account.address)
+                nonce = await self._nonce(account.address)
+                continue
+            operation = self._next_operation(account.address)
+            task = asyncio.ensure_future(self._send(account, nonce, operation, slots))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            nonce += 1
+            # Let the other accounts submit too
+            await asyncio.sleep(0)
+        await asyncio.gather(*in_flight)
+
+    def _next_operation(self, address):
+        """
+        Picks an operation the account can send now and reserves the options
+        it uses. Returns ``(name, args, reserved)``.
+        """
+        portfolio = self.portfolios[address]
+        feasible = {"create"}
+        if portfolio.options:
+            feasible.update(("exercise", "unlock"))
+        if portfolio.splittable():
+            feasible.add("split")
+        if portfolio.merge_candidates():
+            feasible.add("merge")
+        names = [name for name in self.mix if self.mix[name] and name in feasible]
+        name = self.rng.choices(names, [self.mix[n] for n in names])[0]
+
+        if name == "create":
+            return name, [self.amount, self.referrer, "load"], ()
+        if name == "merge":
+            ids = self.rng.choice(portfolio.merge_candidates())
+            reserved = tuple((i, portfolio.take(i)) for i in ids)
+            return name, [ids[1:], ids[0]], reserved
+        if name == "unlock":
+            ids = list(portfolio.options)[:UNLOCK_BATCH]
+            reserved = tuple((i, portfolio.take(i)) for i in ids)
+            return name, [ids], reserved
+        if name == "split":
+            option_id = self.rng.choice(portfolio.splittable())
+            reserved = ((option_id, portfolio.take(option_id)),)
+            # Two new options of a quarter each, the original keeps half
+            quarter = reserved[0][1][1] // 4
+            return name, [option_id, [quarter, quarter]], reserved
+        option_id = self.rng.choice(list(portfolio.options))
+        return name, [option_id], ((option_id, portfolio.take(option_id)),)
+
+    async def _send(self, account, nonce, operation, slots):
+        name, args, reserved = operation
+        fn_name = {"unlock": "unlockAll"}.get(name, name)
+        tx = {
+            "to": self.contract.address,
+            "data": _encode(self.contract, fn_name, args),
+            "gas": GAS_LIMITS[name],
+            "gasPrice": 0,
+            "nonce": nonce,
+            "chainId": self._chain_id,
+            "value": 0,
+        }
+        signed = account.sign_transaction(tx)
+        started = time.perf_counter()
+        try:
+            tx_hash = await self._rpc(
+                "eth_sendRawTransaction", [_raw_transaction(signed)]
+            )
+            receipt = None
+            while receipt is None:
+                receipt = await self._rpc("eth_getTransactionReceipt", [tx_hash])
+                if receipt is None:
+                    await asyncio.sleep(self.poll_interval)
+        except RuntimeError as e:
+            # Nodes that return VM errors still mine the reverted transaction
+            if "revert" not in str(e) and "invalid opcode" not in str(e):
+                self._resync.add(account.address)
+            receipt = None
+        latency = time.perf_counter() - started
+        slots.release()
+
+        portfolio = self.portfolios[account.address]
+        if receipt is None or int(receipt["status"], 16) != 1:
+            for option_id, option in reserved:
+                portfolio.add(option_id, *option)
+            self._window.failed += 1
+            return False
+        self._apply(receipt, portfolio, dict(reserved))
+        self._record(name, latency, int(receipt["gasUsed"], 16))
+        return True
+
+    def _apply(self, receipt, portfolio, reserved):
+        """Updates the portfolio from the receipt's option events."""
+        for log in receipt["logs"]:
+            event = self._events.get(bytes(HexBytes(log["topics"][0])))
+            if event is None:
+                continue
+            args = _process_log(
+                event,
+                {
+                    **log,
+                    "topics": [HexBytes(topic) for topic in log["topics"]],
+                    "data": HexBytes(log["data"]),
+                    "logIndex": int(log["logIndex"], 16),
+                    "transactionIndex": int(log["transactionIndex"], 16),
+                    "blockNumber": int(log["blockNumber"], 16),
+                },
+            )["args"]
+            name = event.event_name
+            if name == "Create":
+                portfolio.add(args["id"], args["id"], self.max_units)
+                self.created += 1
+            elif name == "Split":
+                root, units = reserved[args["tokenId"]]
+                reserved[args["tokenId"]] = (root, units - args["splitUnits"])
+                portfolio.add(args["newTokenId"], root, args["splitUnits"])
+            elif name == "Merge":
+                root, units = reserved[args["targetTokenId"]]
+                reserved[args["targetTokenId"]] = (root, units + args["mergeUnits"])
+                del reserved[args["tokenId"]]
+            elif name in ("Exercise", "Expire"):
+                del reserved[args["id"]]
+        # Options still alive after the transaction (split sources, merge
+        # targets, skipped unlocks) become available again
+        for option_id, option in reserved.items():
+            portfolio.add(option_id, *option)
+
+    def _record(self, name, latency, gas_used):
+        window = self._window
+        window.latencies.append(latency * 1000)
+        window.gas_used += gas_used
+        window.ops[name] = window.ops.get(name, 0) + 1
+        if self.created - window.start_options >= self.window:
+            self.windows.append(window.close(self.created))
+            self._window = _Window(self.created)
+
+
+def format_windows(windows):
+    """One line per statistics window."""
+    return "\n".join(
+        f"{w['options']:>8} options: {w['tps']:7.1f} tx/s, "
+        f"p50/p95/p99 {w['latency_p50']:.1f}/{w['latency_p95']:.1f}/"
+        f"{w['latency_p99']:.1f} ms, {w['gas_per_second'] / 1e6:.1f} Mgas/s, "
+        f"{w['failed']} failed, {w['ops']}"
+        for w in windows
+    )
@@ -0,0 +1,390 @@
+"""
+SQLite-backed event indexer for BufferTokenXOptionsV5 and BufferIBFRPoolV5.
+
+``OptionIndexer.sync()`` streams the option and pool events into a local
+SQLite store and records the last processed block, so the next call (or the
+next process opening the same file) resumes where the previous one stopped.
+
+Ownership and state are derived from the events alone. A created option's
+slot is computed locally, and options split or transferred off another one
+inherit its slot. Events do not carry an option's amounts, so every option
+touched by a ``Create``, ``Split``, ``Merge`` or ``TransferUnits`` in a synced
+range is read once with ``options(id)`` and ``units(id)`` at the end of that
+range. Queries never go to the node.
+"""
+
+import json
+import sqlite3
+
+from eth_utils import event_abi_to_log_topic, keccak, to_checksum_address
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+# IBufferOptionsV5.State
+INACTIVE, ACTIVE, EXERCISED, EXPIRED = range(4)
+
+OPTION_EVENTS = (
+    "Create",
+    "Exercise",
+    "Expire",
+    "Split",
+    "Merge",
+    "TransferUnits",
+    "Transfer",
+)
+POOL_EVENTS = ("Provide", "Withdraw", "Profit", "Loss")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS options (
+    id INTEGER PRIMARY KEY,
+    owner TEXT,
+    slot TEXT,
+    state INTEGER NOT NULL,
+    option_type INTEGER,
+    strike TEXT,
+    amount TEXT,
+    locked_amount TEXT,
+    premium TEXT,
+    expiration INTEGER,
+    units TEXT,
+    parent_id INTEGER,
+    created_block INTEGER NOT NULL,
+    updated_block INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS options_owner ON options (owner, state);
+CREATE INDEX IF NOT EXISTS options_slot ON options (slot, state);
+CREATE INDEX IF NOT EXISTS options_expiration ON options (state, expiration);
+CREATE TABLE IF NOT EXISTS events (
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    contract TEXT NOT NULL,
+    event TEXT NOT NULL,
+    option_id INTEGER,
+    account TEXT,
+    args TEXT NOT NULL,
+    PRIMARY KEY (block_number, log_index)
+);
+CREATE INDEX IF NOT EXISTS events_option ON events (option_id);
+CREATE INDEX IF NOT EXISTS events_account ON events (account, event);
+"""
+
+_OPTION_COLUMNS = (
+    "id",
+    "owner",
+    "slot",
+    "state",
+    "option_type",
+    "strike",
+    "amount",
+    "locked_amount",
+    "premium",
+    "expiration",
+    "units",
+)
+_INT_COLUMNS = ("strike", "amount", "locked_amount", "premium", "units")
+
+# Options that are minted, not burned and still active
+_LIVE = "state = 1 AND owner IS NOT NULL"
+
+
+def slot_of(strike, expiration, option_type, option_id):
+    """``BufferNFTCore.getSlot`` computed locally."""
+    encoded = b"".join(
+        int(value).to_bytes(32, "big")
+        for value in (strike, expiration, option_type, option_id)
+    )
+    return int.from_bytes(keccak(encoded), "big")
+
+
+def _slot_key(slot):
+    return f"{int(slot):#066x}"
+
+
+def _process_log(event, log):
+    # web3.py v5 names it processLog, v6 process_log
+    process = getattr(event, "process_log", None) or event.processLog
+    return process(log)
+
+
+class OptionIndexer:
+    """
+    Incremental SQLite index of options and pool activity.
+
+    Attributes
+    ----------
+    web3 : Web3
+        Connection the events and option details are read from.
+    path : str
+        SQLite database path, ``":memory:"`` keeps the index in memory.
+    confirmations : int
+        Number of most recent blocks left unprocessed by ``sync``.
+    batch_size : int
+        Blocks fetched per ``eth_getLogs`` request.
+    """
+
+    def __init__(
+        self,
+        web3,
+        options_address,
+        options_abi,
+        pool_address,
+        pool_abi,
+        path=":memory:",
+        confirmations=0,
+        batch_size=2000,
+    ):
+        self.web3 = web3
+        self.path = path
+        self.confirmations = confirmations
+        self.batch_size = batch_size
+        self.options = web3.eth.contract(
+            address=to_checksum_address(options_address), abi=options_abi
+        )
+        self.pool = web3.eth.contract(
+            address=to_checksum_address(pool_address), abi=pool_abi
+        )
+        self._topics = {}
+        for contract, names in (
+            (self.options, OPTION_EVENTS),
+            (self.pool, POOL_EVENTS),
+        ):
+            for abi in contract.abi:
+                if abi["type"] == "event" and abi["name"] in names:
+                    key = (contract.address, event_abi_to_log_topic(abi))
+                    self._topics[key] = getattr(contract.events, abi["name"])()
+
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(_SCHEMA)
+
+    @classmethod
+    def from_contracts(cls, options, pool, path=":memory:", **kwargs):
+        """Builds an indexer for brownie ``Contract`` objects."""
+        from brownie import web3
+
+        return cls(
+            web3, options.address, options.abi, pool.address, pool.abi, path, **kwargs
+        )
+
+    @property
+    def last_block(self):
+        """Last block whose events are in the index, -1 before the first sync."""
+        row = self.db.execute(
+            "SELECT value FROM meta WHERE key = 'last_block'"
+        ).fetchone()
+        return -1 if row is None else row["value"]
+
+    def sync(self, to_block=None):
+        """
+        Indexes every block after ``last_block`` up to ``to_block`` (default:
+        the chain head minus ``confirmations``). Each batch is committed with
+        its block number, so an interrupted sync resumes cleanly.
+
+        Returns the last indexed block.
+        """
+        if to_block is None:
+            to_block = self.web3.eth.block_number - self.confirmations
+        start = self.last_block + 1
+        while start <= to_block:
+            end = min(start + self.batch_size - 1, to_block)
+            logs = self.web3.eth.get_logs(
+                {
+                    "address": [self.options.address, self.pool.address],
+                    "fromBlock": start,
+                    "toBlock": end,
+                }
+            )
+            with self.db:
+                touched = set()
+                for log in logs:
+                    self._apply(log, touched)
+                self._refresh(touched, end)
+                self.db.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('last_block', ?)",
+                    (end,),
+                )
+            start = end + 1
+        return self.last_block
+
+    def _apply(self, log, touched):
+        event = self._topics.get(
+            (to_checksum_address(log["address"]), bytes(log["topics"][0]))
+        )
+        if event is None:
+            return
+        decoded = _process_log(event, log)
+        name, args, block = decoded["event"], dict(decoded["args"]), log["blockNumber"]
+
+        option_id = args.get("id", args.get("tokenId"))
+        account = args.get("account", args.get("owner", args.get("to")))
+        self.db.execute(
+            "INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                block,
+                log["logIndex"],
+                "pool" if event.address == self.pool.address else "options",
+                name,
+                option_id,
+                account,
+                json.dumps(
+                    {k: str(v) if isinstance(v, int) else v for k, v in args.items()}
+                ),
+            ),
+        )
+
+        if name == "Create":
+            self._insert(args["id"], block)
+            touched.add(args["id"])
+        elif name == "Transfer" and event.address == self.options.address:
+            self._insert(args["tokenId"], block)
+            owner = None if args["to"] == ZERO_ADDRESS else args["to"]
+            self.db.execute(
+                "UPDATE options SET owner = ?, updated_block = ? WHERE id = ?",
+                (owner, block, args["tokenId"]),
+            )
+        elif name == "Split":
+            self._insert(args["newTokenId"], block, parent=args["tokenId"])
+            touched.update((args["tokenId"], args["newTokenId"]))
+        elif name == "Merge":
+            touched.add(args["targetTokenId"])
+        elif name == "TransferUnits" and args["from"] != ZERO_ADDRESS:
+            self._insert(args["targetTokenId"], block, parent=args["tokenId"])
+            touched.update((args["tokenId"], args["targetTokenId"]))
+        elif name in ("Exercise", "Expire"):
+            self.db.execute(
+                "UPDATE options SET state = ?, updated_block = ? WHERE id = ?",
+                (EXERCISED if name == "Exercise" else EXPIRED, block, args["id"]),
+            )
+
+    def _insert(self, option_id, block, parent=None):
+        """
+        Adds a row for a new option. ``parent`` is the option it was split or
+        transferred off, whose slot it shares; it is only recorded while the
+        option's slot is still unknown.
+        """
+        self.db.execute(
+            """
+            INSERT INTO options (id, state, parent_id, created_block, updated_block)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (id) DO UPDATE SET
+                parent_id = COALESCE(parent_id, excluded.parent_id)
+            WHERE slot IS NULL
+            """,
+            (option_id, ACTIVE, parent, block, block),
+        )
+
+    def _refresh(self, option_ids, block):
+        """
+        Reads the option details of ``option_ids`` as of ``block``. IDs are
+        processed in ascending order so that a parent's slot is known before
+        its children's.
+        """
+        for option_id in sorted(option_ids):
+            (
+                state,
+                strike,
+                amount,
+                locked_amount,
+                premium,
+                expiration,
+                option_type,
+            ) = self.options.functions.options(option_id).call(block_identifier=block)
+            units = self.options.functions.units(option_id).call(block_identifier=block)
+            self.db.execute(
+                """
+                UPDATE options SET
+                    state = ?, option_type = ?, strike = ?, amount = ?,
+                    locked_amount = ?, premium = ?, expiration = ?, units = ?,
+                    slot = COALESCE(
+                        slot,
+                        (SELECT p.slot FROM options p WHERE p.id = options.parent_id),
+                        ?
+                    ),
+                    updated_block = ?
+                WHERE id = ?
+                """,
+                (
+                    state,
+                    option_type,
+                    str(strike),
+                    str(amount),
+                    str(locked_amount),
+                    str(premium),
+                    expiration,
+                    str(units),
+                    _slot_key(slot_of(strike, expiration, option_type, option_id)),
+                    block,
+                    option_id,
+                ),
+            )
+
+    def _rows(self, query, params=()):
+        rows = []
+        for row in self.db.execute(query, params):
+            option = dict(row)
+            for column in _INT_COLUMNS:
+                if option[column] is not None:
+                    option[column] = int(option[column])
+            option["slot"] = None if option["slot"] is None else int(option["slot"], 16)
+            rows.append(option)
+        return rows
+
+    def option(self, option_id):
+        """Returns the indexed option as a dict, or None."""
+        rows = self._rows(
+            f"SELECT {', '.join(_OPTION_COLUMNS)} FROM options WHERE id = ?",
+            (option_id,),
+        )
+        return rows[0] if rows else None
+
+    def active_options_of(self, owner):
+        """Active options currently held by ``owner``."""
+        return self._rows(
+            f"SELECT {', '.join(_OPTION_COLUMNS)} FROM options "
+            f"WHERE owner = ? AND {_LIVE} ORDER BY id",
+            (to_checksum_address(owner),),
+        )
+
+    def active_options_in_slot(self, slot):
+        """Active options in ``slot`` (as returned by ``slotOf``)."""
+        return self._rows(
+            f"SELECT {', '.join(_OPTION_COLUMNS)} FROM options "
+            f"WHERE slot = ? AND {_LIVE} ORDER BY id",
+            (_slot_key(slot),),
+        )
+
+    def expiring_before(self, timestamp):
+        """Active options expiring at or before ``timestamp``."""
+        return self._rows(
+            f"SELECT {', '.join(_OPTION_COLUMNS)} FROM options "
+            f"WHERE {_LIVE} AND expiration <= ? ORDER BY expiration, id",
+            (timestamp,),
+        )
+
+    def events(self, option_id=None, account=None, event=None):
+        """Indexed events in chain order, optionally filtered."""
+        clauses, params = [], []
+        for column, value in (
+            ("option_id", option_id),
+            ("account", account),
+            ("event", event),
+        ):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(
+                    to_checksum_address(value) if column == "account" else value
+                )
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return [
+            {**dict(row), "args": json.loads(row["args"])}
+            for row in self.db.execute(
+                f"SELECT * FROM events {where} ORDER BY block_number, log_index", params
+            )
+        ]
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,64 @@
+"""
+Lazy iterators over the ``slotPositions`` and ``ownerPositions`` views of
+``BufferNFTCore``.
+
+Each page returns ``page_size`` positions (ID, slot, owner, units and option
+details) in one ``eth_call``, so reading a portfolio takes one call per page
+instead of four per position. Every page is read at the block of the first
+one, so positions moving while the iterator is consumed are neither skipped
+nor repeated.
+"""
+
+_OPTION_FIELDS = (
+    "state",
+    "strike",
+    "amount",
+    "locked_amount",
+    "premium",
+    "expiration",
+    "option_type",
+)
+
+
+def _position(raw):
+    option_id, slot, owner, units, option = raw
+    return {
+        "id": option_id,
+        "slot": slot,
+        "owner": owner,
+        "units": units,
+        **dict(zip(_OPTION_FIELDS, option)),
+    }
+
+
+def iter_pages(view, key, page_size=100, block_identifier=None):
+    """
+    Yields the positions returned by ``view(key, offset, limit)`` page by page.
+
+    ``view`` is a brownie ``ContractCall``; ``block_identifier`` defaults to
+    the latest block at the time of the first page.
+    """
+    if block_identifier is None:
+        from brownie import web3
+
+        block_identifier = web3.eth.block_number
+    offset = 0
+    while True:
+        positions, total = view(
+            key, offset, page_size, block_identifier=block_identifier
+        )
+        for raw in positions:
+            yield _position(raw)
+        offset += len(positions)
+        if not positions or offset >= total:
+            return
+
+
+def slot_positions(options, slot, page_size=100, block_identifier=None):
+    """Positions in ``slot``, in the order of ``tokenOfSlotByIndex``."""
+    return iter_pages(options.slotPositions, slot, page_size, block_identifier)
+
+
+def owner_positions(options, owner, page_size=100, block_identifier=None):
+    """Positions held by ``owner``, in the order of ``tokenOfOwnerByIndex``."""
+    return iter_pages(options.ownerPositions, owner, page_size, block_identifier)
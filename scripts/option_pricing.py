@@ -0,0 +1,767 @@
+"""
+Off-chain reference implementation of the Buffer option pricing path.
+
+Mirrors ``OptionMath.blackScholesPrice`` (Choudhury's approximation of the
+normal CDF evaluated in ABDK 64.64 fixed point) and the ``fees()`` pipeline of
+``BufferTokenXOptionsV5`` over whole NumPy arrays, so thousands of quotes can be
+computed without a round trip to the node.
+
+Two modes are available:
+
+* ``exact=True`` replays the ABDKMath64x64 integer arithmetic (including every
+  rounding step of ``ln``, ``exp``, ``sqrt`` and ``div``) and returns Python
+  integers that match the contract to the wei.
+* ``exact=False`` evaluates the same formulas in float64 and is fully
+  vectorized; results agree with the contract to within float rounding.
+"""
+
+import numpy as np
+
+# ---------------------------------------------------------------------------
+# ABDKMath64x64 emulation
+# ---------------------------------------------------------------------------
+
+MIN_64x64 = -(1 << 127)
+MAX_64x64 = (1 << 127) - 1
+ONE_64x64 = 1 << 64
+THREE_64x64 = 3 << 64
+UINT256_MASK = (1 << 256) - 1
+UINT128_MASK = (1 << 128) - 1
+
+# Constants used by Choudhury's approximation in OptionMath._N
+CDF_CONST_0 = 0x09109F285DF452394  # 2260 / 3989
+CDF_CONST_1 = 0x19ABAC0EA1DA65036  # 6400 / 3989
+CDF_CONST_2 = 0x0D3C84B78B749BD6B  # 3300 / 3989
+# Constant of the normal PDF in OptionMath.blackScholesGreeks
+INV_SQRT_2PI = 0x0662114CF50D94234  # 1 / sqrt(2 * pi)
+
+# OptionMath._NFast: degree 6 polynomials (lowest degree first) of the CDF tail
+# on intervals of 0.5 (1 << FAST_CDF_INTERVAL_BITS) below FAST_CDF_CUTOFF, as
+# fitted by scripts.cdf_approximation
+FAST_CDF_INTERVAL_BITS = 63
+FAST_CDF_CUTOFF = 6 << 64
+FAST_CDF_COEFFICIENTS = (
+    (
+        0x80092BD12B76F800,
+        -0x66BD5FF6B8FA8400,
+        0x320B5362D534EC0,
+        0x9CC0D3477EFC880,
+        0x8D940672BA1F280,
+        -0x8BC268120239580,
+        0x24B35EDC5C23C00,
+    ),
+    (
+        0x4EFD0A5845E86400,
+        -0x5A23B3DC5A165800,
+        0x1652B7B601866200,
+        0xB62F7E23859D480,
+        -0x4AE94111777C7C0,
+        -0x1E6BC6D3D304750,
+        0x121437687E5D950,
+    ),
+    (
+        0x2896A3282A9CA800,
+        -0x3DFFEBFD6BC5E000,
+        0x1F0F15CEABADB600,
+        0x167FA4053F82AE,
+        -0x56F3FA4F030D900,
+        0x167677DA2547370,
+        0x202ADB2756FDA6,
+    ),
+    (
+        0x11120A748DA08300,
+        -0x212140C79A502200,
+        0x18E8E7331E982500,
+        -0x6F83D3394AC2400,
+        -0x190DEAF8E2E3300,
+        0x19DBE39D2E1EF30,
+        -0x581BF431BE5FB0,
+    ),
+    (
+        0x5CF1BCF5BD33E80,
+        -0xDCA323F5F3A5080,
+        0xDCDE124F15E0700,
+        -0x6EDAE03031AD280,
+        0x13383C50D9FB770,
+        0x7DC690C4131B74,
+        -0x400F1C6179F3A4,
+    ),
+    (
+        0x195EB714E7A2910,
+        -0x4798628F46E95C0,
+        0x5980070A551C740,
+        -0x3EBF7E6E09022E0,
+        0x18A96E9F28965B0,
+        -0x3D0C376993BB54,
+        -0x7C63FEEA1803E,
+    ),
+    (
+        0x584B71DBC33128,
+        -0x121BC89D2E6CDF0,
+        0x1B26B689B9D5030,
+        -0x18223F32654B390,
+        0xD9E136D7F19C88,
+        -0x4B02499DCEA274,
+        0xC5F1B7863E307,
+    ),
+    (
+        0xF3B06147CB3F7,
+        -0x391A3286E704C0,
+        0x63DB3B3A67318C,
+        -0x6ACA372B7E0038,
+        0x4C15A36F305B1C,
+        -0x237DF78A70C280,
+        0x8A4D3367CD88E,
+    ),
+    (
+        0x213720C06D96E,
+        -0x8C451D4BC964C,
+        0x1183F12C0D6ACB,
+        -0x15CC6239C8018B,
+        0x1271571CD610C6,
+        -0xA5566FFFAA855,
+        0x2FC8FBAD8B04D,
+    ),
+    (
+        0x39156874D329,
+        -0x10C601A8FBC9C,
+        0x25AEE8E07D0F6,
+        -0x3550F5889A1C5,
+        0x33A51ED99971B,
+        -0x20EE6329F463F,
+        0xA95E75C26403,
+    ),
+    (
+        0x4D26CBC7768,
+        -0x18FE44B5DBEA,
+        0x3E586570C5C4,
+        -0x628C2C3A6763,
+        0x6AA4EDDB54D7,
+        -0x4B0CA0FEE014,
+        0x1A0699011050,
+    ),
+    (
+        0x51E0044011,
+        -0x1D004F2E3C5,
+        0x4F7FDC990D8,
+        -0x8A7D8F4AF5B,
+        0xA47E007654C,
+        -0x7D3FAD1FF48,
+        0x2E09EEA1E6B,
+    ),
+)
+
+# 2^(2^-k) in 128.128 fixed point for k = 1..64, as used by exp_2
+_EXP_2_FACTORS = (
+    0x16A09E667F3BCC908B2FB1366EA957D3E,
+    0x1306FE0A31B7152DE8D5A46305C85EDEC,
+    0x1172B83C7D517ADCDF7C8C50EB14A791F,
+    0x10B5586CF9890F6298B92B71842A98363,
+    0x1059B0D31585743AE7C548EB68CA417FD,
+    0x102C9A3E778060EE6F7CACA4F7A29BDE8,
+    0x10163DA9FB33356D84A66AE336DCDFA3F,
+    0x100B1AFA5ABCBED6129AB13EC11DC9543,
+    0x10058C86DA1C09EA1FF19D294CF2F679B,
+    0x1002C605E2E8CEC506D21BFC89A23A00F,
+    0x100162F3904051FA128BCA9C55C31E5DF,
+    0x1000B175EFFDC76BA38E31671CA939725,
+    0x100058BA01FB9F96D6CACD4B180917C3D,
+    0x10002C5CC37DA9491D0985C348C68E7B3,
+    0x1000162E525EE054754457D5995292026,
+    0x10000B17255775C040618BF4A4ADE83FC,
+    0x1000058B91B5BC9AE2EED81E9B7D4CFAB,
+    0x100002C5C89D5EC6CA4D7C8ACC017B7C9,
+    0x10000162E43F4F831060E02D839A9D16D,
+    0x100000B1721BCFC99D9F890EA06911763,
+    0x10000058B90CF1E6D97F9CA14DBCC1628,
+    0x1000002C5C863B73F016468F6BAC5CA2B,
+    0x100000162E430E5A18F6119E3C02282A5,
+    0x1000000B1721835514B86E6D96EFD1BFE,
+    0x100000058B90C0B48C6BE5DF846C5B2EF,
+    0x10000002C5C8601CC6B9E94213C72737A,
+    0x1000000162E42FFF037DF38AA2B219F06,
+    0x10000000B17217FBA9C739AA5819F44F9,
+    0x1000000058B90BFCDEE5ACD3C1CEDC823,
+    0x100000002C5C85FE31F35A6A30DA1BE50,
+    0x10000000162E42FF0999CE3541B9FFFCF,
+    0x100000000B17217F80F4EF5AADDA45554,
+    0x10000000058B90BFBF8479BD5A81B51AD,
+    0x1000000002C5C85FDF84BD62AE30A74CC,
+    0x100000000162E42FEFB2FED257559BDAA,
+    0x1000000000B17217F7D5A7716BBA4A9AE,
+    0x100000000058B90BFBE9DDBAC5E109CCE,
+    0x10000000002C5C85FDF4B15DE6F17EB0D,
+    0x1000000000162E42FEFA494F1478FDE05,
+    0x10000000000B17217F7D20CF927C8E94C,
+    0x1000000000058B90BFBE8F71CB4E4B33D,
+    0x100000000002C5C85FDF477B662B26945,
+    0x10000000000162E42FEFA3AE53369388C,
+    0x100000000000B17217F7D1D351A389D40,
+    0x10000000000058B90BFBE8E8B2D3D4EDE,
+    0x1000000000002C5C85FDF4741BEA6E77E,
+    0x100000000000162E42FEFA39FE95583C2,
+    0x1000000000000B17217F7D1CFB72B45E1,
+    0x100000000000058B90BFBE8E7CC35C3F0,
+    0x10000000000002C5C85FDF473E242EA38,
+    0x1000000000000162E42FEFA39F02B772C,
+    0x10000000000000B17217F7D1CF7D83C1A,
+    0x1000000000000058B90BFBE8E7BDCBE2E,
+    0x100000000000002C5C85FDF473DEA871F,
+    0x10000000000000162E42FEFA39EF44D91,
+    0x100000000000000B17217F7D1CF79E949,
+    0x10000000000000058B90BFBE8E7BCE544,
+    0x1000000000000002C5C85FDF473DE6ECA,
+    0x100000000000000162E42FEFA39EF366F,
+    0x1000000000000000B17217F7D1CF79AFA,
+    0x100000000000000058B90BFBE8E7BCD6D,
+    0x10000000000000002C5C85FDF473DE6B2,
+    0x1000000000000000162E42FEFA39EF358,
+    0x10000000000000000B17217F7D1CF79AB,
+)
+
+LN_2_128x128 = 0xB17217F7D1CF79ABC9E3B39803F2F6AF
+LOG2_E_128x128 = 0x171547652B82FE1777D0FFDA0D23A7D12
+
+
+class FixedPointError(ArithmeticError):
+    """Raised where the on-chain library would revert."""
+
+
+def _check(value):
+    if value < MIN_64x64 or value > MAX_64x64:
+        raise FixedPointError("64.64 overflow")
+    return value
+
+
+def _to_int128(value):
+    value &= UINT128_MASK
+    return value - (1 << 128) if value >> 127 else value
+
+
+def from_uint(x):
+    if x < 0 or x > 0x7FFFFFFFFFFFFFFF:
+        raise FixedPointError("fromUInt overflow")
+    return x << 64
+
+
+def to_int(x):
+    return x >> 64
+
+
+def to_uint(x):
+    if x < 0:
+        raise FixedPointError("toUInt underflow")
+    return (x >> 64) & 0xFFFFFFFFFFFFFFFF
+
+
+def add(x, y):
+    return _check(x + y)
+
+
+def sub(x, y):
+    return _check(x - y)
+
+
+def mul(x, y):
+    return _check((x * y) >> 64)
+
+
+def div(x, y):
+    if y == 0:
+        raise FixedPointError("division by zero")
+    # Solidity's signed division truncates towards zero
+    numerator = x << 64
+    quotient = abs(numerator) // abs(y)
+    return _check(quotient if (numerator < 0) == (y < 0) else -quotient)
+
+
+def abs_(x):
+    if x == MIN_64x64:
+        raise FixedPointError("abs overflow")
+    return -x if x < 0 else x
+
+
+def _sqrtu(x):
+    if x == 0:
+        return 0
+    xx = x
+    r = 1
+    for threshold, shift, r_shift in (
+        (1 << 128, 128, 64),
+        (1 << 64, 64, 32),
+        (1 << 32, 32, 16),
+        (1 << 16, 16, 8),
+        (1 << 8, 8, 4),
+        (1 << 4, 4, 2),
+    ):
+        if xx >= threshold:
+            xx >>= shift
+            r <<= r_shift
+    if xx >= 0x8:
+        r <<= 1
+    for _ in range(7):
+        r = (r + x // r) >> 1
+    r1 = x // r
+    return (r if r < r1 else r1) & UINT128_MASK
+
+
+def sqrt(x):
+    if x < 0:
+        raise FixedPointError("sqrt of negative number")
+    return _to_int128(_sqrtu(x << 64))
+
+
+def log_2(x):
+    if x <= 0:
+        raise FixedPointError("log of non-positive number")
+    msb = x.bit_length() - 1
+    result = (msb - 64) << 64
+    ux = x << (127 - msb)
+    bit = 0x8000000000000000
+    while bit > 0:
+        ux *= ux
+        b = ux >> 255
+        ux >>= 127 + b
+        result += bit * b
+        bit >>= 1
+    return _to_int128(result)
+
+
+def ln(x):
+    if x <= 0:
+        raise FixedPointError("log of non-positive number")
+    product = ((log_2(x) & UINT256_MASK) * LN_2_128x128) & UINT256_MASK
+    return _to_int128(product >> 128)
+
+
+def exp_2(x):
+    if x >= 0x400000000000000000:
+        raise FixedPointError("exp_2 overflow")
+    if x < -0x400000000000000000:
+        return 0
+    result = 0x80000000000000000000000000000000
+    for i, factor in enumerate(_EXP_2_FACTORS):
+        if x & (0x8000000000000000 >> i):
+            result = (result * factor) >> 128
+    result >>= 63 - (x >> 64)
+    if result > MAX_64x64:
+        raise FixedPointError("exp_2 overflow")
+    return result
+
+
+def exp(x):
+    if x >= 0x400000000000000000:
+        raise FixedPointError("exp overflow")
+    if x < -0x400000000000000000:
+        return 0
+    return exp_2(_to_int128((x * LOG2_E_128x128) >> 128))
+
+
+# ---------------------------------------------------------------------------
+# OptionMath
+# ---------------------------------------------------------------------------
+
+D4_64x64 = from_uint(10**4)
+D8_64x64 = from_uint(10**8)
+YEAR_64x64 = from_uint(365 * 86400)
+
+
+def n_64x64(x):
+    """OptionMath._N: Choudhury's approximation of the normal CDF."""
+    squared = mul(x, x)
+    value = div(
+        exp(-squared >> 1),
+        add(
+            add(CDF_CONST_0, mul(CDF_CONST_1, abs_(x))),
+            mul(CDF_CONST_2, sqrt(add(squared, THREE_64x64))),
+        ),
+    )
+    return sub(ONE_64x64, value) if x > 0 else value
+
+
+def n_fast_64x64(x):
+    """OptionMath._NFast: piecewise polynomial fit of Choudhury's CDF."""
+    x_abs = abs_(x)
+    value = 0
+    if x_abs < FAST_CDF_CUTOFF:
+        interval = x_abs >> FAST_CDF_INTERVAL_BITS
+        offset = x_abs - (interval << FAST_CDF_INTERVAL_BITS)
+        coefficients = FAST_CDF_COEFFICIENTS[interval]
+        value = coefficients[-1]
+        for coefficient in coefficients[-2::-1]:
+            value = add(mul(value, offset), coefficient)
+        value = max(value, 0)
+    return sub(ONE_64x64, value) if x > 0 else value
+
+
+def black_scholes_price_64x64(
+    variance, strike, spot, maturity, is_call, fast_cdf=False
+):
+    """
+    OptionMath._blackScholesPrice, all arguments in 64.64 fixed point. With
+    ``fast_cdf`` the CDF is ``n_fast_64x64`` as in blackScholesPriceFast.
+    """
+    n = n_fast_64x64 if fast_cdf else n_64x64
+    cumulative_variance = mul(maturity, variance)
+    cumulative_variance_sqrt = sqrt(cumulative_variance)
+
+    d1 = div(
+        add(ln(div(spot, strike)), cumulative_variance >> 1),
+        cumulative_variance_sqrt,
+    )
+    d2 = sub(d1, cumulative_variance_sqrt)
+
+    if is_call:
+        return sub(mul(spot, n(d1)), mul(strike, n(d2)))
+    return -sub(mul(spot, n(-d1)), mul(strike, n(-d2)))
+
+
+def black_scholes_price_exact(
+    implied_vol, strike, spot, period, is_call=True, fast_cdf=False
+):
+    """
+    OptionMath.blackScholesPrice (or blackScholesPriceFast) for a single set
+    of integer inputs.
+    """
+    iv = div(from_uint(int(implied_vol)), D4_64x64)
+    premium = black_scholes_price_64x64(
+        mul(iv, iv),
+        div(from_uint(int(strike)), D8_64x64),
+        div(from_uint(int(spot)), D8_64x64),
+        div(from_uint(int(period)), YEAR_64x64),
+        bool(is_call),
+        bool(fast_cdf),
+    )
+    return to_uint(mul(premium, D8_64x64))
+
+
+def black_scholes_greeks_exact(implied_vol, strike, spot, period, is_call=True):
+    """
+    OptionMath.blackScholesGreeks for a single set of integer inputs. Returns
+    ``(delta, vega)`` with a factor of 1e8.
+    """
+    iv = div(from_uint(int(implied_vol)), D4_64x64)
+    strike = div(from_uint(int(strike)), D8_64x64)
+    spot = div(from_uint(int(spot)), D8_64x64)
+    maturity = div(from_uint(int(period)), YEAR_64x64)
+
+    cumulative_variance = mul(maturity, mul(iv, iv))
+    d1 = div(
+        add(ln(div(spot, strike)), cumulative_variance >> 1),
+        sqrt(cumulative_variance),
+    )
+    delta = n_64x64(d1) if is_call else -n_64x64(-d1)
+    vega = mul(mul(spot, mul(exp(-mul(d1, d1) >> 1), INV_SQRT_2PI)), sqrt(maturity))
+    return to_int(mul(delta, D8_64x64)), to_uint(mul(vega, D8_64x64))
+
+
+# ---------------------------------------------------------------------------
+# Vectorized interface
+# ---------------------------------------------------------------------------
+
+
+def _map_exact(fn, *args):
+    """
+    Applies an integer reference function element-wise over broadcast inputs.
+    Repeated input tuples are only evaluated once.
+    """
+    arrays = np.broadcast_arrays(*(np.asarray(a, dtype=object) for a in args))
+    cache = {}
+    out = np.empty(arrays[0].shape, dtype=object)
+    flat = out.reshape(-1)
+    for i, key in enumerate(zip(*(a.reshape(-1).tolist() for a in arrays))):
+        value = cache.get(key)
+        if value is None:
+            value = cache[key] = fn(*key)
+        flat[i] = value
+    return out
+
+
+def n_cdf(x):
+    """Choudhury's approximation of the normal CDF in float64."""
+    x = np.asarray(x, dtype=np.float64)
+    value = np.exp(-(x * x) / 2) / (
+        2260 / 3989 + 6400 / 3989 * np.abs(x) + 3300 / 3989 * np.sqrt(x * x + 3)
+    )
+    return np.where(x > 0, 1 - value, value)
+
+
+def n_cdf_fast(x):
+    """OptionMath._NFast in float64."""
+    x = np.asarray(x, dtype=np.float64)
+    x_abs = np.abs(x)
+    width = 2.0 ** (FAST_CDF_INTERVAL_BITS - 64)
+    interval = np.minimum(x_abs // width, len(FAST_CDF_COEFFICIENTS) - 1)
+    offset = x_abs - interval * width
+    coefficients = np.array(FAST_CDF_COEFFICIENTS, dtype=np.float64) / 2.0**64
+    coefficients = coefficients[interval.astype(np.int64)]
+    value = coefficients[..., -1]
+    for i in range(coefficients.shape[-1] - 2, -1, -1):
+        value = value * offset + coefficients[..., i]
+    value = np.where(x_abs < FAST_CDF_CUTOFF / 2.0**64, np.maximum(value, 0), 0)
+    return np.where(x > 0, 1 - value, value)
+
+
+def black_scholes_price(
+    implied_vol, strike, spot, period, is_call=True, exact=False, fast_cdf=False
+):
+    """
+    Vectorized OptionMath.blackScholesPrice, or blackScholesPriceFast with
+    ``fast_cdf``.
+
+    Arguments broadcast against each other and use the contract's scaling:
+    implied volatility with a factor of 1e4, strike and spot with a factor of
+    1e8 and period in seconds. Returns the premium per unit with a factor of
+    1e8, as Python integers in exact mode and float64 otherwise.
+    """
+    if exact:
+        return _map_exact(
+            black_scholes_price_exact,
+            implied_vol,
+            strike,
+            spot,
+            period,
+            is_call,
+            fast_cdf,
+        )
+
+    sigma = np.asarray(implied_vol, dtype=np.float64) / 1e4
+    strike = np.asarray(strike, dtype=np.float64) / 1e8
+    spot = np.asarray(spot, dtype=np.float64) / 1e8
+    maturity = np.asarray(period, dtype=np.float64) / (365 * 86400)
+    is_call = np.asarray(is_call, dtype=bool)
+
+    cumulative_variance = maturity * sigma * sigma
+    cumulative_variance_sqrt = np.sqrt(cumulative_variance)
+    d1 = (np.log(spot / strike) + cumulative_variance / 2) / cumulative_variance_sqrt
+    d2 = d1 - cumulative_variance_sqrt
+
+    n = n_cdf_fast if fast_cdf else n_cdf
+    call = spot * n(d1) - strike * n(d2)
+    put = strike * n(-d2) - spot * n(-d1)
+    return np.where(is_call, call, put) * 1e8
+
+
+def black_scholes_greeks(implied_vol, strike, spot, period, is_call=True, exact=False):
+    """
+    Vectorized OptionMath.blackScholesGreeks, with the scaling of
+    ``black_scholes_price``. Returns ``(delta, vega)`` per unit with a factor
+    of 1e8; vega is per implied volatility change of 1.00.
+    """
+    if exact:
+        greeks = _map_exact(
+            black_scholes_greeks_exact, implied_vol, strike, spot, period, is_call
+        )
+        delta = np.vectorize(lambda g: g[0], otypes=[object])(greeks)
+        vega = np.vectorize(lambda g: g[1], otypes=[object])(greeks)
+        return delta, vega
+
+    sigma = np.asarray(implied_vol, dtype=np.float64) / 1e4
+    strike = np.asarray(strike, dtype=np.float64) / 1e8
+    spot = np.asarray(spot, dtype=np.float64) / 1e8
+    maturity = np.asarray(period, dtype=np.float64) / (365 * 86400)
+    is_call = np.asarray(is_call, dtype=bool)
+
+    cumulative_variance = maturity * sigma * sigma
+    d1 = (np.log(spot / strike) + cumulative_variance / 2) / np.sqrt(
+        cumulative_variance
+    )
+    delta = np.where(is_call, n_cdf(d1), -n_cdf(-d1))
+    vega = spot * np.exp(-d1 * d1 / 2) / np.sqrt(2 * np.pi) * np.sqrt(maturity)
+    return delta * 1e8, vega * 1e8
+
+
+def quantize_iv(iv, iv_bucket_width, exact=False):
+    """
+    Rounds ``iv`` up to its IV bucket the way the options contract does
+    before pricing. A width of 0 leaves the IV unchanged.
+    """
+    if not iv_bucket_width:
+        return iv
+    if exact:
+        iv = np.asarray(iv, dtype=object)
+        return -(-iv // iv_bucket_width) * iv_bucket_width
+    return np.ceil(np.asarray(iv, dtype=np.float64) / iv_bucket_width) * iv_bucket_width
+
+
+def implied_volatility(
+    amount,
+    iv_rate,
+    utilization_rate,
+    pool_balance,
+    locked_amount,
+    exact=False,
+    iv_bucket_width=0,
+):
+    """
+    Vectorized BufferTokenXOptionsV5.currentImpliedVolatility, rounded to
+    ``iv_bucket_width`` when one is given.
+    """
+    if exact:
+        iv = _map_exact(
+            _implied_volatility_exact,
+            amount,
+            iv_rate,
+            utilization_rate,
+            pool_balance,
+            locked_amount,
+        )
+        return quantize_iv(iv, iv_bucket_width, exact=True)
+
+    iv_rate = np.asarray(iv_rate, dtype=np.float64)
+    utilization = (
+        (np.asarray(locked_amount, dtype=np.float64) + np.asarray(amount, np.float64))
+        * 100e8
+        / np.asarray(pool_balance, dtype=np.float64)
+    )
+    kink = iv_rate * np.maximum(utilization - 40e8, 0) * utilization_rate / 40e16
+    return quantize_iv(iv_rate + kink, iv_bucket_width)
+
+
+def _implied_volatility_exact(
+    amount, iv_rate, utilization_rate, pool_balance, locked_amount
+):
+    if pool_balance <= 0:
+        raise ValueError("Pool Error: The pool is empty")
+    utilization = ((locked_amount + amount) * 100 * 10**8) // pool_balance
+    iv = iv_rate
+    if utilization > 40 * 10**8:
+        iv += (iv * (utilization - 40 * 10**8) * utilization_rate) // (40 * 10**16)
+    return iv
+
+
+def fees(
+    period,
+    amount,
+    strike,
+    spot,
+    iv_rate,
+    utilization_rate,
+    pool_balance,
+    locked_amount,
+    settlement_fee_percentage,
+    is_call=True,
+    exact=False,
+    iv_bucket_width=0,
+    fast_cdf=False,
+):
+    """
+    Vectorized BufferTokenXOptionsV5.fees.
+
+    Returns ``(total, settlement_fee, premium)`` in tokenX units.
+    """
+    iv = implied_volatility(
+        amount,
+        iv_rate,
+        utilization_rate,
+        pool_balance,
+        locked_amount,
+        exact,
+        iv_bucket_width,
+    )
+    usd_premium_per_amount = black_scholes_price(
+        iv, strike, spot, period, is_call, exact, fast_cdf
+    )
+    if exact:
+        amount = np.asarray(amount, dtype=object)
+        premium = usd_premium_per_amount * amount // np.asarray(spot, dtype=object)
+        settlement_fee = amount * settlement_fee_percentage // 100
+    else:
+        amount = np.asarray(amount, dtype=np.float64)
+        premium = usd_premium_per_amount * amount / np.asarray(spot, np.float64)
+        settlement_fee = amount * settlement_fee_percentage / 100
+    return settlement_fee + premium, settlement_fee, premium
+
+
+class OptionQuoter:
+    """
+    Quotes ``fees()`` locally from a single snapshot of on-chain state.
+
+    Attributes mirror the values the contract reads while pricing: the oracle
+    price, the series parameters from OptionConfig and the pool balances.
+    """
+
+    def __init__(
+        self,
+        spot,
+        strike,
+        expiry,
+        iv_rate,
+        utilization_rate,
+        pool_balance,
+        locked_amount,
+        settlement_fee_percentage,
+        is_call=True,
+        iv_bucket_width=0,
+        fast_cdf=False,
+    ):
+        self.spot = spot
+        self.strike = strike
+        self.expiry = expiry
+        self.iv_rate = iv_rate
+        self.utilization_rate = utilization_rate
+        self.pool_balance = pool_balance
+        self.locked_amount = locked_amount
+        self.settlement_fee_percentage = settlement_fee_percentage
+        self.is_call = is_call
+        self.iv_bucket_width = iv_bucket_width
+        self.fast_cdf = fast_cdf
+
+    @classmethod
+    def from_contracts(cls, options, config, pool):
+        return cls(
+            spot=options.getCurrentPrice(),
+            strike=config.fixedStrike(),
+            expiry=pool.fixedExpiry(),
+            iv_rate=config.impliedVolRate(),
+            utilization_rate=config.utilizationRate(),
+            pool_balance=pool.totalTokenXBalance(),
+            locked_amount=pool.getLockedAmount(),
+            settlement_fee_percentage=config.settlementFeePercentage(),
+            is_call=options.fixedOptionType() == 2,
+            iv_bucket_width=config.ivBucketWidth(),
+            fast_cdf=config.fastCdf(),
+        )
+
+    def fees(self, amount, timestamp=None, period=None, spot=None, exact=True):
+        """
+        Quotes options of the given ``amount`` (array-like). The period is taken
+        from ``period`` or derived from ``timestamp`` and the series expiry.
+        """
+        if period is None:
+            period = np.asarray(self.expiry, dtype=object) - np.asarray(
+                timestamp, dtype=object
+            )
+        return fees(
+            period,
+            amount,
+            self.strike,
+            self.spot if spot is None else spot,
+            self.iv_rate,
+            self.utilization_rate,
+            self.pool_balance,
+            self.locked_amount,
+            self.settlement_fee_percentage,
+            self.is_call,
+            exact,
+            self.iv_bucket_width,
+            self.fast_cdf,
+        )
+
+    def iv_bucket_error(self, amount, widths, timestamp=None, period=None):
+        """
+        Returns ``{width: max relative premium error}`` of pricing ``amount``
+        (array-like) with each IV bucket width instead of the exact IV.
+        """
+        width = self.iv_bucket_width
+        try:
+            self.iv_bucket_width = 0
+            _, _, exact = self.fees(amount, timestamp, period)
+            errors = {}
+            for self.iv_bucket_width in widths:
+                _, _, premium = self.fees(amount, timestamp, period)
+                error = (premium - exact) / np.maximum(exact, 1)
+                errors[self.iv_bucket_width] = float(np.max(error.astype(np.float64)))
+        finally:
+            self.iv_bucket_width = width
+        return errors
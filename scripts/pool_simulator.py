@@ -0,0 +1,284 @@
+"""
+Monte Carlo simulator of the BufferIBFRPoolV5 liquidity pool.
+
+Every simulated pool is one element of the NumPy state arrays, so thousands
+of pools (and millions of options) run through the same expiry cycles at
+once. The accounting mirrors the contracts:
+
+* ``provide``/``withdraw`` mint and burn shares like the pool, including
+  ``INITIAL_RATE``, ``divCeil`` and the ``maxLiquidity`` limit;
+* ``lock`` prices an option with ``scripts.option_pricing.fees`` (the
+  ``currentImpliedVolatility`` utilization kink included) and rejects it when
+  the locked amount would exceed 80% of the pool, like ``pool.lock``;
+* ``settle`` pays in-the-money options at the expiry price, capped at their
+  locked amount like ``pool.send``, and releases every premium to the pool.
+
+With ``exact=True`` the state is kept in Python integers and every step
+rounds like the contracts, which is what the cross-check against a real
+deployment uses; the default float64 mode is meant for large runs.
+"""
+
+import numpy as np
+
+from scripts.option_pricing import fees
+
+INITIAL_RATE = 10**3
+MAX_LIQUIDITY = 200 * 10**18
+ONE_DAY = 86400
+PRICE_DECIMALS = 10**8
+
+
+class PoolSimulator:
+    """
+    Vectorized pool state for ``n_paths`` independent pools.
+
+    Attributes
+    ----------
+    balance : ndarray
+        ``totalTokenXBalance()``: tokenX held, excluding locked premiums.
+    supply : ndarray
+        ``totalSupply()`` of pool shares.
+    locked_amount, locked_premium : ndarray
+        ``lockedAmount`` and ``lockedPremium`` of the open options.
+    options : dict
+        Open options of the current cycle, ``{"amount", "locked_amount",
+        "premium"}`` arrays of shape ``(n_paths, orders)``.
+    """
+
+    def __init__(
+        self,
+        n_paths,
+        iv_rate=4500,
+        utilization_rate=4 * 10**7,
+        collateralization_ratio=100,
+        settlement_fee_percentage=1,
+        max_liquidity=MAX_LIQUIDITY,
+        is_call=True,
+        exact=False,
+    ):
+        self.n_paths = n_paths
+        self.iv_rate = iv_rate
+        self.utilization_rate = utilization_rate
+        self.collateralization_ratio = collateralization_ratio
+        self.settlement_fee_percentage = settlement_fee_percentage
+        self.max_liquidity = max_liquidity
+        self.is_call = is_call
+        self.exact = exact
+        self.balance = self._zeros()
+        self.supply = self._zeros()
+        self.locked_amount = self._zeros()
+        self.locked_premium = self._zeros()
+        self.options = {"amount": [], "locked_amount": [], "premium": []}
+
+    def _zeros(self, shape=None):
+        shape = self.n_paths if shape is None else shape
+        return np.zeros(shape, dtype=object if self.exact else np.float64)
+
+    def _array(self, values):
+        values = np.broadcast_to(np.asarray(values), (self.n_paths,))
+        if self.exact:
+            return np.array([int(v) for v in values.tolist()], dtype=object)
+        return values.astype(np.float64)
+
+    def share_price(self):
+        """tokenX per share, NaN for empty pools."""
+        balance = np.asarray(self.balance, dtype=np.float64)
+        supply = np.asarray(self.supply, dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(supply > 0, balance / supply, np.nan)
+
+    def provide(self, amounts):
+        """
+        ``provide(amount, 0)`` on every pool. Returns the minted shares, 0
+        where the pool would revert.
+        """
+        amounts = self._array(amounts)
+        existing = (self.supply > 0) & (self.balance > 0)
+        safe_balance = np.where(existing, self.balance, 1)
+        mint = np.where(
+            existing, amounts * self.supply // safe_balance, amounts * INITIAL_RATE
+        )
+        ok = (self.balance + amounts <= self.max_liquidity) & (mint > 0)
+        mint = np.where(ok, mint, 0)
+        self.balance = self.balance + np.where(ok, amounts, 0)
+        self.supply = self.supply + mint
+        return mint
+
+    def withdraw(self, amounts, shares=None):
+        """
+        ``withdraw(amount, account)`` after expiry for an account holding
+        ``shares`` (default: all of them). Returns the burnt shares, 0 where
+        the pool would revert.
+        """
+        amounts = self._array(amounts)
+        shares = self.supply if shares is None else self._array(shares)
+        available = self.balance - self.locked_amount
+        safe_balance = np.where(self.balance > 0, self.balance, 1)
+        burn = -(-(amounts * self.supply) // safe_balance)
+        ok = (amounts <= available) & (self.balance > 0) & (burn > 0) & (burn <= shares)
+        burn = np.where(ok, burn, 0)
+        self.balance = self.balance - np.where(ok, amounts, 0)
+        self.supply = self.supply - burn
+        return burn
+
+    def lock(self, amounts, periods, spot, strike):
+        """
+        Buys one option of ``amounts`` in every pool (``create``). Returns
+        ``(accepted, total_fee, premium)``; rejected options pay nothing.
+        """
+        amounts = self._array(amounts)
+        locked = amounts * self.collateralization_ratio // 100
+        ok = self.balance > 0
+        safe_balance = np.where(ok, self.balance, 1)
+        total, _, premium = fees(
+            periods,
+            amounts,
+            strike,
+            spot,
+            self.iv_rate,
+            self.utilization_rate,
+            safe_balance,
+            self.locked_amount,
+            self.settlement_fee_percentage,
+            self.is_call,
+            self.exact,
+        )
+        ok &= total > amounts // 1000
+        ok &= self.balance >= locked
+        ok &= self.locked_amount + locked <= self.balance * 8 // 10
+
+        zero = self._zeros()
+        premium = np.where(ok, premium, zero)
+        locked = np.where(ok, locked, zero)
+        self.locked_amount = self.locked_amount + locked
+        self.locked_premium = self.locked_premium + premium
+        self.options["amount"].append(np.where(ok, amounts, zero))
+        self.options["locked_amount"].append(locked)
+        self.options["premium"].append(premium)
+        return ok, np.where(ok, total, zero), premium
+
+    def settle(self, price, strike):
+        """
+        Exercises the in-the-money options at ``price`` and unlocks the rest.
+        Returns the total payout per pool.
+        """
+        if not self.options["amount"]:
+            return self._zeros()
+        amount = np.stack(self.options["amount"], axis=1)
+        locked = np.stack(self.options["locked_amount"], axis=1)
+        premium = np.stack(self.options["premium"], axis=1)
+        price = self._array(price)[:, None]
+        strike = self._array(strike)[:, None]
+        if self.is_call:
+            in_the_money = price > strike
+            profit = (price - strike) * amount // price
+        else:
+            in_the_money = price < strike
+            profit = (strike - price) * amount // price
+        payout = np.where(in_the_money, np.minimum(profit, locked), 0)
+
+        payouts = payout.sum(axis=1)
+        self.balance = self.balance + premium.sum(axis=1) - payouts
+        # Every open option is settled, and subtracting the float sums would
+        # leave rounding residue in the totals
+        self.locked_amount = self._zeros()
+        self.locked_premium = self._zeros()
+        self.options = {"amount": [], "locked_amount": [], "premium": []}
+        return payouts
+
+    def run(
+        self,
+        cycles,
+        orders_per_cycle,
+        liquidity,
+        mean_amount,
+        spot=400 * PRICE_DECIMALS,
+        volatility=0.8,
+        strike_ratio=1.0,
+        cycle_length=7 * ONE_DAY,
+        lp_flow=0.1,
+        seed=0,
+    ):
+        """
+        Simulates ``cycles`` expiry cycles after an initial ``provide`` of
+        ``liquidity``. Each cycle sets the strike at ``strike_ratio`` times the
+        spot, applies a random net LP flow (normal, ``lp_flow`` of the
+        balance), sells ``orders_per_cycle`` options of lognormal amounts
+        arriving uniformly over the first 90% of the cycle and settles them at
+        a spot drawn from a lognormal walk with annual ``volatility``.
+
+        Returns a dict of ``(n_paths, cycles)`` arrays: ``returns`` (share
+        price change of the cycle), ``utilization`` (peak locked share of the
+        balance), ``accepted`` and ``rejected`` option counts, ``premiums`` and
+        ``payouts``.
+        """
+        rng = np.random.default_rng(seed)
+        shape = (self.n_paths, cycles)
+        out = {
+            key: np.zeros(shape)
+            for key in (
+                "returns",
+                "utilization",
+                "accepted",
+                "rejected",
+                "premiums",
+                "payouts",
+            )
+        }
+        self.provide(liquidity)
+        spot = self._array(spot)
+        step_volatility = volatility * np.sqrt(cycle_length / (365 * ONE_DAY))
+        for cycle in range(cycles):
+            flow = rng.normal(0, lp_flow, self.n_paths) * np.asarray(
+                self.balance, dtype=np.float64
+            )
+            self.provide(self._integral(np.maximum(flow, 0)))
+            self.withdraw(self._integral(np.maximum(-flow, 0)))
+            start_price = self.share_price()
+
+            strike = self._integral(np.asarray(spot, np.float64) * strike_ratio)
+            arrivals = np.sort(rng.uniform(0, 0.9 * cycle_length, orders_per_cycle))
+            amounts = rng.lognormal(
+                np.log(mean_amount), 0.5, (orders_per_cycle, self.n_paths)
+            )
+            for order in range(orders_per_cycle):
+                period = int(cycle_length - arrivals[order])
+                ok, _, premium = self.lock(
+                    self._integral(amounts[order]), period, spot, strike
+                )
+                out["accepted"][:, cycle] += ok
+                out["rejected"][:, cycle] += ~ok
+                out["premiums"][:, cycle] += np.asarray(premium, np.float64)
+                utilization = np.asarray(self.locked_amount, np.float64) / np.maximum(
+                    np.asarray(self.balance, np.float64), 1
+                )
+                out["utilization"][:, cycle] = np.maximum(
+                    out["utilization"][:, cycle], utilization
+                )
+
+            spot = self._integral(
+                np.asarray(spot, np.float64)
+                * np.exp(
+                    step_volatility * rng.standard_normal(self.n_paths)
+                    - step_volatility**2 / 2
+                )
+            )
+            payouts = self.settle(spot, strike)
+            out["payouts"][:, cycle] = np.asarray(payouts, np.float64)
+            out["returns"][:, cycle] = self.share_price() / start_price - 1
+        return out
+
+    def _integral(self, values):
+        return self._array(np.floor(np.asarray(values, dtype=np.float64)))
+
+
+def return_distribution(returns, quantiles=(0.01, 0.05, 0.5, 0.95, 0.99)):
+    """Mean, standard deviation and quantiles of per-cycle LP returns."""
+    returns = np.asarray(returns, dtype=np.float64).reshape(-1)
+    returns = returns[~np.isnan(returns)]
+    return {
+        "mean": float(returns.mean()),
+        "std": float(returns.std()),
+        "loss_probability": float((returns < 0).mean()),
+        **{f"q{q:g}": float(np.quantile(returns, q)) for q in quantiles},
+    }
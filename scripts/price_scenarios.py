@@ -0,0 +1,197 @@
+"""
+Price-path scenarios for ``PricePathOracle``.
+
+``price_path`` generates reproducible paths (in steps of 1e8) for a few
+market regimes, ``read_path`` loads one from a CSV or ``.npy`` file and
+``ScenarioRunner`` replays a path through an options contract whose TWAP is a
+``PricePathOracle``: every tick it may buy options and auto-exercise the ones
+that are in the money, and it reports pool P&L, gas and throughput.
+"""
+
+import time
+from pathlib import Path
+
+import numpy as np
+
+PRICE_DECIMALS = 10**8
+
+# Per-step drift and volatility of the log price
+REGIMES = {
+    "trending": {"drift": 5e-4, "volatility": 5e-3},
+    "volatile": {"drift": 0.0, "volatility": 3e-2},
+    "crash": {"drift": -2e-4, "volatility": 1e-2, "crash_at": 0.6, "crash": -0.4},
+}
+
+
+def price_path(regime, steps, start_price=400 * PRICE_DECIMALS, seed=0):
+    """
+    Returns ``steps`` prices following a geometric random walk with the
+    ``REGIMES[regime]`` parameters. The ``crash`` regime also drops by
+    ``crash`` (a fraction) at ``crash_at`` of the path.
+    """
+    params = REGIMES[regime]
+    rng = np.random.default_rng(seed)
+    log_returns = params["drift"] + params["volatility"] * rng.standard_normal(steps)
+    log_returns[0] = 0.0
+    if "crash" in params:
+        log_returns[int(steps * params["crash_at"])] += np.log1p(params["crash"])
+    prices = start_price * np.exp(np.cumsum(log_returns))
+    return np.maximum(prices, 1).astype(np.int64)
+
+
+def read_path(path):
+    """
+    Reads a price path from a ``.npy`` file or a CSV with one price per line
+    (an optional header and extra columns after the price are ignored).
+    """
+    path = Path(path)
+    if path.suffix == ".npy":
+        return np.load(path).astype(np.int64)
+    prices = []
+    for line in path.read_text().splitlines():
+        field = line.split(",")[0].strip()
+        try:
+            prices.append(int(float(field)))
+        except ValueError:
+            continue
+    return np.array(prices, dtype=np.int64)
+
+
+def _events(tx, name):
+    return tx.events[name] if name in tx.events else []
+
+
+def load_path(oracle, prices, sender, chunk_size=500):
+    """Replaces the oracle's path with ``prices`` in ``chunk_size`` batches."""
+    oracle.clear({"from": sender})
+    prices = [int(price) for price in prices]
+    for i in range(0, len(prices), chunk_size):
+        oracle.appendPrices(prices[i : i + chunk_size], {"from": sender})
+
+
+class ScenarioRunner:
+    """
+    Drives creates and auto-exercises through a price path.
+
+    Attributes
+    ----------
+    options : ProjectContract
+        ``BufferTokenXOptionsV5`` priced by ``oracle``.
+    oracle : ProjectContract
+        ``PricePathOracle`` holding the path.
+    holders : list
+        Funded accounts that approved ``options``; they buy the options.
+    keeper : Account
+        Holder of ``AUTO_CLOSER_ROLE`` used for ``exerciseAll``.
+    amount : int
+        Amount of every option bought.
+    create_probability, exercise_probability : float
+        Chance per tick of buying an option and of exercising the open ones.
+    """
+
+    def __init__(
+        self,
+        chain,
+        options,
+        pool,
+        oracle,
+        tokenX,
+        holders,
+        keeper,
+        referrer,
+        amount,
+        create_probability=0.5,
+        exercise_probability=0.2,
+        seed=0,
+    ):
+        self.chain = chain
+        self.options = options
+        self.pool = pool
+        self.oracle = oracle
+        self.tokenX = tokenX
+        self.holders = list(holders)
+        self.keeper = keeper
+        self.referrer = referrer
+        self.amount = amount
+        self.create_probability = create_probability
+        self.exercise_probability = exercise_probability
+        self.rng = np.random.default_rng(seed)
+
+    def run(self, prices, step_size=1, by_timestamp=False, sender=None):
+        """
+        Loads ``prices`` into the oracle and replays them until the last step.
+        Every tick mines at least one block; when stepping by timestamp each
+        tick also moves the chain ``step_size`` seconds forward.
+
+        Returns a dict with the pool's ``balance_change``, ``realized_pnl``
+        (Profit minus Loss), ``locked_premium_change``, per-entry-point
+        ``gas`` lists, the ``created``/``exercised``/``skipped``/``open``
+        counts and ``ticks``, ``transactions`` and ``seconds``.
+        """
+        sender = sender or self.keeper
+        load_path(self.oracle, prices, sender)
+        balance = self.tokenX.balanceOf(self.pool)
+        locked_premium = self.pool.lockedPremium()
+        report = {
+            "gas": {"create": [], "exerciseAll": []},
+            "realized_pnl": 0,
+            "created": 0,
+            "exercised": 0,
+            "skipped": 0,
+            "ticks": 0,
+            "transactions": 0,
+        }
+        open_ids = []
+
+        start = time.perf_counter()
+        self.oracle.start(step_size, by_timestamp, {"from": sender})
+        last_step = len(prices) - 1
+        while self.oracle.currentStep() < last_step:
+            report["ticks"] += 1
+            sent = 0
+            if self.rng.random() < self.create_probability:
+                holder = self.holders[self.rng.integers(len(self.holders))]
+                tx = self.options.create(
+                    self.amount, self.referrer, "scenario", {"from": holder}
+                )
+                open_ids.append(tx.return_value)
+                report["gas"]["create"].append(tx.gas_used)
+                report["created"] += 1
+                sent += 1
+            if open_ids and self.rng.random() < self.exercise_probability:
+                tx = self.options.exerciseAll(open_ids, {"from": self.keeper})
+                exercised = {event["id"] for event in _events(tx, "Exercise")}
+                open_ids = [i for i in open_ids if i not in exercised]
+                report["gas"]["exerciseAll"].append(tx.gas_used)
+                report["exercised"] += len(exercised)
+                report["skipped"] += len(_events(tx, "ExerciseSkipped"))
+                report["realized_pnl"] += sum(
+                    event["amount"] for event in _events(tx, "Profit")
+                ) - sum(event["amount"] for event in _events(tx, "Loss"))
+                sent += 1
+            report["transactions"] += sent
+            if by_timestamp:
+                self.chain.sleep(step_size)
+            if by_timestamp or not sent:
+                self.chain.mine()
+        report["seconds"] = time.perf_counter() - start
+
+        report["balance_change"] = self.tokenX.balanceOf(self.pool) - balance
+        report["locked_premium_change"] = self.pool.lockedPremium() - locked_premium
+        report["open"] = len(open_ids)
+        return report
+
+
+def summarize(report):
+    """One-line summary of a ``ScenarioRunner.run`` report."""
+    gas = {
+        name: int(np.mean(values)) if values else 0
+        for name, values in report["gas"].items()
+    }
+    return (
+        f"{report['ticks']} ticks, {report['created']} created, "
+        f"{report['exercised']} exercised, {report['open']} open, "
+        f"realized P&L {report['realized_pnl'] / 1e18:+.6f}, "
+        f"mean gas {gas}, "
+        f"{report['transactions'] / report['seconds']:.1f} tx/s"
+    )
@@ -0,0 +1,81 @@
+"""
+Reads a declared set of contract views in a single ``eth_call``.
+
+``StateSnapshot`` collects ``(key, view, args)`` entries, encodes them with the
+brownie ``ContractCall`` ABI and runs them through the ``Multicall`` test
+contract. ``take()`` returns a ``Snapshot`` mapping every key to its decoded
+value (``None`` if the call reverted) and ``diff`` compares two snapshots.
+"""
+
+
+class Snapshot(dict):
+    """Decoded view values by key, read at ``block``."""
+
+    def __init__(self, values, block):
+        super().__init__(values)
+        self.block = block
+
+
+class Diff(dict):
+    """
+    Changes between two snapshots. Integer values map to ``after - before``
+    (0 when unchanged), other values to ``(before, after)`` and are only
+    present when they changed. Keys not declared in either snapshot raise
+    ``KeyError``.
+    """
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class StateSnapshot:
+    """
+    Declared set of views read together.
+
+    Attributes
+    ----------
+    multicall : Contract
+        Deployed ``Multicall``.
+    views : list
+        ``(key, ContractCall, args)`` in declaration order.
+    """
+
+    def __init__(self, multicall):
+        self.multicall = multicall
+        self.views = []
+
+    def add(self, key, view, *args):
+        """Declares ``view(*args)`` under ``key``. Returns self for chaining."""
+        self.views.append((key, view, args))
+        return self
+
+    def balances(self, token, **accounts):
+        """Declares ``token.balanceOf(address)`` for every ``name=address``."""
+        for name, account in accounts.items():
+            self.add(name, token.balanceOf, account)
+        return self
+
+    def take(self, block_identifier=None):
+        calls = [
+            (view._address, view.encode_input(*args)) for _, view, args in self.views
+        ]
+        kwargs = (
+            {} if block_identifier is None else {"block_identifier": block_identifier}
+        )
+        block, results = self.multicall.aggregate(calls, **kwargs)
+        values = {}
+        for (key, view, _), (success, data) in zip(self.views, results):
+            values[key] = view.decode_output(data) if success else None
+        return Snapshot(values, block)
+
+    @staticmethod
+    def diff(before, after):
+        changes = Diff()
+        for key in {**before, **after}:
+            previous, value = before.get(key), after.get(key)
+            if _is_int(value) and _is_int(previous):
+                changes[key] = value - previous
+            elif value != previous:
+                changes[key] = (previous, value)
+        return changes
@@ -0,0 +1,103 @@
+"""
+Builds ``unlockAll`` batches for expired options.
+
+``UnlockBatcher`` takes the expired ``Active`` options from an
+``OptionIndexer`` and packs them into as few ``unlockAll`` calls as fit under
+a target gas limit. The gas of a batch is modelled as ``base_gas +
+gas_per_option * n``; the model is calibrated with two ``eth_estimateGas``
+calls, and every planned batch is estimated once more and shrunk if the model
+under-shot.
+"""
+
+from math import floor
+
+
+def plan_batches(option_ids, gas_limit, base_gas, gas_per_option):
+    """
+    Splits ``option_ids`` into consecutive batches of the largest size whose
+    modelled gas stays within ``gas_limit``.
+    """
+    size = floor((gas_limit - base_gas) / gas_per_option)
+    if size < 1:
+        raise ValueError(f"gas limit {gas_limit} doesn't fit a single unlock")
+    option_ids = list(option_ids)
+    return [option_ids[i : i + size] for i in range(0, len(option_ids), size)]
+
+
+class UnlockBatcher:
+    """
+    Plans ``unlockAll`` transactions for the options an indexer reports as
+    expired.
+
+    Attributes
+    ----------
+    indexer : OptionIndexer
+        Synced index the expired options are read from.
+    gas_limit : int
+        Target gas per ``unlockAll`` transaction.
+    margin : float
+        Fraction of ``gas_limit`` kept free for estimation error.
+    base_gas, gas_per_option : int
+        Gas model, set by ``calibrate``.
+    """
+
+    def __init__(self, indexer, gas_limit=10_000_000, margin=0.05):
+        self.indexer = indexer
+        self.gas_limit = gas_limit
+        self.margin = margin
+        self.base_gas = None
+        self.gas_per_option = None
+
+    def expired_options(self, timestamp=None):
+        """IDs of the indexed active options that expired before ``timestamp``."""
+        if timestamp is None:
+            timestamp = self.indexer.web3.eth.get_block("latest")["timestamp"]
+        return [option["id"] for option in self.indexer.expiring_before(timestamp - 1)]
+
+    def estimate_gas(self, option_ids, sender):
+        return self.indexer.options.functions.unlockAll(list(option_ids)).estimate_gas(
+            {"from": sender}
+        )
+
+    def calibrate(self, option_ids, sender, sample_size=20):
+        """
+        Fits the gas model on the first ``sample_size`` of ``option_ids``,
+        which must be unlockable.
+        """
+        sample = list(option_ids)[:sample_size]
+        single = self.estimate_gas(sample[:1], sender)
+        if len(sample) > 1:
+            self.gas_per_option = -(
+                -(self.estimate_gas(sample, sender) - single) // (len(sample) - 1)
+            )
+        else:
+            self.gas_per_option = single
+        self.base_gas = max(single - self.gas_per_option, 0)
+        return self.base_gas, self.gas_per_option
+
+    def batches(self, sender, timestamp=None):
+        """
+        Returns the expired options split into maximal batches whose estimated
+        gas is within the target limit.
+        """
+        option_ids = self.expired_options(timestamp)
+        if not option_ids:
+            return []
+        if self.gas_per_option is None:
+            self.calibrate(option_ids, sender)
+
+        limit = int(self.gas_limit * (1 - self.margin))
+        pending = plan_batches(option_ids, limit, self.base_gas, self.gas_per_option)
+        batches = []
+        while pending:
+            batch = pending.pop(0)
+            while len(batch) > 1:
+                gas = self.estimate_gas(batch, sender)
+                if gas <= limit:
+                    break
+                # Shrink in proportion to the overshoot, by at least one option
+                size = max(1, min(len(batch) - 1, floor(len(batch) * limit / gas)))
+                pending.insert(0, batch[size:])
+                batch = batch[:size]
+            batches.append(batch)
+        return batches
@@ -0,0 +1,143 @@
+"""
+Warm-start cache for the test chain.
+
+A cold run starts ganache-cli with ``--db`` pointing at a fresh directory,
+deploys the session contracts as usual and, once the run has reverted the
+chain back to the deployed state, keeps that database together with the
+contract addresses and the deployment block. The cache is keyed by a hash of
+the contract sources, ``brownie-config.yaml`` and ``tests/conftest.py``, so
+any change to what gets deployed starts a new one.
+
+A warm run copies the cached database to a temporary directory and starts
+ganache-cli on the copy, with ``--time`` set to the deployment block so that
+expiries fixed at deployment are still ahead. The session fixtures then load
+the contracts at their saved addresses instead of deploying them.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+CACHE_DIR = os.environ.get("WARM_START_CACHE", ".warm_chain")
+SOURCES = ("contracts", "brownie-config.yaml", "tests/conftest.py")
+
+
+def source_hash(sources=SOURCES):
+    """SHA-256 over the paths and contents of every file in ``sources``."""
+    digest = hashlib.sha256()
+    for source in sources:
+        source = Path(source)
+        paths = sorted(source.rglob("*")) if source.is_dir() else [source]
+        for path in paths:
+            if path.is_file():
+                digest.update(path.as_posix().encode())
+                digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+class WarmChain:
+    """
+    Cached chain state for one set of sources.
+
+    Attributes
+    ----------
+    path : Path
+        Cache directory holding ``db/`` and ``deployment.json``.
+    manifest : dict
+        Saved ``addresses``, ``block_number``, ``block_hash``, ``timestamp``
+        and ``startup`` (cold startup seconds), None before the first save.
+    build : bool
+        Whether a cold run saves its deployment for later runs.
+    startup : float
+        Seconds from ``configure`` until the deployment was usable.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, key=None, build=True):
+        self.path = Path(cache_dir).resolve() / (key or source_hash())
+        self.build = build
+        manifest = self.path / "deployment.json"
+        self.manifest = json.loads(manifest.read_text()) if manifest.exists() else None
+        self.startup = None
+        self._started = None
+        self._db = None
+        self._pending = None
+
+    @property
+    def warm(self):
+        return self.manifest is not None
+
+    @property
+    def addresses(self):
+        return self.manifest["addresses"] if self.warm else None
+
+    def configure(self, network):
+        """
+        Points the brownie ``network`` config (the ``development`` entry) at
+        the database this run should use. Must be called before brownie
+        launches ganache-cli.
+        """
+        self._started = time.perf_counter()
+        if self.warm:
+            self._db = Path(tempfile.mkdtemp(prefix="warm_chain_")) / "db"
+            shutil.copytree(self.path / "db", self._db)
+            network["cmd_settings"]["time"] = datetime.datetime.fromtimestamp(
+                self.manifest["timestamp"], datetime.timezone.utc
+            )
+        elif self.build:
+            self._db = self.path.with_suffix(".building") / "db"
+            shutil.rmtree(self._db.parent, ignore_errors=True)
+            self._db.mkdir(parents=True)
+        else:
+            return
+        network["cmd"] = f"{network['cmd']} --db {self._db}"
+
+    def deployed(self, addresses, block):
+        """Called once the session contracts are deployed (or loaded)."""
+        self.startup = time.perf_counter() - self._started
+        if not self.warm and self.build:
+            self._pending = {
+                "addresses": addresses,
+                "block_number": block.number,
+                "block_hash": block.hash.hex(),
+                "timestamp": block.timestamp,
+                "startup": self.startup,
+            }
+
+    def finish(self, head):
+        """
+        Saves a cold run's database if the chain ``head`` (None when the
+        node is gone) is back at the deployment block, and removes a warm
+        run's temporary copy.
+        """
+        if self._db is None:
+            return False
+        if self.warm or self._pending is None:
+            shutil.rmtree(self._db.parent, ignore_errors=True)
+            return False
+        if head is None or (head.number, head.hash.hex()) != (
+            self._pending["block_number"],
+            self._pending["block_hash"],
+        ):
+            # Interrupted, or a test left state behind
+            shutil.rmtree(self._db.parent, ignore_errors=True)
+            return False
+        building = self._db.parent
+        (building / "deployment.json").write_text(json.dumps(self._pending, indent=2))
+        shutil.rmtree(self.path, ignore_errors=True)
+        building.rename(self.path)
+        return True
+
+    def summary(self):
+        if self.startup is None:
+            return None
+        if self.warm:
+            return (
+                f"warm start from {self.path.name}: {self.startup:.1f}s "
+                f"(cold start: {self.manifest['startup']:.1f}s)"
+            )
+        return f"cold start: {self.startup:.1f}s"
@@ -0,0 +1,256 @@
+"""
+Shared deployment for the V5 test suite.
+
+The contracts are deployed once per session. Every test that uses the chain
+(brownie's ``chain``, ``accounts`` or ``web3`` fixtures, directly or through
+a contract fixture) then runs between a ``chain.snapshot()`` and a
+``chain.revert()``, so state changes (including ``chain.sleep``) never leak
+into the next test. Brownie keeps a single snapshot, so tests must not take
+snapshots of their own; scenarios that need to rewind the chain belong in a
+separate test instead. Off-chain tests neither deploy nor snapshot, and run
+without a chain under ``pytest -p no:pytest-brownie``.
+
+``brownie test -n auto`` (requires pytest-xdist) runs the suite in parallel.
+Brownie starts a separate ganache-cli for every worker on the configured port
+plus the worker number, so each worker deploys its own contracts and can move
+chain time freely. Brownie merges the workers' coverage; the gas benchmark
+results are merged by the hooks below into a single report. Because every test
+is isolated on its own, tests are handed out one by one instead of by module.
+
+``WARM_START=1`` keeps the deployed chain between runs (see
+``scripts/warm_chain.py``). The first run for a given set of sources deploys
+and saves the chain database, later runs load it and skip deployment. The
+cold and warm startup times are printed in the summary.
+
+``GAS_BASELINE_PORT_OFFSET`` moves the chain to the configured port plus the
+offset. ``scripts/gas_baseline.py`` sets it when it generates the gas
+baseline from inside another test run.
+"""
+
+import os
+
+import pytest
+
+from scripts import gas_baseline
+from scripts.gas_benchmark import UPDATE_BASELINE, GasBenchmark
+from scripts.warm_chain import WarmChain
+
+ONE_DAY = 86400
+PRICE = 400 * 10**8
+STRIKE = 350 * 10**8
+IMPLIED_VOL = 4500
+TOKEN_SUPPLY = 10**27
+LIQUIDITY = 3 * 10**18
+# Brownie fixtures that every on-chain fixture and test depends on
+CHAIN_FIXTURES = {"chain", "accounts", "web3"}
+
+# Gas benchmark results received from the xdist workers
+_worker_gas = GasBenchmark()
+_warm_chain = None
+
+
+def pytest_configure(config):
+    global _warm_chain
+    from brownie._config import CONFIG
+
+    network = (
+        config.getoption("network", None) or CONFIG.settings["networks"]["default"]
+    )
+    port_offset = int(os.environ.get("GAS_BASELINE_PORT_OFFSET", "0"))
+    if port_offset:
+        CONFIG.networks[network]["cmd_settings"]["port"] += port_offset
+    xdist_controller = config.getoption("numprocesses", None) and not hasattr(
+        config, "workerinput"
+    )
+    if not os.environ.get("WARM_START") or xdist_controller:
+        return
+    # Workers share the saved state but only serial runs save it
+    _warm_chain = WarmChain(build=not hasattr(config, "workerinput"))
+    _warm_chain.configure(CONFIG.networks[network])
+
+
+def pytest_unconfigure(config):
+    if _warm_chain is None:
+        return
+    from brownie import web3
+
+    _warm_chain.finish(web3.eth.get_block("latest") if web3.isConnected() else None)
+
+
+def pytest_terminal_summary(terminalreporter):
+    summary = _warm_chain and _warm_chain.summary()
+    if summary:
+        terminalreporter.write_line(summary)
+
+
+@pytest.fixture(scope="session")
+def warm_deployment(chain):
+    """Saved contract addresses when starting from a warm chain, else None."""
+    if _warm_chain is None or not _warm_chain.warm:
+        return None
+    # Picks up the --time offset of the restored chain
+    chain.sleep(0)
+    return _warm_chain.addresses
+
+
+@pytest.fixture(scope="session")
+def owner(accounts):
+    return accounts[0]
+
+
+@pytest.fixture(scope="session")
+def option_math(ABDKMath64x64, OptionMath, owner, warm_deployment):
+    if warm_deployment:
+        return OptionMath.at(warm_deployment["option_math"])
+    ABDKMath64x64.deploy({"from": owner})
+    return OptionMath.deploy({"from": owner})
+
+
+@pytest.fixture(scope="session")
+def tokenX(TokenXTest, owner, warm_deployment):
+    if warm_deployment:
+        return TokenXTest.at(warm_deployment["tokenX"])
+    return TokenXTest.deploy(TOKEN_SUPPLY, {"from": owner})
+
+
+@pytest.fixture(scope="session")
+def twap(SlidingWindowOracleTest, owner, warm_deployment):
+    if warm_deployment:
+        return SlidingWindowOracleTest.at(warm_deployment["twap"])
+    return SlidingWindowOracleTest.deploy(PRICE, {"from": owner})
+
+
+@pytest.fixture(scope="session")
+def ibfr_pool(BufferIBFRPoolV5, tokenX, owner, chain, warm_deployment):
+    if warm_deployment:
+        return BufferIBFRPoolV5.at(warm_deployment["ibfr_pool"])
+    return BufferIBFRPoolV5.deploy(tokenX, chain.time() + 10 * ONE_DAY, {"from": owner})
+
+
+@pytest.fixture(scope="session")
+def options_config(OptionConfig, ibfr_pool, owner, accounts, warm_deployment):
+    if warm_deployment:
+        return OptionConfig.at(warm_deployment["options_config"])
+    return OptionConfig.deploy(
+        accounts[5], IMPLIED_VOL, STRIKE, ibfr_pool, {"from": owner}
+    )
+
+
+@pytest.fixture(scope="session")
+def tokenX_options_v5(
+    BufferTokenXOptionsV5,
+    option_math,
+    tokenX,
+    ibfr_pool,
+    twap,
+    options_config,
+    owner,
+    warm_deployment,
+):
+    if warm_deployment:
+        return BufferTokenXOptionsV5.at(warm_deployment["tokenX_options_v5"])
+    options = BufferTokenXOptionsV5.deploy(
+        tokenX, ibfr_pool, tokenX, tokenX, twap, options_config, {"from": owner}
+    )
+    ibfr_pool.grantRole(ibfr_pool.OPTION_ISSUER_ROLE(), options, {"from": owner})
+    return options
+
+
+@pytest.fixture(scope="session")
+def multicall(Multicall, owner, warm_deployment):
+    if warm_deployment:
+        return Multicall.at(warm_deployment["multicall"])
+    return Multicall.deploy({"from": owner})
+
+
+@pytest.fixture(scope="session")
+def session_contracts(
+    chain,
+    option_math,
+    tokenX,
+    twap,
+    ibfr_pool,
+    options_config,
+    tokenX_options_v5,
+    multicall,
+):
+    """Every session contract, deployed or loaded from a warm chain."""
+    contracts = {
+        "option_math": option_math,
+        "tokenX": tokenX,
+        "twap": twap,
+        "ibfr_pool": ibfr_pool,
+        "options_config": options_config,
+        "tokenX_options_v5": tokenX_options_v5,
+        "multicall": multicall,
+    }
+    if _warm_chain is not None:
+        _warm_chain.deployed(
+            {name: contract.address for name, contract in contracts.items()},
+            chain[-1],
+        )
+    return contracts
+
+
+@pytest.fixture(scope="module")
+def module_isolation():
+    """
+    Replaces brownie's fixture of the same name, whose ``chain.reset()`` would
+    discard the session deployment. Brownie's xdist workers only run tests
+    that request it; ``isolation`` already reverts after every test.
+    """
+    yield
+
+
+@pytest.fixture(autouse=True)
+def isolation(request, module_isolation):
+    if CHAIN_FIXTURES.isdisjoint(request.fixturenames):
+        yield
+        return
+    chain = request.getfixturevalue("chain")
+    request.getfixturevalue("session_contracts")
+    chain.snapshot()
+    yield
+    chain.revert()
+
+
+@pytest.fixture
+def liquidity(tokenX, ibfr_pool, owner):
+    """Seeds the pool with LIQUIDITY tokenX provided by the owner."""
+    tokenX.approve(ibfr_pool, LIQUIDITY, {"from": owner})
+    ibfr_pool.provide(LIQUIDITY, 0, {"from": owner})
+    return LIQUIDITY
+
+
+@pytest.hookimpl(optionalhook=True, tryfirst=True)
+def pytest_xdist_make_scheduler(config, log):
+    # Brownie schedules whole modules, which leaves most workers idle while
+    # the gas benchmarks run
+    from xdist.scheduler import LoadScheduling
+
+    return LoadScheduling(config, log)
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    _worker_gas.merge(getattr(node, "workeroutput", {}).get("gas_benchmarks", {}))
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if hasattr(session.config, "workerinput") or not _worker_gas.results:
+        return
+    if not UPDATE_BASELINE:
+        gas_baseline.ensure()
+    checked = _worker_gas.check()
+    if checked is None:
+        return
+    reporter = session.config.pluginmanager.get_plugin("terminalreporter")
+    rows, failures = checked
+    reporter.section("gas benchmarks")
+    for path, old, new, change in rows:
+        reporter.write_line(f"{path}: {old} -> {new} ({change:+}%)")
+    if failures:
+        reporter.write_line("gas regressions:", red=True)
+        for path, old, new, change in failures:
+            reporter.write_line(f"{path}: {old} -> {new} (+{change}%)", red=True)
+        session.exitstatus = pytest.ExitCode.TESTS_FAILED
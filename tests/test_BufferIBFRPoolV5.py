@@ -0,0 +1,94 @@
+import brownie
+import pytest
+
+ONE_DAY = 86400
+DEPOSIT = 10**17
+
+
+@pytest.fixture
+def providers(accounts, tokenX, ibfr_pool, liquidity, owner):
+    providers = accounts[1:5]
+    for provider in providers:
+        tokenX.transfer(provider, DEPOSIT, {"from": owner})
+        tokenX.approve(ibfr_pool, DEPOSIT, {"from": provider})
+        ibfr_pool.provide(DEPOSIT, 0, {"from": provider})
+    return providers
+
+
+def expire(ibfr_pool, chain):
+    chain.sleep(ibfr_pool.fixedExpiry() - chain.time() + ONE_DAY)
+    chain.mine(1)
+
+
+def test_withdraw_requests_are_queued(ibfr_pool, providers):
+    for i, provider in enumerate(providers):
+        ibfr_pool.withdraw(DEPOSIT // (i + 1), provider, {"from": provider})
+
+    assert ibfr_pool.requestCount() == len(providers)
+    assert ibfr_pool.withdrawRequestTail() - ibfr_pool.withdrawRequestHead() == 4
+    assert ibfr_pool.pendingWithdrawRequests(0, 10) == [
+        (DEPOSIT // (i + 1), provider) for i, provider in enumerate(providers)
+    ]
+    assert ibfr_pool.pendingWithdrawRequests(1, 2) == [
+        (DEPOSIT // 2, providers[1]),
+        (DEPOSIT // 3, providers[2]),
+    ]
+    assert ibfr_pool.pendingWithdrawRequests(4, 10) == []
+    assert ibfr_pool.pendingWithdrawRequests(2, 2**256 - 1) == [
+        (DEPOSIT // 3, providers[2]),
+        (DEPOSIT // 4, providers[3]),
+    ]
+    assert ibfr_pool.pendingWithdrawRequests(2**256 - 1, 2**256 - 1) == []
+
+    with brownie.reverts("Withdraw requests can't be processed before expiry"):
+        ibfr_pool.processWithdrawRequests(10, {"from": providers[0]})
+
+
+def test_process_withdraw_requests_in_order(
+    ibfr_pool, tokenX, providers, accounts, chain
+):
+    # The third request asks for more than the provider owns and gets skipped
+    amounts = [DEPOSIT, DEPOSIT // 2, 2 * DEPOSIT, DEPOSIT // 4]
+    for provider, amount in zip(providers, amounts):
+        ibfr_pool.withdraw(amount, provider, {"from": provider})
+    balances = [tokenX.balanceOf(provider) for provider in providers]
+    expire(ibfr_pool, chain)
+
+    keeper = accounts[6]
+    tx = ibfr_pool.processWithdrawRequests(2, {"from": keeper})
+    assert tx.return_value == 2
+    assert ibfr_pool.withdrawRequestHead() == 2
+    assert ibfr_pool.requestCount() == 2
+    assert ibfr_pool.pendingWithdrawRequests(0, 10) == [
+        (2 * DEPOSIT, providers[2]),
+        (DEPOSIT // 4, providers[3]),
+    ]
+
+    tx = ibfr_pool.processWithdrawRequests(10, {"from": keeper})
+    assert tx.return_value == 2
+    assert tx.events["SkippedWithdrawRequest"]["requestIndex"] == 2
+    assert ibfr_pool.requestCount() == 0
+    assert ibfr_pool.pendingWithdrawRequests(0, 10) == []
+
+    received = [
+        tokenX.balanceOf(provider) - balance
+        for provider, balance in zip(providers, balances)
+    ]
+    assert received == [DEPOSIT, DEPOSIT // 2, 0, DEPOSIT // 4]
+
+    # Nothing left to process
+    assert ibfr_pool.processWithdrawRequests(10, {"from": keeper}).return_value == 0
+
+
+def test_reset_withdraw_request_queue(ibfr_pool, providers, owner, chain):
+    for provider in providers:
+        ibfr_pool.withdraw(DEPOSIT, provider, {"from": provider})
+    expire(ibfr_pool, chain)
+
+    with brownie.reverts("msg.sender is not allowed to reset"):
+        ibfr_pool.resetWithdrawRequestQueue({"from": providers[0]})
+    ibfr_pool.resetWithdrawRequestQueue({"from": owner})
+
+    assert ibfr_pool.requestCount() == 0
+    assert ibfr_pool.pendingWithdrawRequests(0, 10) == []
+    assert ibfr_pool.processWithdrawRequests(10, {"from": owner}).return_value == 0
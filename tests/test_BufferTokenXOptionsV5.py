@@ -2,6 +2,10 @@ from enum import IntEnum
 from math import isclose
 
 import brownie
+import pytest
+from eth_utils import function_signature_to_4byte_selector
+
+from scripts.state_snapshot import StateSnapshot
 
 
 class OptionType(IntEnum):
@@ -11,6 +15,21 @@ class OptionType(IntEnum):
     NONE = 3
 
 
+class ExerciseSkipReason(IntEnum):
+    NONEXISTENT_TOKEN = 0
+    SAME_BLOCK = 1
+    NOT_ELIGIBLE = 2
+    EXPIRED = 3
+    NOT_ACTIVE = 4
+    OUT_OF_THE_MONEY = 5
+
+
+class UnlockSkipReason(IntEnum):
+    NOT_EXPIRED = 0
+    NOT_ACTIVE = 1
+    NONEXISTENT_TOKEN = 2
+
+
 ONE_DAY = 86400
 
 
@@ -33,8 +52,12 @@ class OptionTesting(object):
         chain,
         tokenX,
         liquidity,
+        options_config,
+        multicall,
     ):
         self.tokenX_options = options
+        self.multicall = multicall
+        self.options_config = options_config
         self.generic_pool = generic_pool
         self.amount = amount
         self.option_holder = accounts[4]
@@ -50,7 +73,7 @@ class OptionTesting(object):
         self.chain = chain
         self.expiry = self.generic_pool.fixedExpiry()
         self.period = self.expiry - self.chain.time()
-        self.strike = self.tokenX_options.fixedStrike()
+        self.strike = self.options_config.fixedStrike()
 
     def verify_option_type(self):
         # Should verify that fixedOptionType is Call
@@ -119,17 +142,20 @@ class OptionTesting(object):
 
         self.tokenX.transfer(self.option_holder, total_fee, {"from": self.owner})
 
-        settlementFeeRecipient = self.tokenX_options.settlementFeeRecipient()
-        stakingFeePercentage = self.tokenX_options.stakingFeePercentage()
-        referralRewardPercentage = self.tokenX_options.referralRewardPercentage()
-
-        initial_tokenX_balance_option_holder = self.tokenX.balanceOf(self.option_holder)
-        initial_tokenX_balance_settlementFeeRecipient = self.tokenX.balanceOf(
-            settlementFeeRecipient
+        settlementFeeRecipient = self.options_config.settlementFeeRecipient()
+        stakingFeePercentage = self.options_config.stakingFeePercentage()
+        referralRewardPercentage = self.options_config.referralRewardPercentage()
+
+        balances = StateSnapshot(self.multicall).balances(
+            self.tokenX,
+            option_holder=self.option_holder,
+            settlement_fee_recipient=settlementFeeRecipient,
+            pool=self.generic_pool.address,
+            owner=self.owner,
+            referrer=self.referrer,
+            options=self.tokenX_options.address,
         )
-        initial_tokenX_balance_pool = self.tokenX.balanceOf(self.generic_pool.address)
-        initial_tokenX_balance_owner = self.tokenX.balanceOf(self.owner)
-        initial_tokenX_balance_referrer = self.tokenX.balanceOf(self.referrer)
+        initial = balances.take()
 
         self.tokenX.approve(
             self.tokenX_options.address, total_fee, {"from": self.option_holder}
@@ -154,33 +180,21 @@ class OptionTesting(object):
         referralReward = (adminFee * referralRewardPercentage) / 100
         adminFee = adminFee - referralReward
 
-        final_tokenX_balance_option_holder = self.tokenX.balanceOf(self.option_holder)
-        final_tokenX_balance_settlementFeeRecipient = self.tokenX.balanceOf(
-            settlementFeeRecipient
-        )
-        final_tokenX_balance_pool = self.tokenX.balanceOf(self.generic_pool.address)
-        final_tokenX_balance_owner = self.tokenX.balanceOf(self.owner)
-        final_tokenX_balance_referrer = self.tokenX.balanceOf(self.referrer)
-        print(final_tokenX_balance_pool - initial_tokenX_balance_pool, "premium")
+        final = balances.take()
+        change = StateSnapshot.diff(initial, final)
+        print(change["pool"], "premium")
         print("stakingAmount", stakingAmount / 1e18)
         print("referralReward", referralReward / 1e18)
         print("adminFee", adminFee / 1e18)
         print("premium", premium / 1e18)
         print("total_fee", total_fee / 1e18)
         print("_locked_amount", _locked_amount / 1e18)
+        assert final["options"] == 0, "Something went wrong"
+        assert change["owner"] == adminFee, "Wrong admin fee transfer"
         assert (
-            self.tokenX.balanceOf(self.tokenX_options.address) == 0
-        ), "Something went wrong"
-        assert (
-            final_tokenX_balance_owner - initial_tokenX_balance_owner
-        ) == adminFee, "Wrong admin fee transfer"
-        assert (
-            final_tokenX_balance_settlementFeeRecipient
-            - initial_tokenX_balance_settlementFeeRecipient
-        ) == stakingAmount, "Wrong stakingAmount transfer"
-        assert (
-            final_tokenX_balance_referrer - initial_tokenX_balance_referrer
-        ) == referralReward, "Wrong referralReward transfer"
+            change["settlement_fee_recipient"] == stakingAmount
+        ), "Wrong stakingAmount transfer"
+        assert change["referrer"] == referralReward, "Wrong referralReward transfer"
         assert _strike == self.strike, "option creation should go through"
         assert _expiration == self.expiry, "option creation should go through"
         # Can't compare the fee as it won't be exactly same as it is dependent on block timestamp
@@ -193,7 +207,6 @@ class OptionTesting(object):
 
     def verify_unlocking(self):
         # unlock() Unchanged
-        self.chain.snapshot()
         with brownie.reverts("Option has not expired yet"):
             self.tokenX_options.unlock(self.option_id, {"from": self.option_holder})
 
@@ -208,7 +221,6 @@ class OptionTesting(object):
         )
         unlock_events = unlock_option.events
         assert unlock_events, "Should unlock on expiry"
-        self.chain.revert()
 
     def verify_exercise(self):
         # canExercise()
@@ -231,21 +243,19 @@ class OptionTesting(object):
             option["lockedAmount"],
         )
 
-        initial_tokenX_balance_option_holder = self.tokenX.balanceOf(self.option_holder)
-        initial_tokenX_balance_pool = self.tokenX.balanceOf(self.generic_pool.address)
+        balances = StateSnapshot(self.multicall).balances(
+            self.tokenX,
+            option_holder=self.option_holder,
+            pool=self.generic_pool.address,
+        )
+        initial = balances.take()
 
         self.chain.mine(50)
         self.tokenX_options.exercise(self.option_id, {"from": self.option_holder})
 
-        final_tokenX_balance_option_holder = self.tokenX.balanceOf(self.option_holder)
-        final_tokenX_balance_pool = self.tokenX.balanceOf(self.generic_pool.address)
-
-        assert (
-            final_tokenX_balance_option_holder - initial_tokenX_balance_option_holder
-        ) == profit, "Wrong fee transfer"
-        assert (
-            initial_tokenX_balance_pool - final_tokenX_balance_pool
-        ) == profit, "pool sent wrong profit"
+        change = StateSnapshot.diff(initial, balances.take())
+        assert change["option_holder"] == profit, "Wrong fee transfer"
+        assert -change["pool"] == profit, "pool sent wrong profit"
 
     def verify_auto_exercise(self):
         with brownie.reverts("msg.sender is not eligible to exercise the option"):
@@ -259,7 +269,6 @@ class OptionTesting(object):
             self.accounts[7],
             {"from": self.owner},
         )
-        self.chain.snapshot()
 
         last_half_hour_of_expiry = self.period - 27 * 60
         self.chain.sleep(last_half_hour_of_expiry)
@@ -268,22 +277,21 @@ class OptionTesting(object):
         exercise = self.tokenX_options.exercise(
             self.option_id, {"from": self.accounts[7]}
         )
-        self.chain.revert()
 
     def verify_fixed_params(self):
         expiry = self.generic_pool.fixedExpiry() + ONE_DAY * 10
-        strike = self.tokenX_options.fixedStrike() + int(1e8)
+        strike = self.options_config.fixedStrike() + int(1e8)
 
         with brownie.reverts("Can't change expiry before the expiry ends"):
             self.generic_pool.setExpiry(expiry)
         with brownie.reverts("Can't change strike before the expiry ends"):
-            self.tokenX_options.setStrike(strike)
+            self.options_config.setStrike(strike)
 
         self.chain.sleep(self.period + ONE_DAY)
         self.chain.mine(1)
 
-        self.tokenX_options.setStrike(strike)
-        fixedStrike = self.tokenX_options.fixedStrike()
+        self.options_config.setStrike(strike)
+        fixedStrike = self.options_config.fixedStrike()
         self.generic_pool.setExpiry(expiry)
         fixedExpiry = self.generic_pool.fixedExpiry()
 
@@ -322,9 +330,7 @@ class OptionTesting(object):
 
         # unlockAll() Unchanged
 
-        # unlock() Unchanged
-
-        self.verify_unlocking()
+        # unlock() is covered by unlocking_flow_test as it moves past expiry
 
         self.verify_exercise()
         print("exercised", self.option_id)
@@ -334,28 +340,15 @@ class OptionTesting(object):
         self.verify_auto_exercise()
         print("exercised", self.option_id)
 
+    def unlocking_flow_test(self):
+        self.verify_creation()
+        self.verify_unlocking()
 
-def test_tokenX_options(contracts, accounts, chain):
 
-    (
-        token_contract,
-        staking_ibfr_for_bnb,
-        pool,
-        pp,
-        options,
-        genericOptions,
-        generic_pool,
-        tokenX,
-        pancakePair,
-        tokenX_options,
-        fixed_bnb_options,
-        trader_nft,
-        staking_rbfr_for_ibfr,
-        ibfr_options,
-        tokenX_options_v5,
-        fixed_bnb_options_v5,
-        ibfr_pool,
-    ) = contracts
+@pytest.fixture
+def option_testing(
+    accounts, tokenX_options_v5, ibfr_pool, chain, tokenX, options_config, multicall
+):
     amount = int(1e18) // 100
     meta = "test"
     liquidity = int(1 * 1e18)
@@ -369,6 +362,265 @@ def test_tokenX_options(contracts, accounts, chain):
         chain,
         tokenX,
         liquidity,
+        options_config,
+        multicall,
     )
     option.verify_fixed_params()
-    option.complete_flow_test()
+    return option
+
+
+def test_tokenX_options(option_testing):
+    option_testing.complete_flow_test()
+
+
+def test_unlocking(option_testing):
+    option_testing.unlocking_flow_test()
+
+
+def test_create_batch(
+    accounts, tokenX_options_v5, ibfr_pool, tokenX, options_config, liquidity
+):
+    holder, referrer = accounts[1], accounts[3]
+    amounts = [int(1e18) // 100, int(1e18) // 1000, int(1e18) // 50]
+    tokenX.transfer(holder, int(1e18), {"from": accounts[0]})
+    tokenX.approve(tokenX_options_v5, int(1e18), {"from": holder})
+
+    staking = options_config.settlementFeeRecipient()
+    initial_holder_balance = tokenX.balanceOf(holder)
+    initial_pool_balance = tokenX.balanceOf(ibfr_pool)
+    initial_staking_balance = tokenX.balanceOf(staking)
+    tx = tokenX_options_v5.createBatch(
+        amounts, referrer, ["a", "b", "c"], {"from": holder}
+    )
+    option_ids = tx.return_value
+
+    assert list(option_ids) == [0, 1, 2]
+    assert len(tx.events["Create"]) == len(amounts)
+    assert tokenX.balanceOf(tokenX_options_v5) == 0, "Something went wrong"
+    assert tokenX_options_v5.autoExerciseStatus(holder)
+
+    total_fee = sum(event["totalFee"] for event in tx.events["Create"])
+    assert initial_holder_balance - tokenX.balanceOf(holder) == total_fee
+
+    premiums = []
+    for option_id, amount, uri in zip(option_ids, amounts, ["a", "b", "c"]):
+        option = tokenX_options_v5.options(option_id)
+        assert option[0] == 1, "option should be active"
+        assert option[1] == options_config.fixedStrike()
+        assert option[2] == amount
+        assert (
+            option[3] == amount * options_config.optionCollateralizationRatio() // 100
+        )
+        assert option[5] == ibfr_pool.fixedExpiry()
+        assert tokenX_options_v5.ownerOf(option_id) == holder
+        assert tokenX_options_v5.tokenURI(option_id) == uri
+        assert ibfr_pool.lockedLiquidity(tokenX_options_v5, option_id) == (
+            option[3],
+            option[4],
+            True,
+        )
+        premiums.append(option[4])
+
+    assert tokenX.balanceOf(ibfr_pool) - initial_pool_balance == sum(premiums)
+    assert ibfr_pool.lockedPremium() == sum(premiums)
+    assert ibfr_pool.getLockedAmount() == sum(amounts)
+
+    # The per-option fees add up to the fees paid out for the whole batch
+    staking_fee = sum(event["settlementFee"] for event in tx.events["Create"])
+    assert tokenX.balanceOf(staking) - initial_staking_balance == staking_fee
+    referral_fee = tx.events["PayReferralFee"]["amount"]
+    admin_fee = tx.events["PayAdminFee"]["amount"]
+    assert staking_fee + referral_fee + admin_fee == total_fee - sum(premiums)
+
+    # Options from a batch settle like any other option
+    tokenX_options_v5.exercise(option_ids[1], {"from": holder})
+    assert tokenX_options_v5.options(option_ids[1])[0] == 2
+
+
+def test_fee_accrual(accounts, tokenX_options_v5, tokenX, options_config, liquidity):
+    owner, holder, referrer = accounts[0], accounts[1], accounts[3]
+    staking = options_config.settlementFeeRecipient()
+    amount = int(1e18) // 100
+    tokenX.transfer(holder, int(1e18), {"from": owner})
+    tokenX.approve(tokenX_options_v5, int(1e18), {"from": holder})
+    options_config.setFeeAccrual(True, {"from": owner})
+
+    recipients = [staking, referrer, owner]
+    balances = [tokenX.balanceOf(account) for account in recipients]
+    txs = [
+        tokenX_options_v5.create(amount, referrer, "test", {"from": holder})
+        for _ in range(2)
+    ]
+    assert [tokenX.balanceOf(account) for account in recipients] == balances
+
+    # Fee events are emitted as before, only the payout is deferred
+    staking_fee = sum(tx.events["Create"]["settlementFee"] for tx in txs)
+    referral_fee = sum(tx.events["PayReferralFee"]["amount"] for tx in txs)
+    admin_fee = sum(tx.events["PayAdminFee"]["amount"] for tx in txs)
+    fees = [staking_fee, referral_fee, admin_fee]
+    assert [tokenX_options_v5.accruedFees(account) for account in recipients] == fees
+    assert tokenX.balanceOf(tokenX_options_v5) == sum(fees)
+
+    tx = tokenX_options_v5.claimFees({"from": referrer})
+    assert tx.return_value == referral_fee
+    assert tx.events["ClaimFees"]["amount"] == referral_fee
+    tx = tokenX_options_v5.claimFeesFor(recipients, {"from": holder})
+    assert len(tx.events["ClaimFees"]) == 2
+
+    assert [tokenX_options_v5.accruedFees(account) for account in recipients] == [
+        0,
+        0,
+        0,
+    ]
+    assert [
+        tokenX.balanceOf(account) - balance
+        for account, balance in zip(recipients, balances)
+    ] == fees
+    assert tokenX.balanceOf(tokenX_options_v5) == 0
+    assert tokenX_options_v5.claimFees({"from": referrer}).return_value == 0
+
+
+def test_accrued_fees_cannot_be_drained(
+    accounts, tokenX_options_v5, tokenX, options_config, liquidity
+):
+    owner, holder, attacker = accounts[0], accounts[1], accounts[8]
+    tokenX.transfer(holder, int(1e18), {"from": owner})
+    tokenX.approve(tokenX_options_v5, int(1e18), {"from": holder})
+    options_config.setFeeAccrual(True, {"from": owner})
+    tokenX_options_v5.create(int(1e18) // 100, accounts[3], "test", {"from": holder})
+    accrued = tokenX.balanceOf(tokenX_options_v5)
+    assert accrued > 0
+
+    # approve_token is internal, so calling it directly hits no function
+    assert not hasattr(tokenX_options_v5, "approve_token")
+    selector = function_signature_to_4byte_selector("approve_token(address,uint256)")
+    data = (
+        "0x" + selector.hex() + attacker.address[2:].lower().rjust(64, "0") + "f" * 64
+    )
+    with brownie.reverts():
+        attacker.transfer(tokenX_options_v5, 0, data=data)
+    assert tokenX.allowance(tokenX_options_v5, attacker) == 0
+    with brownie.reverts():
+        tokenX.transferFrom(tokenX_options_v5, attacker, accrued, {"from": attacker})
+    assert tokenX.balanceOf(tokenX_options_v5) == accrued
+
+
+def test_exercise_all(
+    accounts, tokenX_options_v5, ibfr_pool, tokenX, twap, chain, liquidity
+):
+    owner, holder, other, keeper = accounts[0], accounts[1], accounts[2], accounts[7]
+    amount = int(1e18) // 100
+    for account in (holder, other):
+        tokenX.transfer(account, int(1e18), {"from": owner})
+        tokenX.approve(tokenX_options_v5, int(1e18), {"from": account})
+    first, second, third = (
+        tokenX_options_v5.create(amount, owner, "test", {"from": holder}).return_value
+        for _ in range(3)
+    )
+    opted_out = tokenX_options_v5.create(
+        amount, owner, "test", {"from": other}
+    ).return_value
+    tokenX_options_v5.setAutoExerciseStatus(False, {"from": other})
+
+    with brownie.reverts("msg.sender is not allowed to auto exercise"):
+        tokenX_options_v5.exerciseAll([first], {"from": keeper})
+    tokenX_options_v5.grantRole(
+        tokenX_options_v5.AUTO_CLOSER_ROLE(), keeper, {"from": owner}
+    )
+
+    # Outside of the last half hour only the holders can exercise
+    tx = tokenX_options_v5.exerciseAll([first], {"from": keeper})
+    assert tx.return_value == 0
+    assert tx.events["ExerciseSkipped"]["reason"] == ExerciseSkipReason.NOT_ELIGIBLE
+
+    chain.sleep(ibfr_pool.fixedExpiry() - chain.time() - 20 * 60)
+    chain.mine(1)
+    balance = tokenX.balanceOf(holder)
+    locked_amount = ibfr_pool.getLockedAmount()
+    tx = tokenX_options_v5.exerciseAll(
+        [first, opted_out, second, first, 1000], {"from": keeper}
+    )
+
+    assert tx.return_value == 2
+    assert [(e["id"], e["reason"]) for e in tx.events["ExerciseSkipped"]] == [
+        (opted_out, ExerciseSkipReason.NOT_ELIGIBLE),
+        (first, ExerciseSkipReason.NOT_ACTIVE),
+        (1000, ExerciseSkipReason.NONEXISTENT_TOKEN),
+    ]
+    profits = [e["profit"] for e in tx.events["Exercise"]]
+    assert [e["id"] for e in tx.events["Exercise"]] == [first, second]
+    assert profits == [amount * (400 - 350) // 400] * 2
+    assert tokenX.balanceOf(holder) - balance == sum(profits)
+    assert ibfr_pool.getLockedAmount() == locked_amount - 2 * amount
+    # Consecutive payouts to the same holder are paid in one transfer
+    assert [
+        e["value"] for e in tx.events["Transfer"] if e.address == tokenX.address
+    ] == [sum(profits)]
+    for option_id in (first, second):
+        assert tokenX_options_v5.options(option_id)[0] == 2
+        with brownie.reverts("ERC721: owner query for nonexistent token"):
+            tokenX_options_v5.ownerOf(option_id)
+
+    twap.setPrice(300 * 10**8, {"from": owner})
+    tx = tokenX_options_v5.exerciseAll([third], {"from": keeper})
+    assert tx.return_value == 0
+    assert tx.events["ExerciseSkipped"]["reason"] == ExerciseSkipReason.OUT_OF_THE_MONEY
+    assert tokenX_options_v5.options(third)[0] == 1
+
+
+def test_unlock_all_skips_stale_ids(
+    accounts, tokenX_options_v5, ibfr_pool, tokenX, chain, liquidity
+):
+    owner, holder = accounts[0], accounts[1]
+    amount = int(1e18) // 100
+    tokenX.transfer(holder, int(1e18), {"from": owner})
+    tokenX.approve(tokenX_options_v5, int(1e18), {"from": holder})
+    first, second, exercised, target = (
+        tokenX_options_v5.create(amount, owner, "test", {"from": holder}).return_value
+        for _ in range(4)
+    )
+    (merged,) = tokenX_options_v5.split(target, [1000], {"from": holder}).return_value
+    tokenX_options_v5.merge([merged], target, {"from": holder})
+    chain.mine(1)
+    tokenX_options_v5.exercise(exercised, {"from": holder})
+
+    tx = tokenX_options_v5.unlockAll([first, exercised], {"from": holder})
+    assert tx.return_value == 0
+    assert [(e["id"], e["reason"]) for e in tx.events["UnlockSkipped"]] == [
+        (first, UnlockSkipReason.NOT_EXPIRED),
+        (exercised, UnlockSkipReason.NONEXISTENT_TOKEN),
+    ]
+
+    chain.sleep(ibfr_pool.fixedExpiry() - chain.time() + ONE_DAY)
+    chain.mine(1)
+    premiums = [tokenX_options_v5.options(i)[4] for i in (first, second, target)]
+    # The merged ID is still Active in storage but its lock was folded
+    # into the target's
+    assert tokenX_options_v5.options(merged)[0] == 1
+    tx = tokenX_options_v5.unlockAll(
+        [first, exercised, merged, second, first, target], {"from": holder}
+    )
+    assert tx.return_value == 3
+    assert [(e["id"], e["reason"]) for e in tx.events["UnlockSkipped"]] == [
+        (exercised, UnlockSkipReason.NONEXISTENT_TOKEN),
+        (merged, UnlockSkipReason.NONEXISTENT_TOKEN),
+        (first, UnlockSkipReason.NOT_ACTIVE),
+    ]
+    assert [(e["id"], e["premium"]) for e in tx.events["Expire"]] == list(
+        zip((first, second, target), premiums)
+    )
+    assert [e["amount"] for e in tx.events["Profit"]] == premiums
+    assert ibfr_pool.getLockedAmount() == 0
+    assert ibfr_pool.lockedPremium() == 0
+    for option_id in (first, second, target):
+        assert tokenX_options_v5.options(option_id)[0] == 3
+
+
+def test_create_batch_reverts(accounts, tokenX_options_v5, liquidity):
+    holder = accounts[1]
+    with brownie.reverts("Empty batch"):
+        tokenX_options_v5.createBatch([], holder, [], {"from": holder})
+    with brownie.reverts("Wrong metadata length"):
+        tokenX_options_v5.createBatch([10**15], holder, [], {"from": holder})
+    with brownie.reverts("ERC20: transfer amount exceeds balance"):
+        tokenX_options_v5.createBatch([10**15], holder, ["a"], {"from": holder})
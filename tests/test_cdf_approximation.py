@@ -0,0 +1,52 @@
+"""
+Error bound of OptionMath._NFast against Choudhury's approximation.
+
+The on-chain side (blackScholesPriceFast against the Python mirror, and the
+gas of both CDFs per call) is covered in ``test_option_pricing``.
+"""
+
+import numpy as np
+
+from scripts.cdf_approximation import (
+    MAX_ERROR,
+    d_range,
+    error_sweep,
+    fit_coefficients,
+    premium_error,
+)
+from scripts.option_pricing import FAST_CDF_COEFFICIENTS, n_64x64, n_fast_64x64
+
+ONE_DAY = 86400
+PRICE = 400 * 10**8
+
+
+def test_fit_reproduces_coefficients():
+    fitted = np.array(fit_coefficients(), dtype=np.float64)
+    shipped = np.array(FAST_CDF_COEFFICIENTS, dtype=np.float64)
+    assert np.abs(fitted - shipped).max() / 2**64 < 1e-12
+
+
+def test_error_sweep():
+    sweep = error_sweep()
+    print(sweep)
+    assert sweep["points"] == 8 * 2**16 + 1
+    assert sweep["max_error"] <= MAX_ERROR
+    assert sweep["reference_error"] < 1e-15
+
+
+def test_sign_symmetry():
+    for x in np.linspace(0, 7, 57):
+        x = int(x * 2**64)
+        assert n_fast_64x64(x) + n_fast_64x64(-x) == 2**64 or x == 0
+        assert abs(n_fast_64x64(-x) - n_64x64(-x)) <= MAX_ERROR * 2**64
+
+
+def test_premium_error_over_product_range():
+    ivs = np.linspace(1000, 30000, 30)
+    periods = np.linspace(60, 30 * ONE_DAY, 60)
+    spots = np.linspace(0.5, 2, 61) * PRICE
+    low, high = d_range(ivs, periods, spots / PRICE)
+    error = premium_error(ivs, periods, spots, PRICE)
+    print(f"d1/d2 in [{low:.1f}, {high:.1f}], max premium error {error:.0f}e-8 USD")
+    # Both CDF terms are off by at most MAX_ERROR, weighted by spot and strike
+    assert error <= (spots.max() + PRICE) * MAX_ERROR
@@ -1,7 +1,10 @@
 from enum import IntEnum
 
 import brownie
-from soupsieve import select
+import pytest
+
+from scripts.option_positions import owner_positions, slot_positions
+from scripts.state_snapshot import StateSnapshot
 
 
 class OptionType(IntEnum):
@@ -35,8 +38,10 @@ class OptionERC3525Testing(object):
         tokenX,
         liquidity,
         options_config,
+        multicall,
     ):
         self.tokenX_options = options
+        self.multicall = multicall
         self.options_config = options_config
         self.generic_pool = generic_pool
         self.amount = amount
@@ -152,18 +157,23 @@ class OptionERC3525Testing(object):
         self.split_units = split_units
 
         assert split_units, "Split function failed"
+        views = StateSnapshot(self.multicall).add(
+            "slot", self.tokenX_options.optionSlotMapping, self.option_id
+        )
+        for unit in split_units:
+            views.add(("owner", unit), self.tokenX_options.ownerOf, unit)
+            views.add(("slot", unit), self.tokenX_options.optionSlotMapping, unit)
+            views.add(("option", unit), self.tokenX_options.options, unit)
+        state = views.take()
         for count, unit in enumerate(split_units):
             assert (
-                self.tokenX_options.ownerOf(unit) == self.option_holder
+                state[("owner", unit)] == self.option_holder
             ), "Option owners should be the same"
-            assert self.tokenX_options.optionSlotMapping(
-                unit
-            ) == self.tokenX_options.optionSlotMapping(
-                self.option_id
+            assert (
+                state[("slot", unit)] == state["slot"]
             ), "Option slots should be the same"
-            option_detail = self.tokenX_options.options(unit)
+            option_detail = state[("option", unit)]
             # self.compare_option_details(option_detail)
-            slot_id = self.tokenX_options.optionSlotMapping(self.option_id)
             amount, locked_amount, premium = self.get_amounts(
                 input_array[count], option_units, self.option_details
             )
@@ -179,9 +189,7 @@ class OptionERC3525Testing(object):
             split_event = split_function.events["Split"][count]
 
             assert (
-                split_event["owner"]
-                == self.option_holder
-                == self.tokenX_options.ownerOf(unit)
+                split_event["owner"] == self.option_holder == state[("owner", unit)]
                 and split_event["tokenId"] == self.option_id
                 and split_event["newTokenId"] == unit
                 and split_event["splitUnits"] == input_array[count]
@@ -190,9 +198,7 @@ class OptionERC3525Testing(object):
             transfer_event = split_function.events["TransferUnits"][count]
             assert (
                 transfer_event["from"] == ADDRESS_0
-                and transfer_event["to"]
-                == self.tokenX_options.ownerOf(unit)
-                == self.option_holder
+                and transfer_event["to"] == state[("owner", unit)] == self.option_holder
                 and transfer_event["tokenId"] == 0
                 and transfer_event["targetTokenId"] == unit
                 and transfer_event["transferUnits"] == input_array[count]
@@ -221,27 +227,31 @@ class OptionERC3525Testing(object):
         merge_function = self.tokenX_options.merge(
             [unit_1, unit_2], unit_3, {"from": self.option_holder}
         )
-        target_option_detail = self.tokenX_options.options(unit_3)
+        views = (
+            StateSnapshot(self.multicall)
+            .add("slot", self.tokenX_options.optionSlotMapping, self.option_id)
+            .add("target", self.tokenX_options.options, unit_3)
+            .add("target_owner", self.tokenX_options.ownerOf, unit_3)
+            .add("target_slot", self.tokenX_options.optionSlotMapping, unit_3)
+        )
+        for unit in input_array:
+            views.add(("owner", unit), self.tokenX_options.ownerOf, unit)
+            views.add(("option", unit), self.tokenX_options.options, unit)
+        state = views.take()
+        target_option_detail = state["target"]
 
         # self.compare_option_details(target_option_detail)
-        assert self.tokenX_options.optionSlotMapping(
-            unit_3
-        ) == self.tokenX_options.optionSlotMapping(
-            self.option_id
-        ), "Option slots should be the same"
+        assert state["target_slot"] == state["slot"], "Option slots should be the same"
         for count, unit in enumerate(input_array):
-            option_detail = self.tokenX_options.options(unit)
+            option_detail = state[("option", unit)]
             # self.compare_option_details(option_detail)
-            units = self.tokenX_options.units(unit)
             total_amount += option_detail[2]
             total_locked_amount += option_detail[3]
             merge_event = merge_function.events["Merge"][count]
-            with brownie.reverts(""):
-                self.tokenX_options.ownerOf(unit)
+            # The merged token is burnt, so ownerOf reverts
+            assert state[("owner", unit)] is None
             assert (
-                merge_event["owner"]
-                == self.option_holder
-                == self.tokenX_options.ownerOf(unit_3)
+                merge_event["owner"] == self.option_holder == state["target_owner"]
                 and merge_event["tokenId"] == unit
                 and merge_event["targetTokenId"] == unit_3
             ), "Parameters not verified"
@@ -372,7 +382,6 @@ class OptionERC3525Testing(object):
 
     def verify_unlocking(self):
         # unlock() Unchanged
-        self.chain.snapshot()
         with brownie.reverts("Option has not expired yet"):
             self.tokenX_options.unlock(self.option_id, {"from": self.option_holder})
 
@@ -387,7 +396,6 @@ class OptionERC3525Testing(object):
         )
         unlock_events = unlock_option.events
         assert unlock_events, "Should unlock on expiry"
-        self.chain.revert()
 
     def verify_exercise(self):
         # canExercise()
@@ -410,21 +418,19 @@ class OptionERC3525Testing(object):
             option["lockedAmount"],
         )
 
-        initial_tokenX_balance_option_holder = self.tokenX.balanceOf(self.option_holder)
-        initial_tokenX_balance_pool = self.tokenX.balanceOf(self.generic_pool.address)
+        balances = StateSnapshot(self.multicall).balances(
+            self.tokenX,
+            option_holder=self.option_holder,
+            pool=self.generic_pool.address,
+        )
+        initial = balances.take()
 
         self.chain.mine(50)
         self.tokenX_options.exercise(self.option_id, {"from": self.option_holder})
 
-        final_tokenX_balance_option_holder = self.tokenX.balanceOf(self.option_holder)
-        final_tokenX_balance_pool = self.tokenX.balanceOf(self.generic_pool.address)
-
-        assert (
-            final_tokenX_balance_option_holder - initial_tokenX_balance_option_holder
-        ) == profit, "Wrong fee transfer"
-        assert (
-            initial_tokenX_balance_pool - final_tokenX_balance_pool
-        ) == profit, "pool sent wrong profit"
+        change = StateSnapshot.diff(initial, balances.take())
+        assert change["option_holder"] == profit, "Wrong fee transfer"
+        assert -change["pool"] == profit, "pool sent wrong profit"
 
     def verify_auto_exercise(self):
         with brownie.reverts("msg.sender is not eligible to exercise the option"):
@@ -438,7 +444,6 @@ class OptionERC3525Testing(object):
             self.accounts[7],
             {"from": self.owner},
         )
-        self.chain.snapshot()
 
         last_half_hour_of_expiry = self.period - 27 * 60
         self.chain.sleep(last_half_hour_of_expiry)
@@ -447,7 +452,6 @@ class OptionERC3525Testing(object):
         exercise = self.tokenX_options.exercise(
             self.option_id, {"from": self.accounts[7]}
         )
-        self.chain.revert()
 
     def verify_fixed_params(self):
         expiry = self.generic_pool.fixedExpiry() + ONE_DAY * 10
@@ -472,8 +476,7 @@ class OptionERC3525Testing(object):
         assert fixedStrike == strike, "Wrong strike"
         assert fixedExpiry == expiry, "Wrong Expiry"
 
-    def complete_flow_test(self):
-        self.verify_owner()
+    def verify_units_flow(self):
         self.option_id = self.verify_creation(self.option_holder)
         print("#########Split#########")
         self.verify_split()
@@ -482,7 +485,9 @@ class OptionERC3525Testing(object):
         new_option_id = self.verify_transfer()
         self.verify_transfer_2(new_option_id)
 
-        self.verify_unlocking()
+    def complete_flow_test(self):
+        self.verify_owner()
+        self.verify_units_flow()
 
         self.verify_exercise()
         print("exercised", self.option_id)
@@ -491,29 +496,15 @@ class OptionERC3525Testing(object):
         self.verify_exercise()
         print("exercised", self.option_id)
 
+    def unlocking_flow_test(self):
+        self.verify_units_flow()
+        self.verify_unlocking()
 
-def test_tokenX_options(contracts, accounts, chain):
 
-    (
-        token_contract,
-        staking_ibfr_for_bnb,
-        pool,
-        pp,
-        options,
-        genericOptions,
-        generic_pool,
-        tokenX,
-        pancakePair,
-        tokenX_options,
-        fixed_bnb_options,
-        trader_nft,
-        staking_rbfr_for_ibfr,
-        ibfr_options,
-        tokenX_options_v5,
-        fixed_bnb_options_v5,
-        ibfr_pool,
-        options_config,
-    ) = contracts
+@pytest.fixture
+def erc3525_testing(
+    accounts, tokenX_options_v5, ibfr_pool, chain, tokenX, options_config, multicall
+):
     amount = int(1e18) // 1000
     meta = "test"
     liquidity = int(3 * 1e18)
@@ -528,6 +519,187 @@ def test_tokenX_options(contracts, accounts, chain):
         tokenX,
         liquidity,
         options_config,
+        multicall,
     )
     option.verify_fixed_params()
-    option.complete_flow_test()
+    return option
+
+
+def test_tokenX_options(erc3525_testing):
+    erc3525_testing.complete_flow_test()
+
+
+def test_unlocking(erc3525_testing):
+    erc3525_testing.unlocking_flow_test()
+
+
+def test_split_settles_pool_once(
+    accounts, tokenX_options_v5, ibfr_pool, tokenX, liquidity
+):
+    holder = accounts[1]
+    tokenX.transfer(holder, int(1e18), {"from": accounts[0]})
+    tokenX.approve(tokenX_options_v5, int(1e18), {"from": holder})
+    option_id = tokenX_options_v5.create(
+        int(1e18) // 100, accounts[3], "test", {"from": holder}
+    ).return_value
+
+    locked_amount = ibfr_pool.getLockedAmount()
+    locked_premium = ibfr_pool.lockedPremium()
+    pool_balance = tokenX.balanceOf(ibfr_pool)
+
+    split_units = [1000, 25000, 333, 70000]
+    tx = tokenX_options_v5.split(option_id, split_units, {"from": holder})
+    new_ids = tx.return_value
+
+    # A split only moves collateral between positions
+    assert ibfr_pool.getLockedAmount() == locked_amount
+    assert ibfr_pool.lockedPremium() == locked_premium
+    assert tokenX.balanceOf(ibfr_pool) == pool_balance
+    assert tokenX.balanceOf(tokenX_options_v5) == 0
+
+    for id_ in [option_id, *new_ids]:
+        option = tokenX_options_v5.options(id_)
+        assert ibfr_pool.lockedLiquidity(tokenX_options_v5, id_) == (
+            option[3],
+            option[4],
+            True,
+        )
+    assert [tokenX_options_v5.units(id_) for id_ in new_ids] == split_units
+
+    with brownie.reverts("msg.sender is not allowed to excute the option contract"):
+        ibfr_pool.splitLock(option_id, 0, 0, len(new_ids) + 1, [], [], {"from": holder})
+
+
+# Premium dropped on merge: within the merged ids' premiums (kept by the pool)
+# and below the target's own premium (refunded to the issuer)
+@pytest.mark.parametrize("premium_drop", [5, 12 * 10**13 + 13])
+def test_merge_locks_matches_per_id_path(
+    accounts, ibfr_pool, tokenX, liquidity, premium_drop
+):
+    owner = accounts[0]
+    per_id, batched = accounts[6], accounts[7]
+    positions = [(10**15, 10**13), (3 * 10**15, 2 * 10**13), (7, 3), (10**16, 10**14)]
+    for issuer in (per_id, batched):
+        ibfr_pool.grantRole(ibfr_pool.OPTION_ISSUER_ROLE(), issuer, {"from": owner})
+        tokenX.transfer(issuer, 10**18, {"from": owner})
+        tokenX.approve(ibfr_pool, 10**18, {"from": issuer})
+        for id_, (amount, premium) in enumerate(positions):
+            ibfr_pool.lock(id_, amount, premium, {"from": issuer})
+
+    ids, target = [1, 2, 3], 0
+    merged_amount = sum(amount for amount, _ in positions)
+    merged_premium = sum(premium for _, premium in positions) - premium_drop
+    refund = max(positions[target][1] - merged_premium, 0)
+
+    def balances(issuer):
+        return [
+            ibfr_pool.getLockedAmount(),
+            ibfr_pool.lockedPremium(),
+            tokenX.balanceOf(ibfr_pool),
+            tokenX.balanceOf(issuer),
+        ]
+
+    before = balances(per_id)
+    for id_ in ids:
+        ibfr_pool.unlockWithoutProfit(id_, {"from": per_id})
+    ibfr_pool.lockChange(target, merged_amount, merged_premium, {"from": per_id})
+    per_id_change = [after - b for after, b in zip(balances(per_id), before)]
+
+    before = balances(batched)
+    ibfr_pool.mergeLocks(ids, target, merged_amount, merged_premium, {"from": batched})
+    batched_change = [after - b for after, b in zip(balances(batched), before)]
+
+    assert batched_change == per_id_change == [0, -premium_drop, -refund, refund]
+    for id_ in range(len(positions)):
+        assert ibfr_pool.lockedLiquidity(batched, id_) == ibfr_pool.lockedLiquidity(
+            per_id, id_
+        )
+
+    with brownie.reverts("LockedLiquidity with such id has already unlocked"):
+        ibfr_pool.mergeLocks([1], target, 0, 0, {"from": batched})
+    with brownie.reverts("Merge amount is too large"):
+        ibfr_pool.mergeLocks([], target, merged_amount + 1, 0, {"from": batched})
+
+
+def test_merge_restores_pool_totals(
+    accounts, tokenX_options_v5, ibfr_pool, tokenX, liquidity
+):
+    holder = accounts[1]
+    tokenX.transfer(holder, int(1e18), {"from": accounts[0]})
+    tokenX.approve(tokenX_options_v5, int(1e18), {"from": holder})
+    option_id = tokenX_options_v5.create(
+        int(1e18) // 100, accounts[3], "test", {"from": holder}
+    ).return_value
+    locked_amount = ibfr_pool.getLockedAmount()
+    locked_premium = ibfr_pool.lockedPremium()
+
+    new_ids = tokenX_options_v5.split(
+        option_id, [1000] * 20, {"from": holder}
+    ).return_value
+    tokenX_options_v5.merge(new_ids, option_id, {"from": holder})
+
+    option = tokenX_options_v5.options(option_id)
+    assert ibfr_pool.getLockedAmount() == locked_amount
+    assert ibfr_pool.lockedPremium() == locked_premium
+    assert ibfr_pool.lockedLiquidity(tokenX_options_v5, option_id) == (
+        option[3],
+        option[4],
+        True,
+    )
+    for id_ in new_ids:
+        assert not ibfr_pool.lockedLiquidity(tokenX_options_v5, id_)[2]
+
+
+def test_paginated_positions(accounts, tokenX_options_v5, tokenX, liquidity):
+    options = tokenX_options_v5
+    holder, other = accounts[1], accounts[2]
+    tokenX.transfer(holder, int(1e18), {"from": accounts[0]})
+    tokenX.approve(options, int(1e18), {"from": holder})
+    first, second = (
+        options.create(
+            int(1e18) // 100, accounts[3], "test", {"from": holder}
+        ).return_value
+        for _ in range(2)
+    )
+    split_ids = options.split(first, [1000, 2000, 3000], {"from": holder}).return_value
+    options.transferFrom(holder, other, split_ids[0], {"from": holder})
+    options.exercise(second, {"from": holder})
+
+    def expected(option_id):
+        option = options.options(option_id)
+        return {
+            "id": option_id,
+            "slot": options.slotOf(option_id),
+            "owner": options.ownerOf(option_id),
+            "units": options.units(option_id),
+            "state": option[0],
+            "strike": option[1],
+            "amount": option[2],
+            "locked_amount": option[3],
+            "premium": option[4],
+            "expiration": option[5],
+            "option_type": option[6],
+        }
+
+    held = [
+        options.tokenOfOwnerByIndex(holder, i) for i in range(options.balanceOf(holder))
+    ]
+    assert sorted(held) == [first, split_ids[1], split_ids[2]]
+    assert list(owner_positions(options, holder, page_size=2)) == [
+        expected(i) for i in held
+    ]
+    assert list(owner_positions(options, other)) == [expected(split_ids[0])]
+    assert list(owner_positions(options, accounts[4])) == []
+
+    slot = options.slotOf(first)
+    in_slot = [
+        options.tokenOfSlotByIndex(slot, i) for i in range(options.tokensInSlot(slot))
+    ]
+    assert list(slot_positions(options, slot, page_size=1)) == [
+        expected(i) for i in in_slot
+    ]
+
+    positions, total = options.slotPositions(slot, 1, 100)
+    assert total == len(in_slot) and len(positions) == len(in_slot) - 1
+    positions, total = options.ownerPositions(holder, 10, 100)
+    assert total == 3 and positions == []
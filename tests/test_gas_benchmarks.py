@@ -0,0 +1,421 @@
+"""
+Gas benchmarks for the option lifecycle.
+
+Every benchmark records ``tx.gas_used`` (plus a per-call breakdown of the pool
+calls) into a JSON report. ``test_gas_regressions`` runs last and fails when a
+tracked path grew by more than ``GAS_REGRESSION_THRESHOLD`` percent compared to
+the baseline report at ``GAS_BASELINE``. Set ``GAS_UPDATE_BASELINE=1`` to store
+the current run as the new baseline; the committed baseline is generated from
+``BASELINE_REVISION`` with ``scripts/gas_baseline.py``, and the check
+generates it first when it is missing. Benchmarks of entry points that
+revision doesn't have skip there. The before/after gas of every tracked
+path is printed (run with ``-s``) to show the effect of a change.
+
+Under pytest-xdist the benchmarks are spread over the workers, each of which
+hands its results to the controller; the controller writes the merged report
+and runs the regression check once every worker is done (see ``conftest``).
+"""
+
+import os
+from contextlib import contextmanager
+
+import numpy as np
+import pytest
+
+from scripts import gas_baseline
+from scripts.gas_benchmark import UPDATE_BASELINE, GasBenchmark, external_call_gas
+from scripts.option_indexer import OptionIndexer
+from scripts.option_pricing import OptionQuoter
+from scripts.unlock_batcher import UnlockBatcher
+
+ONE_DAY = 86400
+AMOUNT = int(1e18) // 1000
+META = "test"
+
+CREATE_BATCH_SIZES = (1, 10, 50)
+SPLIT_SIZES = (1, 2, 5, 10, 20, 50, 100)
+MERGE_SIZES = (2, 10, 50)
+UNLOCK_ALL_SIZES = (1, 10, 50, 200)
+EXERCISE_ALL_SIZES = (1, 10, 50)
+UNLOCK_THROUGHPUT_SIZES = (10, 100, 1000)
+UNLOCK_GAS_LIMIT = 10_000_000
+SAME_BLOCK_SIZES = (2, 5, 20)
+PER_BLOCK_CREATES = 5
+IV_BUCKET_WIDTHS = (0, 1, 50, 250)
+GAS_LIMIT = 3_000_000
+# Contracts the market snapshot is read from
+MARKET_CONTRACTS = ("OptionConfig", "SlidingWindowOracleTest")
+PRICE_READ = {"SlidingWindowOracleTest.consult": 1}
+
+
+@pytest.fixture(scope="session")
+def gas_benchmark(request):
+    benchmark = GasBenchmark(tracked_contracts=("BufferIBFRPoolV5",))
+    yield benchmark
+    # Sent to the xdist controller when this worker finishes
+    workeroutput = getattr(request.config, "workeroutput", None)
+    if workeroutput is not None:
+        workeroutput["gas_benchmarks"] = benchmark.results
+
+
+@pytest.fixture
+def holder(accounts, tokenX, tokenX_options_v5, liquidity, owner):
+    holder = accounts[1]
+    tokenX.transfer(holder, 10**24, {"from": owner})
+    tokenX.approve(tokenX_options_v5, 2**256 - 1, {"from": holder})
+    return holder
+
+
+def requires(contract, *functions):
+    """
+    Skips the benchmark when ``contract`` lacks one of ``functions``, as it
+    does at the revision the baseline is generated from.
+    """
+    missing = [fn for fn in functions if not hasattr(contract, fn)]
+    if missing:
+        pytest.skip(f"{contract._name} has no {', '.join(missing)}")
+
+
+def create_options(options, holder, count, referrer):
+    return [
+        options.create(AMOUNT, referrer, META, {"from": holder}).return_value
+        for _ in range(count)
+    ]
+
+
+def expire(ibfr_pool, chain):
+    chain.sleep(ibfr_pool.fixedExpiry() - chain.time() + ONE_DAY)
+    chain.mine(1)
+
+
+def market_reads(tx):
+    """Returns ``{fn: count}`` of the oracle and config calls made by ``tx``."""
+    return {
+        fn: call["count"]
+        for fn, call in external_call_gas(tx, MARKET_CONTRACTS).items()
+    }
+
+
+@contextmanager
+def same_block(web3, chain):
+    """
+    Queues the transactions sent inside the block and mines them together, so
+    that later transactions see the state (e.g. caches) left by earlier ones
+    in the same block. Transactions must be sent with ``required_confs=0``
+    and an explicit ``gas_limit`` and appended to the yielded list.
+    """
+    txs = []
+    web3.provider.make_request("miner_stop", [])
+    try:
+        yield txs
+        chain.mine(1)
+    finally:
+        web3.provider.make_request("miner_start", [])
+    for tx in txs:
+        tx.wait(1)
+
+
+def test_create(tokenX_options_v5, holder, accounts, gas_benchmark):
+    tx = tokenX_options_v5.create(AMOUNT, accounts[3], META, {"from": holder})
+    gas_benchmark.record("create", 1, tx)
+
+
+def test_market_reads(tokenX_options_v5, holder, accounts, chain):
+    # With the snapshot cache off, as by default, a create reads every value
+    # of the snapshot once and an exercise only reads the price
+    requires(tokenX_options_v5, "setSnapshotCache")
+    tx = tokenX_options_v5.create(AMOUNT, accounts[3], META, {"from": holder})
+    reads = market_reads(tx)
+    assert PRICE_READ.items() <= reads.items()
+    assert set(reads.values()) == {1}
+
+    tx = tokenX_options_v5.createBatch(
+        [AMOUNT] * 3, accounts[3], [META] * 3, {"from": holder}
+    )
+    assert market_reads(tx) == reads
+
+    chain.mine(1)
+    tx = tokenX_options_v5.exercise(tx.return_value[0], {"from": holder})
+    assert market_reads(tx) == PRICE_READ
+
+
+def test_create_fee_accrual(
+    tokenX_options_v5, options_config, holder, accounts, owner, gas_benchmark
+):
+    requires(options_config, "setFeeAccrual")
+    # The second create of each mode is measured, once fee balances are warm
+    referrer = accounts[3]
+    txs = [
+        tokenX_options_v5.create(AMOUNT, referrer, META, {"from": holder})
+        for _ in range(2)
+    ]
+    options_config.setFeeAccrual(True, {"from": owner})
+    accrued = [
+        tokenX_options_v5.create(AMOUNT, referrer, META, {"from": holder})
+        for _ in range(2)
+    ]
+    gas_benchmark.record("createFeeAccrual", 1, accrued[1])
+    saved = txs[1].gas_used - accrued[1].gas_used
+    gas_benchmark.annotate("createFeeAccrual", 1, saved_per_call=saved)
+    print(f"create: {saved} gas saved per call with fee accrual")
+    assert saved > 0
+
+    recipients = [options_config.settlementFeeRecipient(), referrer, owner]
+    tx = tokenX_options_v5.claimFeesFor(recipients, {"from": holder})
+    gas_benchmark.record("claimFeesFor", len(recipients), tx)
+
+
+@pytest.mark.parametrize("size", CREATE_BATCH_SIZES)
+def test_create_batch(tokenX_options_v5, holder, accounts, gas_benchmark, size):
+    txs = [
+        tokenX_options_v5.create(AMOUNT, accounts[3], META, {"from": holder})
+        for _ in range(size)
+    ]
+    # Not "create", which test_create records for a single call
+    gas_benchmark.record("createUnbatched", size, txs)
+
+    requires(tokenX_options_v5, "createBatch")
+    tx = tokenX_options_v5.createBatch(
+        [AMOUNT] * size, accounts[3], [META] * size, {"from": holder}
+    )
+    gas_benchmark.record("createBatch", size, tx)
+    if size > 1:
+        assert tx.gas_used < sum(t.gas_used for t in txs)
+
+
+def test_create_per_block(tokenX_options_v5, holder, accounts, owner, gas_benchmark):
+    requires(tokenX_options_v5, "setSnapshotCache")
+    # One create per block, the common case, with and without the snapshot cache
+    per_call = {}
+    for cache in (False, True):
+        tokenX_options_v5.setSnapshotCache(cache, {"from": owner})
+        # The first create of a mode pays for the auto-exercise defaults and
+        # the first write of the snapshot
+        create_options(tokenX_options_v5, holder, 1, accounts[3])
+        txs = [
+            tokenX_options_v5.create(AMOUNT, accounts[3], META, {"from": holder})
+            for _ in range(PER_BLOCK_CREATES)
+        ]
+        assert len({tx.block_number for tx in txs}) == len(txs)
+        name = "createPerBlockCached" if cache else "createPerBlock"
+        gas_benchmark.record(name, len(txs), txs)
+        per_call[cache] = sum(tx.gas_used for tx in txs) // len(txs)
+
+    print(
+        f"create, one per block: {per_call[False]} gas, "
+        f"{per_call[True]} with the snapshot cache"
+    )
+    # Why the cache is off by default
+    assert per_call[False] < per_call[True]
+
+
+@pytest.mark.parametrize("size", SAME_BLOCK_SIZES)
+def test_create_same_block(
+    tokenX_options_v5, holder, accounts, owner, web3, chain, gas_benchmark, size
+):
+    requires(tokenX_options_v5, "setSnapshotCache")
+    totals = {}
+    for cache in (False, True):
+        tokenX_options_v5.setSnapshotCache(cache, {"from": owner})
+        create_options(tokenX_options_v5, holder, 1, accounts[3])
+
+        with same_block(web3, chain) as txs:
+            for _ in range(size):
+                txs.append(
+                    tokenX_options_v5.create(
+                        AMOUNT,
+                        accounts[3],
+                        META,
+                        {"from": holder, "gas_limit": GAS_LIMIT, "required_confs": 0},
+                    )
+                )
+        assert len({tx.block_number for tx in txs}) == 1
+        name = "createSameBlock" if cache else "createSameBlockUncached"
+        gas_benchmark.record(name, size, txs)
+        totals[cache] = sum(tx.gas_used for tx in txs)
+
+    # The first create of the block stores the snapshot, later ones reuse it
+    saved = (totals[False] - totals[True]) // size
+    gas_benchmark.annotate("createSameBlock", size, saved_per_call=saved)
+    print(f"create, {size} per block: {saved} gas saved per call by the cache")
+    assert saved > 0
+
+
+@pytest.mark.parametrize("width", IV_BUCKET_WIDTHS)
+def test_iv_bucket_width(
+    tokenX_options_v5,
+    options_config,
+    ibfr_pool,
+    holder,
+    accounts,
+    owner,
+    web3,
+    chain,
+    gas_benchmark,
+    width,
+):
+    requires(options_config, "setIVBucketWidth")
+    options_config.setIVBucketWidth(width, {"from": owner})
+    # Lock 40% of the pool so that every further create moves the IV
+    balance = ibfr_pool.totalTokenXBalance()
+    tokenX_options_v5.create(balance * 2 // 5, accounts[3], META, {"from": holder})
+
+    amounts = [balance // 30] * 10
+    quoter = OptionQuoter.from_contracts(tokenX_options_v5, options_config, ibfr_pool)
+    errors = quoter.iv_bucket_error(
+        np.cumsum(amounts), [width], period=ibfr_pool.fixedExpiry() - chain.time()
+    )
+
+    with same_block(web3, chain) as txs:
+        for amount in amounts:
+            txs.append(
+                tokenX_options_v5.create(
+                    amount,
+                    accounts[3],
+                    META,
+                    {"from": holder, "gas_limit": GAS_LIMIT, "required_confs": 0},
+                )
+            )
+
+    name = f"createIVBucket{width}"
+    gas_benchmark.record(name, len(txs), txs)
+    gas_benchmark.annotate(name, len(txs), max_premium_error=errors[width])
+    print(
+        f"ivBucketWidth {width}: {sum(tx.gas_used for tx in txs) // len(txs)} "
+        f"gas per create, max premium error {errors[width]:.4%}"
+    )
+
+
+def test_exercise(tokenX_options_v5, holder, accounts, chain, gas_benchmark):
+    (option_id,) = create_options(tokenX_options_v5, holder, 1, accounts[3])
+    chain.mine(1)
+    tx = tokenX_options_v5.exercise(option_id, {"from": holder})
+    gas_benchmark.record("exercise", 1, tx)
+
+
+@pytest.mark.parametrize("size", EXERCISE_ALL_SIZES)
+def test_exercise_all(
+    tokenX_options_v5, ibfr_pool, holder, accounts, owner, chain, gas_benchmark, size
+):
+    keeper = accounts[7]
+    tokenX_options_v5.grantRole(
+        tokenX_options_v5.AUTO_CLOSER_ROLE(), keeper, {"from": owner}
+    )
+    option_ids = create_options(tokenX_options_v5, holder, 2 * size, accounts[3])
+    chain.sleep(ibfr_pool.fixedExpiry() - chain.time() - 20 * 60)
+    chain.mine(1)
+
+    txs = [
+        tokenX_options_v5.exercise(option_id, {"from": keeper})
+        for option_id in option_ids[:size]
+    ]
+    # Not "exercise", which test_exercise records for the owner's exercise
+    gas_benchmark.record("exerciseKeeper", size, txs)
+    requires(tokenX_options_v5, "exerciseAll")
+    tx = tokenX_options_v5.exerciseAll(option_ids[size:], {"from": keeper})
+    assert tx.return_value == size
+    gas_benchmark.record("exerciseAll", size, tx)
+    if size > 1:
+        assert tx.gas_used < sum(t.gas_used for t in txs)
+    # The price is read once for the whole batch
+    assert market_reads(tx) == PRICE_READ
+
+
+def test_unlock(tokenX_options_v5, ibfr_pool, holder, accounts, chain, gas_benchmark):
+    (option_id,) = create_options(tokenX_options_v5, holder, 1, accounts[3])
+    expire(ibfr_pool, chain)
+    tx = tokenX_options_v5.unlock(option_id, {"from": holder})
+    gas_benchmark.record("unlock", 1, tx)
+
+
+@pytest.mark.parametrize("size", UNLOCK_ALL_SIZES)
+def test_unlock_all(
+    tokenX_options_v5, ibfr_pool, holder, accounts, chain, gas_benchmark, size
+):
+    option_ids = create_options(tokenX_options_v5, holder, size, accounts[3])
+    expire(ibfr_pool, chain)
+    tx = tokenX_options_v5.unlockAll(option_ids, {"from": holder})
+    gas_benchmark.record("unlockAll", size, tx)
+
+
+@pytest.mark.parametrize("size", UNLOCK_THROUGHPUT_SIZES)
+def test_unlock_throughput(
+    tokenX_options_v5, ibfr_pool, holder, accounts, chain, gas_benchmark, size
+):
+    requires(tokenX_options_v5, "createBatch")
+    for start in range(0, size, 50):
+        count = min(50, size - start)
+        tokenX_options_v5.createBatch(
+            [AMOUNT] * count, accounts[3], [META] * count, {"from": holder}
+        )
+    expire(ibfr_pool, chain)
+    indexer = OptionIndexer.from_contracts(tokenX_options_v5, ibfr_pool)
+    indexer.sync()
+    batches = UnlockBatcher(indexer, gas_limit=UNLOCK_GAS_LIMIT).batches(holder)
+
+    txs = [
+        tokenX_options_v5.unlockAll(
+            batch, {"from": holder, "gas_limit": UNLOCK_GAS_LIMIT}
+        )
+        for batch in batches
+    ]
+    assert sum(tx.return_value for tx in txs) == size
+    gas_benchmark.record("unlockBatches", size, txs)
+    options_per_tx = size / len(txs)
+    gas_per_option = sum(tx.gas_used for tx in txs) // size
+    gas_benchmark.annotate(
+        "unlockBatches", size, transactions=len(txs), options_per_tx=options_per_tx
+    )
+    print(
+        f"unlock {size}: {len(txs)} txs, {options_per_tx:.0f} options/tx, "
+        f"{gas_per_option} gas/option"
+    )
+
+
+@pytest.mark.parametrize("size", SPLIT_SIZES)
+def test_split(tokenX_options_v5, holder, accounts, gas_benchmark, size):
+    (option_id,) = create_options(tokenX_options_v5, holder, 1, accounts[3])
+    tx = tokenX_options_v5.split(option_id, [1000] * size, {"from": holder})
+    gas_benchmark.record("split", size, tx)
+
+
+@pytest.mark.parametrize("size", MERGE_SIZES)
+def test_merge(tokenX_options_v5, holder, accounts, gas_benchmark, size):
+    (option_id,) = create_options(tokenX_options_v5, holder, 1, accounts[3])
+    split_ids = tokenX_options_v5.split(
+        option_id, [1000] * size, {"from": holder}
+    ).return_value
+    tx = tokenX_options_v5.merge(split_ids, option_id, {"from": holder})
+    gas_benchmark.record("merge", size, tx)
+
+
+def test_transfer_units(tokenX_options_v5, holder, accounts, gas_benchmark):
+    (option_id,) = create_options(tokenX_options_v5, holder, 1, accounts[3])
+    receiver = accounts[2]
+
+    tx = tokenX_options_v5.transferFrom(
+        holder, receiver, option_id, 1000, {"from": holder}
+    )
+    gas_benchmark.record("transferFrom", 1, tx)
+
+    tx = tokenX_options_v5.transferFrom(
+        holder, receiver, option_id, tx.return_value, 1000, {"from": holder}
+    )
+    gas_benchmark.record("transferFromToTarget", 1, tx)
+
+
+def test_gas_regressions(gas_benchmark):
+    if os.environ.get("PYTEST_XDIST_WORKER"):
+        pytest.skip("checked by the xdist controller once every worker is done")
+    if not UPDATE_BASELINE:
+        gas_baseline.ensure()
+    checked = gas_benchmark.check()
+    if checked is None:
+        return
+
+    rows, failures = checked
+    for path, old, new, change in rows:
+        print(f"{path}: {old} -> {new} ({change:+}%)")
+    assert not failures, "\n".join(
+        f"{path}: {old} -> {new} (+{change}%)" for path, old, new, change in failures
+    )
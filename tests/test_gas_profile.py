@@ -0,0 +1,72 @@
+"""
+Gas hotspots of the pricing path.
+
+Profiles a ``create`` and a ``fees`` call (sent as a transaction so it can be
+traced) and writes their folded stacks to ``GAS_PROFILE_DIR``; render them
+with ``flamegraph.pl reports/gas_profiles/create.folded > create.svg`` or
+load them in speedscope. Run with ``-s`` to see the top functions and lines.
+"""
+
+import os
+from pathlib import Path
+
+import pytest
+
+from scripts.gas_profile import folded_stacks, format_hotspots, hotspots, write_folded
+
+AMOUNT = int(1e18) // 1000
+PROFILE_DIR = Path(os.environ.get("GAS_PROFILE_DIR", "reports/gas_profiles"))
+
+
+@pytest.fixture
+def holder(accounts, tokenX, tokenX_options_v5, liquidity, owner):
+    holder = accounts[1]
+    tokenX.transfer(holder, 10**22, {"from": owner})
+    tokenX.approve(tokenX_options_v5, 2**256 - 1, {"from": holder})
+    return holder
+
+
+def profile(name, tx):
+    folded = folded_stacks(tx)
+    write_folded(folded, PROFILE_DIR / f"{name}.folded")
+    trace = tx.trace
+    total = trace[0]["gas"] - trace[-1]["gas"] + trace[-1]["gasCost"]
+    print(f"\n{name}: {total} gas in execution")
+    print(format_hotspots(hotspots(folded, top=15), total))
+    print(format_hotspots(hotspots(folded, by="line", top=15), total))
+    return folded, total
+
+
+def test_profile_create(tokenX_options_v5, holder, accounts):
+    tx = tokenX_options_v5.create(AMOUNT, accounts[3], "profile", {"from": holder})
+    folded, total = profile("create", tx)
+
+    # Every opcode is charged exactly once
+    assert sum(folded.values()) == total
+    functions = dict(hotspots(folded))
+    assert functions["BufferTokenXOptionsV5.create"] == total
+    assert 0 < functions["OptionMath.blackScholesPrice"] < total
+    assert any(fn.startswith("ABDKMath64x64.") for fn in functions)
+
+    lines = (PROFILE_DIR / "create.folded").read_text().splitlines()
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any(";OptionMath.blackScholesPrice;" in line for line in lines)
+
+
+def test_profile_fees(tokenX_options_v5, options_config, holder):
+    options = tokenX_options_v5
+    tx = options.fees.transact(
+        86400,
+        AMOUNT,
+        options_config.fixedStrike(),
+        options.fixedOptionType(),
+        {"from": holder},
+    )
+    folded, total = profile("fees", tx)
+
+    assert sum(folded.values()) == total
+    functions = dict(hotspots(folded))
+    assert functions["BufferTokenXOptionsV5.fees"] == total
+    assert 0 < functions["OptionMath.blackScholesPrice"] < total
+    # Exclusive gas splits the same total over the innermost functions
+    assert sum(gas for _, gas in hotspots(folded, inclusive=False)) == total
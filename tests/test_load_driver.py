@@ -0,0 +1,73 @@
+"""
+Load test of the option entry points.
+
+``LOAD_OPTIONS`` options are created from ``LOAD_ACCOUNTS`` fresh accounts
+with the default operation mix; run with ``-s`` to see the statistics of
+every ``LOAD_WINDOW`` options. Long runs (e.g. ``LOAD_OPTIONS=100000``) show
+how throughput and latency change as the state grows.
+"""
+
+import asyncio
+import os
+
+from eth_account import Account
+
+from scripts.load_driver import LoadDriver, format_windows
+
+AMOUNT = int(1e18) // 1000
+LOAD_OPTIONS = int(os.environ.get("LOAD_OPTIONS", "200"))
+LOAD_ACCOUNTS = int(os.environ.get("LOAD_ACCOUNTS", "8"))
+LOAD_WINDOW = int(os.environ.get("LOAD_WINDOW", "50"))
+
+
+def fund(web3, tokenX, options, owner, count):
+    """Creates ``count`` accounts holding tokenX that approved ``options``."""
+    keys = []
+    for _ in range(count):
+        account = Account.create()
+        tokenX.transfer(account.address, LOAD_OPTIONS * AMOUNT, {"from": owner})
+        signed = account.sign_transaction(
+            {
+                "to": tokenX.address,
+                "data": tokenX.approve.encode_input(options, 2**256 - 1),
+                "gas": 100_000,
+                "gasPrice": 0,
+                "nonce": 0,
+                "chainId": web3.eth.chain_id,
+            }
+        )
+        web3.eth.wait_for_transaction_receipt(
+            web3.eth.send_raw_transaction(signed.rawTransaction)
+        )
+        keys.append(account.key)
+    return keys
+
+
+def test_load(web3, tokenX, ibfr_pool, tokenX_options_v5, accounts, owner):
+    options = tokenX_options_v5
+    # Enough liquidity for every option to stay open
+    liquidity = min(2 * LOAD_OPTIONS * AMOUNT, ibfr_pool.maxLiquidity())
+    tokenX.approve(ibfr_pool, liquidity, {"from": owner})
+    ibfr_pool.provide(liquidity, 0, {"from": owner})
+    keys = fund(web3, tokenX, options, owner, LOAD_ACCOUNTS)
+
+    driver = LoadDriver(
+        web3.provider.endpoint_uri,
+        options.address,
+        options.abi,
+        keys,
+        amount=AMOUNT,
+        referrer=accounts[3].address,
+        window=LOAD_WINDOW,
+    )
+    windows = asyncio.run(driver.run(LOAD_OPTIONS))
+    print(f"\n{format_windows(windows)}")
+
+    assert driver.created >= LOAD_OPTIONS
+    assert sum(window["created"] for window in windows) == driver.created
+    assert sum(window["failed"] for window in windows) == 0
+    assert windows[-1]["options"] == driver.created
+    for address, portfolio in driver.portfolios.items():
+        for option_id, (_, units) in portfolio.options.items():
+            assert options.ownerOf(option_id) == address
+            assert options.units(option_id) == units
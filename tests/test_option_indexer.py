@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from scripts.option_indexer import ACTIVE, OptionIndexer
+
+AMOUNT = int(1e18) // 100
+
+
+@pytest.fixture
+def holder(accounts, tokenX, tokenX_options_v5, liquidity, owner):
+    holder = accounts[1]
+    tokenX.transfer(holder, 10**20, {"from": owner})
+    tokenX.approve(tokenX_options_v5, 2**256 - 1, {"from": holder})
+    return holder
+
+
+def create(options, holder, referrer):
+    return options.create(AMOUNT, referrer, "test", {"from": holder}).return_value
+
+
+def assert_matches_chain(indexer, options, option_id):
+    indexed = indexer.option(option_id)
+    state, strike, amount, locked_amount, premium, expiration, option_type = (
+        options.options(option_id)
+    )
+    assert indexed["owner"] == options.ownerOf(option_id)
+    assert indexed["slot"] == options.slotOf(option_id)
+    assert indexed["units"] == options.units(option_id)
+    assert (
+        indexed["state"],
+        indexed["strike"],
+        indexed["amount"],
+        indexed["locked_amount"],
+        indexed["premium"],
+        indexed["expiration"],
+        indexed["option_type"],
+    ) == (state, strike, amount, locked_amount, premium, expiration, option_type)
+
+
+def test_indexer_tracks_positions(
+    tokenX_options_v5, ibfr_pool, holder, accounts, chain, tmp_path
+):
+    options, other, referrer = tokenX_options_v5, accounts[2], accounts[3]
+    first, second, third = (create(options, holder, referrer) for _ in range(3))
+    split_ids = options.split(first, [1000, 2000], {"from": holder}).return_value
+    transferred = options.transferFrom(
+        holder, other, second, 5000, {"from": holder}
+    ).return_value
+    options.merge([split_ids[0]], first, {"from": holder})
+    options.exercise(third, {"from": holder})
+
+    path = str(tmp_path / "options.sqlite")
+    indexer = OptionIndexer.from_contracts(options, ibfr_pool, path)
+    assert indexer.sync() == chain.height
+
+    live = [first, second, split_ids[1]]
+    assert [o["id"] for o in indexer.active_options_of(holder)] == live
+    assert [o["id"] for o in indexer.active_options_of(other)] == [transferred]
+    assert [o["id"] for o in indexer.active_options_in_slot(options.slotOf(first))] == [
+        first,
+        split_ids[1],
+    ]
+    assert [
+        o["id"] for o in indexer.active_options_in_slot(options.slotOf(second))
+    ] == [
+        second,
+        transferred,
+    ]
+    expiry = ibfr_pool.fixedExpiry()
+    assert len(indexer.expiring_before(expiry)) == 4
+    assert indexer.expiring_before(expiry - 1) == []
+
+    for option_id in live + [transferred]:
+        assert_matches_chain(indexer, options, option_id)
+    assert indexer.option(third)["state"] == 2
+    assert indexer.option(third)["owner"] is None
+    assert indexer.option(split_ids[0])["owner"] is None
+    assert [e["event"] for e in indexer.events(event="Provide")] == ["Provide"]
+    assert {e["event"] for e in indexer.events(option_id=first)} >= {"Create", "Split"}
+
+    # Resumes from the stored block, also after reopening the database
+    indexer.close()
+    fourth = create(options, holder, referrer)
+    indexer = OptionIndexer.from_contracts(options, ibfr_pool, path)
+    assert indexer.last_block == chain.height - 1
+    assert indexer.sync() == chain.height
+    assert [o["id"] for o in indexer.active_options_of(holder)] == live + [fourth]
+    assert indexer.option(fourth)["state"] == ACTIVE
+
+    queries = 1000
+    start = time.perf_counter()
+    for _ in range(queries):
+        indexer.active_options_of(holder)
+    elapsed = (time.perf_counter() - start) / queries
+    print(f"active_options_of: {elapsed * 1e6:.1f} us per query")
+    assert elapsed < 1e-3
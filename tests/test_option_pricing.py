@@ -0,0 +1,154 @@
+import itertools
+import time
+
+import numpy as np
+import pytest
+from brownie.exceptions import VirtualMachineError
+
+from scripts.option_pricing import (
+    FixedPointError,
+    OptionQuoter,
+    black_scholes_price,
+    black_scholes_price_exact,
+)
+
+ONE_DAY = 86400
+PRICE = 400 * 10**8
+
+
+@pytest.fixture
+def deployment(tokenX_options_v5, options_config, ibfr_pool, liquidity):
+    return tokenX_options_v5, options_config, ibfr_pool
+
+
+GRID = list(
+    itertools.product(
+        [100, 2500, 4500, 12000, 30000],
+        [300 * 10**8, 350 * 10**8, 399 * 10**8, 420 * 10**8],
+        [PRICE],
+        [3600, ONE_DAY, 9 * ONE_DAY, 90 * ONE_DAY],
+        [True, False],
+    )
+)
+
+
+def _library_price(option_math, *args, fast_cdf=False):
+    price = (
+        option_math.blackScholesPriceFast if fast_cdf else option_math.blackScholesPrice
+    )
+    try:
+        return price(*args)
+    except VirtualMachineError:
+        return None
+
+
+def _reference_price(*args, fast_cdf=False):
+    try:
+        return black_scholes_price_exact(*args, fast_cdf=fast_cdf)
+    except FixedPointError:
+        return None
+
+
+def test_black_scholes_matches_library(option_math):
+    for args in GRID:
+        assert _reference_price(*args) == _library_price(option_math, *args), args
+
+    iv, strike, spot, period, is_call = (np.array(column) for column in zip(*GRID))
+    exact = black_scholes_price(iv, strike, spot, period, is_call, exact=True)
+    approx = black_scholes_price(iv, strike, spot, period, is_call)
+    assert np.allclose(approx, exact.astype(np.float64), rtol=1e-6, atol=10)
+
+
+def test_fast_black_scholes_matches_library(option_math):
+    gas = {"blackScholesPrice": [], "blackScholesPriceFast": []}
+    for args in GRID:
+        fast = _reference_price(*args, fast_cdf=True)
+        assert fast == _library_price(option_math, *args, fast_cdf=True), args
+        if fast is None:
+            continue
+        # (S + K) * 4.1e-9 with a factor of 1e8, plus rounding
+        assert (
+            abs(fast - _reference_price(*args)) <= (PRICE + args[1]) * 41 // 10**10 + 2
+        )
+        for name in gas:
+            gas[name].append(getattr(option_math, name).estimate_gas(*args))
+
+    mean = {name: np.mean(values) for name, values in gas.items()}
+    print(
+        f"gas per call: blackScholesPrice {mean['blackScholesPrice']:,.0f}, "
+        f"blackScholesPriceFast {mean['blackScholesPriceFast']:,.0f}"
+    )
+    assert mean["blackScholesPriceFast"] < mean["blackScholesPrice"]
+
+
+@pytest.mark.parametrize("fast_cdf", (False, True))
+@pytest.mark.parametrize("iv_bucket_width", (0, 50))
+def test_fees_match_contract(deployment, chain, owner, iv_bucket_width, fast_cdf):
+    options, config, pool = deployment
+    config.setIVBucketWidth(iv_bucket_width, {"from": owner})
+    config.setFastCdf(fast_cdf, {"from": owner})
+    period = pool.fixedExpiry() - chain.time()
+    amounts = [10**12, 10**15, 10**17, 5 * 10**17, 2 * 10**18]
+
+    quoter = OptionQuoter.from_contracts(options, config, pool)
+    total, settlement_fee, premium = quoter.fees(amounts, period=period)
+
+    for i, amount in enumerate(amounts):
+        expected = options.fees(period, amount, quoter.strike, 2)
+        assert (total[i], settlement_fee[i], premium[i]) == tuple(expected), amount
+
+
+def test_quote_cache_follows_price(
+    deployment, tokenX, twap, accounts, owner, web3, chain
+):
+    options, config, pool = deployment
+    holder = accounts[1]
+    config.setIVBucketWidth(50, {"from": owner})
+    tokenX.transfer(holder, 10**18, {"from": owner})
+    tokenX.approve(options, 2**256 - 1, {"from": holder})
+
+    # Sent by one account so that the nonces keep them in order in the block
+    tx_params = {"from": holder, "gas_limit": 3_000_000, "required_confs": 0}
+    web3.provider.make_request("miner_stop", [])
+    try:
+        first = options.create(10**15, owner, "test", tx_params)
+        twap.setPrice(2 * PRICE, tx_params)
+        second = options.create(10**15, owner, "test", tx_params)
+        chain.mine(1)
+    finally:
+        web3.provider.make_request("miner_start", [])
+    first.wait(1)
+    second.wait(1)
+    assert first.block_number == second.block_number
+
+    # A quote cached at the old price would halve the premium in tokenX
+    premiums = [options.options(tx.return_value)[4] for tx in (first, second)]
+    assert premiums[1] > premiums[0]
+
+
+def test_quote_throughput(deployment, chain):
+    options, config, pool = deployment
+    period = pool.fixedExpiry() - chain.time()
+    quoter = OptionQuoter.from_contracts(options, config, pool)
+
+    rpc_quotes = 50
+    start = time.perf_counter()
+    for amount in range(1, rpc_quotes + 1):
+        options.fees.call(period, amount * 10**15, quoter.strike, 2)
+    rpc_rate = rpc_quotes / (time.perf_counter() - start)
+
+    amounts = np.arange(1, 20001, dtype=np.int64) * 10**13
+    start = time.perf_counter()
+    quoter.fees(amounts, period=period)
+    exact_rate = len(amounts) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    quoter.fees(amounts, period=period, exact=False)
+    float_rate = len(amounts) / (time.perf_counter() - start)
+
+    print(
+        f"quotes/sec: fees.call {rpc_rate:,.0f}, "
+        f"exact {exact_rate:,.0f}, float64 {float_rate:,.0f}"
+    )
+    assert exact_rate > rpc_rate
+    assert float_rate > exact_rate
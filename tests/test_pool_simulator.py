@@ -0,0 +1,108 @@
+import time
+
+import numpy as np
+from brownie.exceptions import VirtualMachineError
+
+from scripts.pool_simulator import PoolSimulator, return_distribution
+
+ONE_DAY = 86400
+LIQUIDITY = 10 * 10**18
+COLLATERALIZATION_RATIO = 50
+# The fourth order would push the locked amount over 80% of the pool
+AMOUNTS = (2 * 10**18, 5 * 10**18, 6 * 10**18, 4 * 10**18, 10**18)
+
+
+def test_simulator_matches_contracts(
+    accounts, tokenX, ibfr_pool, tokenX_options_v5, options_config, twap, owner, chain
+):
+    options, holder = tokenX_options_v5, accounts[1]
+    options_config.setOptionCollaterizationRatio(
+        COLLATERALIZATION_RATIO, {"from": owner}
+    )
+    sim = PoolSimulator(
+        1,
+        iv_rate=options_config.impliedVolRate(),
+        utilization_rate=options_config.utilizationRate(),
+        collateralization_ratio=COLLATERALIZATION_RATIO,
+        settlement_fee_percentage=options_config.settlementFeePercentage(),
+        max_liquidity=ibfr_pool.maxLiquidity(),
+        is_call=options.fixedOptionType() == 2,
+        exact=True,
+    )
+    tokenX.approve(ibfr_pool, 2**256 - 1, {"from": owner})
+    tokenX.transfer(holder, 10**20, {"from": owner})
+    tokenX.approve(options, 2**256 - 1, {"from": holder})
+
+    tx = ibfr_pool.provide(LIQUIDITY, 0, {"from": owner})
+    assert tx.return_value == sim.provide(LIQUIDITY)[0]
+
+    spot = options.getCurrentPrice()
+    strike = options_config.fixedStrike()
+    expiry = ibfr_pool.fixedExpiry()
+    option_ids, rejected = [], 0
+    for amount in AMOUNTS:
+        try:
+            tx = options.create(amount, owner, "sim", {"from": holder})
+        except VirtualMachineError as e:
+            assert e.revert_msg == "Pool Error: Amount is too large."
+            (accepted,), _, _ = sim.lock(amount, expiry - chain.time(), spot, strike)
+            assert not accepted
+            rejected += 1
+            continue
+        (accepted,), _, (premium,) = sim.lock(
+            amount, expiry - tx.timestamp, spot, strike
+        )
+        assert accepted
+        option = options.options(tx.return_value)
+        assert premium == option["premium"]
+        assert sim.locked_amount[0] == ibfr_pool.getLockedAmount()
+        option_ids.append(tx.return_value)
+    assert rejected == 1
+    assert sim.locked_premium[0] == ibfr_pool.lockedPremium()
+
+    # Far in the money, so every payout is capped at the locked amount
+    price = 1000 * 10**8
+    twap.setPrice(price, {"from": owner})
+    for option_id in option_ids:
+        options.exercise(option_id, {"from": holder})
+    sim.settle(price, strike)
+    assert sim.balance[0] == ibfr_pool.totalTokenXBalance()
+    assert ibfr_pool.getLockedAmount() == sim.locked_amount[0] == 0
+
+    tx = ibfr_pool.provide(3 * 10**18, 0, {"from": owner})
+    assert tx.return_value == sim.provide(3 * 10**18)[0]
+    chain.sleep(expiry - chain.time() + ONE_DAY)
+    tx = ibfr_pool.withdraw(2 * 10**18, owner, {"from": owner})
+    assert tx.return_value == sim.withdraw(2 * 10**18)[0]
+    assert sim.supply[0] == ibfr_pool.totalSupply()
+    assert sim.balance[0] == ibfr_pool.totalTokenXBalance()
+
+
+def test_lp_return_distribution():
+    paths, cycles, orders = 20_000, 8, 25
+    sim = PoolSimulator(paths)
+    start = time.perf_counter()
+    out = sim.run(cycles, orders, liquidity=100 * 10**18, mean_amount=3 * 10**18)
+    elapsed = time.perf_counter() - start
+    print(f"{paths * cycles * orders:,} options in {elapsed:.1f}s")
+    print(return_distribution(out["returns"]))
+
+    assert out["returns"].shape == (paths, cycles)
+    assert (out["accepted"] + out["rejected"] == orders).all()
+    assert out["utilization"].max() <= 0.8
+    assert (sim.locked_amount == 0).all() and (sim.locked_premium == 0).all()
+    assert (sim.balance > 0).all()
+
+
+def test_exact_and_float_runs_agree():
+    kwargs = dict(
+        cycles=3,
+        orders_per_cycle=5,
+        liquidity=50 * 10**18,
+        mean_amount=2 * 10**18,
+        seed=3,
+    )
+    exact = PoolSimulator(4, exact=True).run(**kwargs)
+    approx = PoolSimulator(4).run(**kwargs)
+    assert (exact["accepted"] == approx["accepted"]).all()
+    assert np.allclose(exact["returns"], approx["returns"], atol=1e-6)
@@ -0,0 +1,127 @@
+"""
+Price-path oracle and scenario replay.
+
+The scenarios deploy a second options contract priced by a
+``PricePathOracle`` and replay ``SCENARIO_TICKS`` steps of each regime
+through it. ``exerciseAll`` only closes options in the last half hour before
+expiry, so the replay runs inside that window. Run with ``-s`` to see the
+P&L, gas and throughput of every regime.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from scripts.price_scenarios import (
+    REGIMES,
+    ScenarioRunner,
+    load_path,
+    price_path,
+    read_path,
+    summarize,
+)
+
+AMOUNT = int(1e18) // 1000
+SCENARIO_TICKS = int(os.environ.get("SCENARIO_TICKS", "300"))
+
+
+@pytest.fixture
+def path_oracle(PricePathOracle, owner):
+    return PricePathOracle.deploy({"from": owner})
+
+
+@pytest.fixture
+def path_options(
+    BufferTokenXOptionsV5,
+    option_math,
+    tokenX,
+    ibfr_pool,
+    path_oracle,
+    options_config,
+    owner,
+):
+    options = BufferTokenXOptionsV5.deploy(
+        tokenX, ibfr_pool, tokenX, tokenX, path_oracle, options_config, {"from": owner}
+    )
+    ibfr_pool.grantRole(ibfr_pool.OPTION_ISSUER_ROLE(), options, {"from": owner})
+    options.grantRole(options.AUTO_CLOSER_ROLE(), owner, {"from": owner})
+    return options
+
+
+def test_path_oracle_steps(path_oracle, owner, chain):
+    load_path(path_oracle, [100 * 10**8, 200 * 10**8, 300 * 10**8], owner)
+    assert path_oracle.pathLength() == 3
+
+    path_oracle.start(2, False, {"from": owner})
+    quotes = []
+    for _ in range(6):
+        quotes.append(path_oracle.consult(owner, 10**8, owner))
+        chain.mine(1)
+    # Two blocks per step, then the last price holds
+    assert quotes == [100 * 10**8] * 2 + [200 * 10**8] * 2 + [300 * 10**8] * 2
+
+    path_oracle.start(60, True, {"from": owner})
+    assert path_oracle.currentStep() == 0
+    chain.sleep(121)
+    chain.mine(1)
+    assert path_oracle.currentStep() == 2
+
+
+def test_price_paths(tmp_path):
+    for regime in REGIMES:
+        path = price_path(regime, 1000, seed=7)
+        assert path[0] == 400 * 10**8
+        assert (path == price_path(regime, 1000, seed=7)).all()
+        assert not (path == price_path(regime, 1000, seed=8)).all()
+    crash = price_path("crash", 1000, seed=7)
+    assert crash[600] < crash[599] * 0.7
+
+    np.save(tmp_path / "path.npy", crash)
+    (tmp_path / "path.csv").write_text(
+        "price,block\n" + "\n".join(f"{p},{i}" for i, p in enumerate(crash))
+    )
+    assert (read_path(tmp_path / "path.npy") == crash).all()
+    assert (read_path(tmp_path / "path.csv") == crash).all()
+
+
+@pytest.mark.parametrize("regime", sorted(REGIMES))
+def test_scenario(
+    regime,
+    path_options,
+    path_oracle,
+    ibfr_pool,
+    tokenX,
+    accounts,
+    owner,
+    chain,
+    liquidity,
+):
+    holders = accounts[1:4]
+    for holder in holders:
+        tokenX.transfer(holder, 10**20, {"from": owner})
+        tokenX.approve(path_options, 2**256 - 1, {"from": holder})
+    chain.sleep(ibfr_pool.fixedExpiry() - chain.time() - 25 * 60)
+    chain.mine(1)
+
+    runner = ScenarioRunner(
+        chain,
+        path_options,
+        ibfr_pool,
+        path_oracle,
+        tokenX,
+        holders,
+        keeper=owner,
+        referrer=accounts[6],
+        amount=AMOUNT,
+        seed=1,
+    )
+    report = runner.run(price_path(regime, SCENARIO_TICKS, seed=1))
+    print(f"{regime}: {summarize(report)}")
+
+    assert report["created"] == report["exercised"] + report["open"]
+    # Premiums of open options stay locked, the rest is realized
+    assert (
+        report["balance_change"]
+        == report["realized_pnl"] + report["locked_premium_change"]
+    )
@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from scripts.state_snapshot import StateSnapshot
+
+
+def test_snapshot_matches_direct_calls(
+    multicall, tokenX, tokenX_options_v5, ibfr_pool, accounts, owner, liquidity
+):
+    holder = accounts[1]
+    views = (
+        StateSnapshot(multicall)
+        .balances(tokenX, owner=owner, holder=holder, pool=ibfr_pool.address)
+        .add("locked", ibfr_pool.getLockedAmount)
+        .add("option", tokenX_options_v5.options, 0)
+        .add("owner_of", tokenX_options_v5.ownerOf, 0)
+    )
+    before = views.take()
+    assert before["owner"] == tokenX.balanceOf(owner)
+    assert before["option"] == tokenX_options_v5.options(0)
+    # Views that revert read as None
+    assert before["owner_of"] is None
+
+    tokenX.transfer(holder, 10**18, {"from": owner})
+    tokenX.approve(tokenX_options_v5, 10**18, {"from": holder})
+    option_id = tokenX_options_v5.create(
+        10**16, owner, "test", {"from": holder}
+    ).return_value
+    after = views.take()
+    assert after.block > before.block
+
+    change = StateSnapshot.diff(before, after)
+    assert change["locked"] == 10**16
+    assert 0 < change["holder"] < 10**18
+    assert change["pool"] == tokenX_options_v5.options(option_id)["premium"]
+    assert change["owner_of"] == (None, holder)
+    assert change["option"] == (before["option"], tokenX_options_v5.options(option_id))
+    # Declared integer views read as 0 when unchanged, undeclared keys raise
+    assert StateSnapshot.diff(before, before)["locked"] == 0
+    with pytest.raises(KeyError):
+        change["missing"]
+
+    # One eth_call for the declared set against one per view
+    rounds = 20
+    start = time.perf_counter()
+    for _ in range(rounds):
+        [tokenX.balanceOf(account) for account in (owner, holder, ibfr_pool)]
+        ibfr_pool.getLockedAmount()
+        tokenX_options_v5.options(option_id)
+        tokenX_options_v5.ownerOf(option_id)
+    direct = (time.perf_counter() - start) / rounds
+    start = time.perf_counter()
+    for _ in range(rounds):
+        views.take()
+    batched = (time.perf_counter() - start) / rounds
+    print(f"6 views: {direct * 1e3:.1f} ms direct, {batched * 1e3:.1f} ms multicall")
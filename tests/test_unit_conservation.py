@@ -0,0 +1,264 @@
+"""
+Stateful fuzzing of unit and collateral conservation.
+
+Random sequences of create, split, merge, partial transfers, exercise and
+unlock are run against the V5 deployment. After every step the amounts,
+locked amounts, premiums and units of the live tokens in each slot must add
+up to what was created minus what was settled, and the pool's locked totals
+and positions must match the options.
+
+Brownie reverts to one ``chain.snapshot()`` before every example, which is
+taken when ``state_machine`` starts, so the test must not send transactions
+before calling it; per-example funding happens in ``setup``. Set
+``FUZZ_EXAMPLES`` and ``FUZZ_STEPS`` to run longer.
+
+The step rate is reported as the ``steps_per_minute`` property (e.g. in the
+``--junitxml`` report) and must reach ``FUZZ_MIN_STEPS_PER_MINUTE``.
+"""
+
+import os
+import time
+
+from brownie import chain
+from brownie.test import strategy
+
+from scripts.state_snapshot import StateSnapshot
+
+LIQUIDITY = 100 * 10**18
+HOLDER_BALANCE = 10**19
+SETTINGS = {
+    "max_examples": int(os.environ.get("FUZZ_EXAMPLES", "50")),
+    "stateful_step_count": int(os.environ.get("FUZZ_STEPS", "20")),
+}
+# Reverting to the snapshot instead of redeploying is what makes thousands
+# of steps per minute possible
+MIN_STEPS_PER_MINUTE = int(os.environ.get("FUZZ_MIN_STEPS_PER_MINUTE", "1000"))
+
+
+class UnitConservation:
+    st_amount = strategy("uint256", min_value=10**12, max_value=10**16)
+    st_index = strategy("uint256", max_value=2**16)
+    st_holder = strategy("uint256", max_value=2)
+    st_fraction = strategy("uint256", min_value=1, max_value=999)
+    st_parts = strategy(
+        "uint256[]", min_value=1, max_value=200, min_length=1, max_length=4
+    )
+
+    steps = 0
+
+    def __init__(cls, accounts, tokenX, options, pool, multicall):
+        # Runs once before the snapshot, so it must not send transactions
+        cls.owner = accounts[0]
+        cls.holders = accounts[1:4]
+        cls.tokenX = tokenX
+        cls.options = options
+        cls.pool = pool
+        cls.multicall = multicall
+
+    def setup(self):
+        self.tokenX.approve(self.pool, LIQUIDITY, {"from": self.owner})
+        self.pool.provide(LIQUIDITY, 0, {"from": self.owner})
+        for holder in self.holders:
+            self.tokenX.transfer(holder, HOLDER_BALANCE, {"from": self.owner})
+            self.tokenX.approve(self.options, 2**256 - 1, {"from": holder})
+        # id => (owner, slot) of every live token
+        self.live = {}
+        # slot => [amount, lockedAmount, premium, units] created minus settled
+        self.totals = {}
+        self.expired = False
+
+    def _pick(self, index, ids=None):
+        ids = sorted(self.live if ids is None else ids)
+        return ids[index % len(ids)] if ids else None
+
+    def _settle(self, option_id):
+        option = self.options.options(option_id)
+        totals = self.totals[self.live[option_id][1]]
+        totals[0] -= option["amount"]
+        totals[1] -= option["lockedAmount"]
+        totals[2] -= option["premium"]
+        totals[3] -= self.options.units(option_id)
+        del self.live[option_id]
+
+    def rule_create(self, st_amount, st_holder):
+        if self.expired:
+            return
+        holder = self.holders[st_holder]
+        option_id = self.options.create(
+            st_amount, self.owner, "fuzz", {"from": holder}
+        ).return_value
+        option = self.options.options(option_id)
+        slot = self.options.slotOf(option_id)
+        self.live[option_id] = (holder, slot)
+        self.totals[slot] = [
+            option["amount"],
+            option["lockedAmount"],
+            option["premium"],
+            self.options.units(option_id),
+        ]
+
+    def rule_split(self, st_index, st_parts):
+        option_id = self._pick(st_index)
+        if option_id is None or self.expired:
+            return
+        units = self.options.units(option_id)
+        split_units = [max(1, units * part // 1000) for part in st_parts]
+        if sum(split_units) >= units:
+            return
+        owner, slot = self.live[option_id]
+        new_ids = self.options.split(
+            option_id, split_units, {"from": owner}
+        ).return_value
+        for new_id in new_ids:
+            self.live[new_id] = (owner, slot)
+
+    def rule_merge(self, st_index):
+        groups = {}
+        for option_id, key in self.live.items():
+            groups.setdefault(key, []).append(option_id)
+        candidates = [sorted(ids) for ids in groups.values() if len(ids) > 1]
+        if not candidates or self.expired:
+            return
+        ids = candidates[st_index % len(candidates)]
+        target, merged = ids[0], ids[1:]
+        self.options.merge(merged, target, {"from": self.live[target][0]})
+        for option_id in merged:
+            del self.live[option_id]
+
+    def rule_transfer_units(self, st_index, st_fraction, st_holder):
+        option_id = self._pick(st_index)
+        if option_id is None or self.expired:
+            return
+        units = self.options.units(option_id)
+        transfer_units = units * st_fraction // 1000
+        if not 0 < transfer_units < units:
+            return
+        owner, slot = self.live[option_id]
+        to = self.holders[st_holder]
+        new_id = self.options.transferFrom(
+            owner, to, option_id, transfer_units, {"from": owner}
+        ).return_value
+        self.live[new_id] = (to, slot)
+
+    def rule_transfer_units_to_target(self, st_index, st_fraction):
+        option_id = self._pick(st_index)
+        if option_id is None or self.expired:
+            return
+        owner, slot = self.live[option_id]
+        targets = [
+            i for i, key in self.live.items() if key[1] == slot and i != option_id
+        ]
+        units = self.options.units(option_id)
+        transfer_units = units * st_fraction // 1000
+        if not targets or not 0 < transfer_units < units:
+            return
+        target = self._pick(st_index, targets)
+        self.options.transferFrom(
+            owner,
+            self.live[target][0],
+            option_id,
+            target,
+            transfer_units,
+            {"from": owner},
+        )
+
+    def rule_exercise(self, st_index):
+        option_id = self._pick(st_index)
+        if option_id is None or self.expired:
+            return
+        owner = self.live[option_id][0]
+        self._settle(option_id)
+        self.options.exercise(option_id, {"from": owner})
+
+    def rule_expire(self):
+        if self.expired:
+            return
+        self.expired = True
+        chain.sleep(self.pool.fixedExpiry() - chain.time() + 1)
+        chain.mine()
+
+    def rule_unlock(self, st_index, st_fraction):
+        if not self.expired or not self.live:
+            return
+        ids = sorted(self.live)
+        start = st_index % len(ids)
+        ids = ids[start : start + max(1, len(ids) * st_fraction // 1000)]
+        for option_id in ids:
+            self._settle(option_id)
+        tx = self.options.unlockAll(ids, {"from": self.owner})
+        assert tx.return_value == len(ids)
+
+    def invariant_conservation(self):
+        type(self).steps += 1
+        views = (
+            StateSnapshot(self.multicall)
+            .add("locked_amount", self.pool.getLockedAmount)
+            .add("locked_premium", self.pool.lockedPremium)
+            .add("options_balance", self.tokenX.balanceOf, self.options)
+        )
+        for option_id in self.live:
+            views.add(("option", option_id), self.options.options, option_id)
+            views.add(("units", option_id), self.options.units, option_id)
+            views.add(("slot", option_id), self.options.slotOf, option_id)
+            views.add(("owner", option_id), self.options.ownerOf, option_id)
+            views.add(
+                ("pool", option_id),
+                self.pool.lockedLiquidity,
+                self.options,
+                option_id,
+            )
+        state = views.take()
+
+        sums = {slot: [0, 0, 0, 0] for slot in self.totals}
+        for option_id, (owner, slot) in self.live.items():
+            option = state[("option", option_id)]
+            assert state[("owner", option_id)] == owner
+            assert state[("slot", option_id)] == slot
+            assert option["state"] == 1
+            assert state[("pool", option_id)] == (
+                option["lockedAmount"],
+                option["premium"],
+                True,
+            )
+            values = (
+                option["amount"],
+                option["lockedAmount"],
+                option["premium"],
+                state[("units", option_id)],
+            )
+            sums[slot] = [total + value for total, value in zip(sums[slot], values)]
+
+        assert sums == self.totals
+        assert state["locked_amount"] == sum(total[1] for total in sums.values())
+        assert state["locked_premium"] == sum(total[2] for total in sums.values())
+        assert state["options_balance"] == 0
+
+
+def test_unit_conservation(
+    state_machine,
+    accounts,
+    tokenX,
+    tokenX_options_v5,
+    ibfr_pool,
+    multicall,
+    record_property,
+):
+    start = time.perf_counter()
+    UnitConservation.steps = 0
+    state_machine(
+        UnitConservation,
+        accounts,
+        tokenX,
+        tokenX_options_v5,
+        ibfr_pool,
+        multicall,
+        settings=SETTINGS,
+    )
+    elapsed = time.perf_counter() - start
+    rate = UnitConservation.steps * 60 / elapsed
+    record_property("steps", UnitConservation.steps)
+    record_property("steps_per_minute", round(rate))
+    assert rate >= MIN_STEPS_PER_MINUTE, (
+        f"{UnitConservation.steps} steps in {elapsed:.1f}s "
+        f"({rate:,.0f} steps/min, expected {MIN_STEPS_PER_MINUTE:,})"
+    )
@@ -0,0 +1,53 @@
+import pytest
+
+from scripts.option_indexer import OptionIndexer
+from scripts.unlock_batcher import UnlockBatcher, plan_batches
+
+ONE_DAY = 86400
+AMOUNT = int(1e18) // 1000
+GAS_LIMIT = 1_000_000
+
+
+@pytest.fixture
+def holder(accounts, tokenX, tokenX_options_v5, liquidity, owner):
+    holder = accounts[1]
+    tokenX.transfer(holder, 10**20, {"from": owner})
+    tokenX.approve(tokenX_options_v5, 2**256 - 1, {"from": holder})
+    return holder
+
+
+def test_plan_batches():
+    assert plan_batches(range(7), 1000, 100, 300) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert plan_batches([], 1000, 100, 300) == []
+    with pytest.raises(ValueError):
+        plan_batches(range(7), 1000, 900, 300)
+
+
+def test_batches_fit_gas_limit(tokenX_options_v5, ibfr_pool, holder, chain):
+    options = tokenX_options_v5
+    option_ids = list(
+        options.createBatch(
+            [AMOUNT] * 60, holder, ["test"] * 60, {"from": holder}
+        ).return_value
+    )
+    exercised = option_ids.pop(10)
+    chain.mine(1)
+    options.exercise(exercised, {"from": holder})
+    chain.sleep(ibfr_pool.fixedExpiry() - chain.time() + ONE_DAY)
+    chain.mine(1)
+
+    indexer = OptionIndexer.from_contracts(options, ibfr_pool)
+    indexer.sync()
+    batcher = UnlockBatcher(indexer, gas_limit=GAS_LIMIT)
+    batches = batcher.batches(holder)
+
+    assert sorted(sum(batches, [])) == option_ids
+    assert len(batches) > 1
+    for batch in batches:
+        tx = options.unlockAll(batch, {"from": holder, "gas_limit": GAS_LIMIT})
+        assert tx.return_value == len(batch)
+        assert "UnlockSkipped" not in tx.events
+    assert ibfr_pool.getLockedAmount() == 0
+
+    indexer.sync()
+    assert batcher.batches(holder) == []